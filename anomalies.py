@@ -0,0 +1,147 @@
+"""Streaming anomaly detection over daily channel and video metrics.
+
+Every (channel or video, metric) keeps a small state row: an EWMA level and
+residual variance plus seven additive weekday offsets (a Holt-Winters style
+baseline with no trend). update() folds only the days newer than each
+entity's state, one day at a time but vectorized across every video of the
+channel, so a catalog-wide pass is a handful of NumPy operations per new day.
+Days further than config.ANOMALY_Z standard deviations from expected are
+written to the `anomalies` table; they enter the baseline clipped to the band
+so one spike doesn't widen it for weeks.
+"""
+import time
+import datetime
+
+import numpy as np
+from sqlalchemy import select, delete, func
+
+import config
+import columnar
+from database import upsert, AnomalyState as S, Anomaly, ChannelDaily, VideoDaily, Video
+
+# Counts are at least Poisson-noisy: their std is floored at sqrt(expected)
+COUNTS = {"views", "subscribers_gained", "likes", "comments", "shares"}
+SOURCES = {"channel": (ChannelDaily, ChannelDaily.channel_id), "video": (VideoDaily, VideoDaily.video_id)}
+_THURSDAY = 3  # 1970-01-01, day 0 of columnar.DAYS
+
+
+def _weekday(day):
+    return (int(day) + _THURSDAY) % 7
+
+
+def _observations(session, kind, channel_id, metrics, after):
+    model, entity = SOURCES[kind]
+    stmt = select(entity.label("entity"), model.date.label("day"), *[getattr(model, m) for m in metrics])
+    if kind == "video":
+        stmt = stmt.join(Video, Video.id == VideoDaily.video_id).where(Video.channel_id == channel_id)
+    else:
+        stmt = stmt.where(ChannelDaily.channel_id == channel_id)
+    if after is not None:
+        stmt = stmt.where(model.date > after)
+    dtypes = {"entity": object, "day": columnar.DAYS, **{m: np.float64 for m in metrics}}
+    return columnar.stream_columns(session.connection(), stmt, dtypes)
+
+
+def update(session, kind, channel_id):
+    """Fold a channel's (kind="channel") or its videos' (kind="video") new days into their baselines.
+
+    Returns the number of anomalies flagged. The caller commits.
+    """
+    t0 = time.perf_counter()
+    metrics = config.ANOMALY_METRICS[kind]
+    states = session.execute(select(S).where(S.kind == kind, S.channel_id == channel_id)).scalars().all()
+    # Entities without a state start from whatever history is stored after the oldest state
+    after = min((s.last_day for s in states), default=None)
+    obs = _observations(session, kind, channel_id, metrics, after)
+    if not len(obs["day"]):
+        return 0
+
+    ids, inv = np.unique(obs["entity"], return_inverse=True)
+    pos = {e: i for i, e in enumerate(ids)}
+    k = len(ids)
+    last = np.full(k, np.iinfo(np.int32).min, np.int64)
+    n = {m: np.zeros(k, np.int64) for m in metrics}
+    level = {m: np.zeros(k) for m in metrics}
+    var = {m: np.zeros(k) for m in metrics}
+    weekday = {m: np.zeros((k, 7)) for m in metrics}
+    for s in states:
+        i = pos.get(s.entity_id)
+        if i is None or s.metric not in metrics:
+            continue
+        last[i] = s.last_day.toordinal() - columnar.EPOCH_ORDINAL
+        n[s.metric][i], level[s.metric][i], var[s.metric][i] = s.n, s.level, s.var
+        if s.weekday:
+            weekday[s.metric][i] = np.frombuffer(s.weekday, '<f8')
+
+    # Only days after each entity's own state, oldest first
+    fresh = obs["day"] > last[inv]
+    days, inv = obs["day"][fresh], inv[fresh]
+    values = {m: obs[m][fresh] for m in metrics}
+    order = np.argsort(days, kind="stable")
+    days, inv = days[order], inv[order]
+    values = {m: v[order] for m, v in values.items()}
+
+    alpha, gamma, z_max = config.ANOMALY_ALPHA, config.ANOMALY_WEEKDAY_ALPHA, config.ANOMALY_Z
+    flags = []
+    starts = np.flatnonzero(np.r_[True, days[1:] != days[:-1]])
+    for a, b in zip(starts, np.r_[starts[1:], len(days)]):
+        e, wd = inv[a:b], _weekday(days[a])
+        for m, min_abs in metrics.items():
+            x = values[m][a:b]
+            offset = weekday[m][e, wd]
+            expected = level[m][e] + offset
+            resid = x - expected
+            noise = np.maximum(var[m][e], np.abs(expected)) if m in COUNTS else var[m][e]
+            std = np.sqrt(noise)
+            z = np.divide(resid, std, out=np.zeros_like(resid), where=std > 0)
+            flag = (n[m][e] >= config.ANOMALY_WARMUP_DAYS) & (np.abs(z) > z_max) & (np.abs(resid) >= min_abs)
+            if flag.any():
+                flags.append((m, days[a], e[flag], x[flag], expected[flag], z[flag]))
+            r = np.where(flag, np.sign(resid) * z_max * std, resid)
+            first = n[m][e] == 0
+            level[m][e] = np.where(first, x, level[m][e] + alpha * r)
+            weekday[m][e, wd] = np.where(first, 0.0, offset + gamma * (1 - alpha) * r)
+            var[m][e] = np.where(first, 0.0, (1 - alpha) * (var[m][e] + alpha * r * r))
+            n[m][e] += 1
+        last[e] = days[a]
+
+    touched = np.unique(inv)
+    day_of = lambda d: datetime.date.fromordinal(int(d) + columnar.EPOCH_ORDINAL)
+    upsert(session, S, [
+        {"kind": kind, "entity_id": ids[i], "metric": m, "channel_id": channel_id, "last_day": day_of(last[i]),
+         "n": int(n[m][i]), "level": float(level[m][i]), "var": float(var[m][i]),
+         "weekday": weekday[m][i].astype('<f8').tobytes()}
+        for i in touched for m in metrics
+    ], ['kind', 'entity_id', 'metric'])
+    rows = [{"kind": kind, "entity_id": ids[i], "channel_id": channel_id, "metric": m, "date": day_of(d),
+             "value": float(v), "expected": float(ex), "z": float(zz)}
+            for m, d, es, xs, exs, zs in flags for i, v, ex, zz in zip(es, xs, exs, zs)]
+    upsert(session, Anomaly, rows, ['kind', 'entity_id', 'metric', 'date'])
+    print(f"Anomalies: {len(days)} new {kind} days over {len(touched)} {kind}(s), {len(rows)} flagged "
+          f"in {(time.perf_counter() - t0) * 1000:.0f} ms")
+    return len(rows)
+
+
+def reset(session, channel_id):
+    """Forget a channel's baselines and flags (next update() relearns from the stored history)."""
+    session.execute(delete(S).where(S.channel_id == channel_id))
+    session.execute(delete(Anomaly).where(Anomaly.channel_id == channel_id))
+
+
+def recent(session, channel_id, since, limit=20):
+    """Strongest anomalies on or after `since`, as dashboard dicts (largest |z| first)."""
+    rows = session.execute(
+        select(Anomaly, Video.title).outerjoin(Video, Video.id == Anomaly.entity_id)
+        .where(Anomaly.channel_id == channel_id, Anomaly.date >= since)
+        .order_by(func.abs(Anomaly.z).desc()).limit(limit))
+    return [{
+        "date": a.date.isoformat(),
+        "kind": a.kind,
+        "id": a.entity_id,
+        "title": title if a.kind == "video" else None,
+        "metric": a.metric,
+        "value": round(a.value, 2),
+        "expected": round(a.expected, 2),
+        "z": round(a.z, 1),
+        "direction": "spike" if a.z > 0 else "drop",
+    } for a, title in rows]
@@ -34,11 +34,12 @@ echo "[$DATE] Building Dashboard..." >> "$LOG_FILE"
 
 # Copy build artifacts to root for GitHub Pages
 echo "[$DATE] Deploying to root..." >> "$LOG_FILE"
-cp -r dashboard/dist/* .
+# Replace thumbs/ wholesale: the build holds the current thumbnail cache, so pruned files go too
+rm -rf thumbs && cp -R dashboard/dist/. .
 
 # Git Sync
 echo "[$DATE] Syncing with GitHub..." >> "$LOG_FILE"
-git add -f data/*.csv dashboard_data.json prediction_data.json database.py fetch_data.py prediction.py auto_update.sh index.html assets/ thumbnails/ AI_SOUND_LAB1.png
+git add -f data/*.csv dashboard_data.json prediction_data.json database.py fetch_data.py prediction.py auto_update.sh index.html assets/ thumbs/ AI_SOUND_LAB1.png
 git commit -m "Weekly Update: $DATE" >> "$LOG_FILE" 2>&1
 git push origin main >> "$LOG_FILE" 2>&1
 
@@ -0,0 +1,245 @@
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import argparse
+import datetime
+import tempfile
+import statistics
+import subprocess
+from pathlib import Path
+
+import config
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+RESULTS_DIR = config.DATA_DIR / "benchmarks"
+BASELINE_FILE = RESULTS_DIR / "baselines.json"
+
+# Synthetic DB sizes for the render/predict benchmarks (replay.SyntheticBackend specs)
+SCALES = [
+    "videos=100,years=1,comments=200",
+    "videos=1000,years=3,comments=2000",
+    "videos=10000,years=5,comments=20000",
+]
+# A measurement regresses when it exceeds its baseline by this factor (plus SECONDS_SLACK for timings)
+THRESHOLDS = {"seconds": 1.25, "peak_rss_mb": 1.2, "output_bytes": 1.1, "sql_statements": 1.0}
+SECONDS_SLACK = 0.05
+
+
+def run_sync(root, source_args, init):
+    """Run fetch_data.py in a subprocess sandboxed under `root`; return (seconds, run metrics)."""
+    env = dict(os.environ, YOUTUBE_OUTPUT_ROOT=root, PYTHONUNBUFFERED="1")
+    # --force: a benchmark must run every stage even if the pipeline state says it is up to date
+    cmd = [sys.executable, os.path.join(HERE, "fetch_data.py"), "--force"] + source_args + (["--init"] if init else [])
+    t0 = time.perf_counter()
+    proc = subprocess.run(cmd, env=env, cwd=root, capture_output=True, text=True)
+    elapsed = time.perf_counter() - t0
+    if proc.returncode != 0:
+        print(proc.stdout[-2000:])
+        print(proc.stderr[-2000:])
+        raise SystemExit(f"Sync failed with exit code {proc.returncode}")
+    with open(os.path.join(root, "data", "metrics", "latest.json")) as f:
+        return elapsed, json.load(f)
+
+
+def print_run(label, elapsed, metrics):
+    print(f"\n--- {label}: {elapsed:.2f}s wall, {metrics['quota_units']} quota units ---")
+    print(f"{'stage':<16}{'seconds':>10}{'calls':>8}{'rows':>10}{'bytes':>12}")
+    for name, s in metrics["stages"].items():
+        print(f"{name:<16}{s['seconds']:>10.2f}{s['calls']:>8}{s['rows']:>10}{s['bytes']:>12}")
+
+
+def bench_sync(args):
+    if args.replay:
+        source = ["--replay", args.replay]
+        label = f"replay:{args.replay}"
+    else:
+        spec = f"videos={args.videos},years={args.years},comments={args.comments}"
+        source = ["--synthetic", spec]
+        label = f"synthetic:{spec}"
+    source += ["--latency", str(args.latency)]
+
+    root = tempfile.mkdtemp(prefix="yt-bench-")
+    print(f"Benchmarking sync ({label}, latency {args.latency}ms) in {root}")
+    results = {"source": label, "latency_ms": args.latency, "runs": []}
+    try:
+        for n in range(args.runs):
+            # Every run starts from an empty DB: full --init backfill, then an incremental sync on top
+            for mode, init in (("init", True), ("incremental", False)):
+                elapsed, metrics = run_sync(root, source, init)
+                print_run(f"run {n + 1} {mode}", elapsed, metrics)
+                results["runs"].append({"mode": mode, "seconds": round(elapsed, 3), "metrics": metrics})
+            os.remove(os.path.join(root, "youtube_data.db"))
+    finally:
+        if args.keep:
+            print(f"Sandbox kept at {root}")
+        else:
+            shutil.rmtree(root, ignore_errors=True)
+
+    RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+    out = RESULTS_DIR / f"sync-{datetime.datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    with open(out, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults written to {out}")
+
+
+def build_db(spec, rebuild=False):
+    """Sandbox root holding a synced synthetic DB for `spec`, built once per day and then reused.
+
+    Synthetic history ends today, so a DB from an earlier day would leave the
+    render's recent windows empty; older builds of the spec are removed.
+    """
+    slug = re.sub(r"\W+", "-", spec)
+    root = RESULTS_DIR / "dbs" / f"{slug}-{datetime.date.today().isoformat()}"
+    if rebuild:
+        shutil.rmtree(root, ignore_errors=True)
+    if (root / "youtube_data.db").exists():
+        return root
+    for old in (RESULTS_DIR / "dbs").glob(f"{slug}-*"):
+        shutil.rmtree(old, ignore_errors=True)
+    root.mkdir(parents=True)
+    print(f"Building synthetic DB ({spec}) in {root}")
+    # Everything but the render itself, which is what gets measured
+    elapsed, _ = run_sync(str(root), ["--synthetic", spec, "--skip", "json"], init=True)
+    print(f"  built in {elapsed:.1f}s, {os.path.getsize(root / 'youtube_data.db') / 2**20:.1f} MiB")
+    return root
+
+
+def measure(target):
+    """Run one render or forecast in this (fresh) process and print its measurements as JSON.
+
+    The AI stage is left out of the render (with_ai=False keeps the previous
+    analysis), as in `cli.py render`.
+    """
+    import resource
+    from database import get_session, enable_sql_profiling
+    from cli import channel_ids
+
+    sql = {"count": 0, "seconds": 0.0}
+
+    def record(statement, seconds):
+        sql["count"] += 1
+        sql["seconds"] += seconds
+
+    session = get_session()
+    channel_id = channel_ids(session, None)[0]
+    if target == "render":
+        import fetch_data
+        run = lambda: fetch_data.generate_frontend_json(session, channel_id, with_ai=False)
+    else:
+        import channels
+        import prediction
+        path = channels.bundle_dir(channel_id) / "prediction_data.json"
+        run = lambda: prediction.generate_predictions(channel_id, path) or path
+    enable_sql_profiling(record)
+    t0 = time.perf_counter()
+    out = run()
+    elapsed = time.perf_counter() - t0
+    session.close()
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (2**20 if sys.platform == "darwin" else 2**10)
+    print(json.dumps({"seconds": round(elapsed, 3), "peak_rss_mb": round(peak, 1),
+                      "output_bytes": os.path.getsize(out), "sql_statements": sql["count"],
+                      "sql_seconds": round(sql["seconds"], 3)}))
+
+
+def run_measure(root, target):
+    env = dict(os.environ, YOUTUBE_OUTPUT_ROOT=str(root), PYTHONUNBUFFERED="1")
+    proc = subprocess.run([sys.executable, os.path.abspath(__file__), "measure", target],
+                          env=env, cwd=root, capture_output=True, text=True)
+    if proc.returncode != 0:
+        print(proc.stdout[-2000:])
+        print(proc.stderr[-2000:])
+        raise SystemExit(f"{target} failed with exit code {proc.returncode}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def compare(current, baseline):
+    """[(measurement, current, baseline)] for measurements over their regression threshold."""
+    regressions = []
+    for key, factor in THRESHOLDS.items():
+        if key not in baseline:
+            continue
+        limit = baseline[key] * factor + (SECONDS_SLACK if key == "seconds" else 0)
+        if current[key] > limit:
+            regressions.append((key, current[key], baseline[key]))
+    return regressions
+
+
+def bench_scale(args):
+    """Time render or predict on synthetic DBs at several scales against the stored baselines."""
+    baselines = {}
+    if args.baseline.exists():
+        with open(args.baseline) as f:
+            baselines = json.load(f)
+    results = {"target": args.command, "runs": args.runs, "scales": {}}
+    regressions = []
+    for spec in args.scale or SCALES:
+        root = build_db(spec, args.rebuild)
+        # One fresh process per run: every run pays the same cold caches and the peak RSS is its own
+        runs = [run_measure(root, args.command) for _ in range(args.runs)]
+        current = dict(runs[-1], seconds=round(statistics.median(r["seconds"] for r in runs), 3),
+                       peak_rss_mb=max(r["peak_rss_mb"] for r in runs))
+        results["scales"][spec] = current
+        base = baselines.get(args.command, {}).get(spec)
+        print(f"\n--- {args.command} {spec} ---")
+        print(f"{'measurement':<16}{'current':>14}{'baseline':>14}")
+        for key in ("seconds", "peak_rss_mb", "output_bytes", "sql_statements", "sql_seconds"):
+            old = f"{base[key]:,}" if base and key in base else "-"
+            print(f"{key:<16}{current[key]:>14,}{old:>14}")
+        for key, value, old in compare(current, base or {}):
+            print(f"REGRESSION: {key} {value:,} vs baseline {old:,} (threshold x{THRESHOLDS[key]})")
+            regressions.append((spec, key))
+
+    RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+    out = RESULTS_DIR / f"{args.command}-{datetime.datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    with open(out, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults written to {out}")
+    if args.save_baseline:
+        baselines.setdefault(args.command, {}).update(results["scales"])
+        with open(args.baseline, 'w') as f:
+            json.dump(baselines, f, indent=2)
+        print(f"Baselines updated in {args.baseline}")
+    elif regressions:
+        raise SystemExit(f"{len(regressions)} regression(s) over the thresholds")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end performance benchmarks")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("sync", help="Time a full --init and an incremental sync against a local API stand-in")
+    p.add_argument("--videos", type=int, default=1000)
+    p.add_argument("--years", type=float, default=3)
+    p.add_argument("--comments", type=int, default=2000)
+    p.add_argument("--latency", type=float, default=0.0, help="Per-request latency in ms")
+    p.add_argument("--replay", metavar="DIR", help="Use recorded fixtures instead of the synthetic generator")
+    p.add_argument("--runs", type=int, default=1)
+    p.add_argument("--keep", action="store_true", help="Keep the sandbox directory for inspection")
+    p.set_defaults(func=bench_sync)
+
+    for target, help in (("render", "Time generate_frontend_json (no AI) on synthetic DBs at several scales"),
+                         ("predict", "Time prediction.generate_predictions on synthetic DBs at several scales")):
+        p = sub.add_parser(target, help=help)
+        p.add_argument("--scale", action="append", metavar="SPEC",
+                       help=f"Synthetic DB spec, repeatable (default: {'; '.join(SCALES)})")
+        p.add_argument("--runs", type=int, default=3, help="Runs per scale; the median time is reported")
+        p.add_argument("--baseline", type=Path, default=BASELINE_FILE, help="Baselines to compare against")
+        p.add_argument("--save-baseline", action="store_true", help="Store this run as the new baselines")
+        p.add_argument("--rebuild", action="store_true", help="Rebuild today's synthetic DBs")
+        p.set_defaults(func=bench_scale)
+
+    # Internal: one measurement in a fresh process (see run_measure)
+    p = sub.add_parser("measure")
+    p.add_argument("target", choices=["render", "predict"])
+    p.set_defaults(func=lambda args: measure(args.target))
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+import os
+import json
+
+import config
+
+# Registry key used when there is no channels.json: the legacy single-channel layout
+DEFAULT_KEY = "default"
+
+
+def load_registry(path=None):
+    """Return the managed channels as dicts: key, channel_id, token_file.
+
+    channels.json is a list of {"key", "channel_id", "token_file"} objects
+    (see channels.example.json); token paths are relative to the repo.
+    """
+    path = path or config.CHANNELS_FILE
+    if not os.path.exists(path):
+        return [{"key": DEFAULT_KEY, "channel_id": None, "token_file": str(config.TOKEN_FILE)}]
+
+    with open(path) as f:
+        entries = json.load(f)
+    seen = set()
+    for e in entries:
+        missing = [k for k in ("key", "channel_id", "token_file") if not e.get(k)]
+        if missing:
+            raise ValueError(f"{path}: entry {e} is missing {', '.join(missing)}")
+        if e["key"] in seen:
+            raise ValueError(f"{path}: duplicate channel key '{e['key']}'")
+        seen.add(e["key"])
+        e["token_file"] = str(config.BASE_DIR / e["token_file"])
+    return entries
+
+
+def select(entries, keys=None):
+    if not keys:
+        return entries
+    known = {e["key"]: e for e in entries}
+    unknown = [k for k in keys if k not in known]
+    if unknown:
+        raise SystemExit(f"Unknown channel(s): {', '.join(unknown)}. Registered: {', '.join(known)}")
+    return [known[k] for k in keys]
+
+
+def is_legacy(entry):
+    return entry["key"] == DEFAULT_KEY
+
+
+def state_path(entry, legacy_path):
+    """Per-channel variant of a state file; the legacy layout keeps the old path."""
+    if is_legacy(entry):
+        return legacy_path
+    path = config.CHANNELS_STATE_DIR / entry["key"] / os.path.basename(legacy_path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def bundle_dir(channel_id):
+    return config.CHANNELS_PUBLIC_DIR / channel_id
+
+
+def single_channel():
+    """True when outputs should also go to the legacy top-level dashboard files."""
+    return len(load_registry()) == 1
+
+
+def write_index(channels):
+    """Write channels/index.json listing every channel with a dashboard bundle.
+
+    Rebuilt from the DB rows passed in on every render and replaced atomically,
+    so concurrent per-channel renders never merge a stale copy.
+    """
+    listed = [{"channel_id": c.id, "name": c.name, "profile_image": c.profile_image,
+               "bundle": f"channels/{c.id}/dashboard_data.json"}
+              for c in channels if (bundle_dir(c.id) / "dashboard_data.json").exists()]
+    config.CHANNELS_PUBLIC_DIR.mkdir(parents=True, exist_ok=True)
+    path = config.CHANNELS_PUBLIC_DIR / "index.json"
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'w') as f:
+        json.dump({"channels": listed}, f, indent=2, ensure_ascii=False)
+    os.replace(tmp, path)
+    return path
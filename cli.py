@@ -0,0 +1,442 @@
+"""Single entry point for the YouTube insight pipeline.
+
+    python cli.py sync [--init] [--only ...]   fetch from the APIs into the DB, then render
+    python cli.py render [--channel ID]         re-render dashboard JSON from the DB (no AI)
+    python cli.py predict [--channel ID]        regenerate prediction_data.json
+    python cli.py predict --tune [--force]      cross-validate forecast settings per metric and store the best
+    python cli.py analyze [--channel ID]        predictions + Ollama insights + render
+    python cli.py snapshot [--channel ID]       rebuild the Parquet snapshots from the DB
+    python cli.py cube DIMENSION [--start/--end] top members of a breakdown for any date window
+    python cli.py competitors [--days N]        competitor and competitor-video growth from the history
+    python cli.py compact [--no-vacuum]         fold old video_daily_stats into weekly/monthly rows
+    python cli.py thumbnails                    download uncached video thumbnails + AVIF/WebP variants
+    python cli.py search WORDS [--channel ID]   full-text search over comments and replies
+    python cli.py anomalies [--days N]          days flagged by the EWMA anomaly detector
+    python cli.py similar [VIDEO_ID...|--title] competitor videos with the most similar titles
+    python cli.py formats [--days N]            views/watch time/revenue split by Shorts and video length
+    python cli.py import [FILE] [--table T]     stream a CSV/Parquet file into channel/video daily stats
+    python cli.py export TABLE FILE             stream a table (channel/date range) to CSV/Parquet
+    python cli.py verify [--import-budget]      DB sanity counts / startup time check
+
+render/analyze/predict cover every channel in the DB unless --channel is given.
+
+Each subcommand imports only what it needs; keep module-level imports here
+limited to the standard library.
+"""
+import os
+import sys
+import time
+import argparse
+import subprocess
+
+# Seconds allowed for the imports a subcommand pulls in before doing any work,
+# and heavy modules that must not be loaded by that point.
+IMPORT_BUDGETS = {
+    "render": (1.5, ["fetch_data"], ["pandas", "xgboost", "sklearn", "googleapiclient", "google_auth_oauthlib",
+                                     "prediction"]),
+    "verify": (1.0, ["database"], ["pandas", "xgboost", "sklearn", "googleapiclient"]),
+    "predict": (3.0, ["prediction"], ["xgboost", "sklearn", "googleapiclient"]),
+}
+
+
+def channel_ids(session, requested=None):
+    from database import Channel
+    if requested:
+        return [requested]
+    return [ch.id for ch in session.query(Channel).order_by(Channel.id)]
+
+
+def cmd_sync(args):
+    import fetch_data
+    fetch_data.main(args.rest)
+
+
+def cmd_render(args, with_ai=False):
+    from database import init_db, get_session
+    import fetch_data
+
+    init_db()
+    session = get_session()
+    cids = channel_ids(session, args.channel)
+    if not cids:
+        print("No channels in the DB; run `cli.py sync` first.")
+    for cid in cids:
+        print(f"Using CID: {cid}")
+        fetch_data.generate_frontend_json(session, cid, with_ai=with_ai)
+
+
+def cmd_analyze(args):
+    cmd_render(args, with_ai=True)
+
+
+def cmd_predict(args):
+    import prediction
+    prediction.main(args.rest)
+
+
+def cmd_snapshot(args):
+    from database import init_db, get_session
+    import snapshots
+
+    if not snapshots.available():
+        sys.exit("Parquet snapshots need pyarrow (and USE_SNAPSHOTS != 0)")
+    init_db()
+    session = get_session()
+    for cid in channel_ids(session, args.channel):
+        t0 = time.perf_counter()
+        counts = snapshots.rebuild(cid)
+        print(f"{cid}: {counts} in {time.perf_counter() - t0:.2f}s")
+
+
+def cmd_cube(args):
+    import datetime
+    from database import init_db, get_session
+    import cube
+
+    init_db()
+    session = get_session()
+    if args.rebuild:
+        for cid in channel_ids(session, args.channel):
+            cube.rebuild(session, cid)
+            session.commit()
+            print(f"{cid}: cube rebuilt")
+        return
+    end = datetime.date.fromisoformat(args.end) if args.end else datetime.date.today()
+    start = datetime.date.fromisoformat(args.start) if args.start else end - datetime.timedelta(days=30)
+    for cid in channel_ids(session, args.channel):
+        print(f"{cid}: top {args.dimension} {start} .. {end}")
+        for member, views, watch_time, share in cube.window(session, cid, args.dimension, start, end,
+                                                            limit=args.top, order_by=args.order_by):
+            print(f"  {member:<28} views={views:>12,.0f}  minutes={watch_time:>14,.1f}  share={share:6.2f}")
+
+
+def cmd_competitors(args):
+    from database import init_db, get_session, CompetitorChannel, CompetitorVideo
+    import competitors
+
+    init_db()
+    session = get_session()
+    end = time.time()
+    start = end - args.days * 86400
+    names = {c.channel_id: c.channel_name for c in session.query(CompetitorChannel)}
+    print(f"Competitor growth over the last {args.days} days")
+    for cid, m in sorted(competitors.growth(session, competitors.CHANNEL, start, end).items(),
+                         key=lambda kv: -kv[1].get("subscribers", (0, 0, 0, 0))[2]):
+        subs, views = m.get("subscribers", (0, 0, 0, 0)), m.get("views", (0, 0, 0, 0))
+        print(f"  {names.get(cid, cid):<32} subs {subs[1]:>12,} ({subs[2]:+,}, {subs[3]:+,.1f}/day)  "
+              f"views {views[1]:>15,} ({views[2]:+,}, {views[3]:+,.0f}/day)")
+    if args.videos:
+        titles = {v.video_id: v.title for v in session.query(CompetitorVideo)}
+        print("Competitor videos by views gained")
+        rows = competitors.growth(session, competitors.VIDEO, start, end)
+        for vid, m in sorted(rows.items(), key=lambda kv: -kv[1].get("views", (0, 0, 0, 0))[2])[:args.videos]:
+            views = m.get("views", (0, 0, 0, 0))
+            print(f"  {(titles.get(vid) or vid)[:48]:<48} views {views[1]:>13,} ({views[2]:+,}, {views[3]:+,.0f}/day)")
+
+
+def cmd_compact(args):
+    from database import init_db
+    import retention
+
+    init_db()
+    removed = retention.compact()
+    retention.optimize(vacuum=removed > 0 and not args.no_vacuum)
+
+
+def cmd_thumbnails(args):
+    import requests
+    from database import init_db, get_session
+    import thumbnails
+
+    init_db()
+    thumbnails.sync(get_session(), requests.get, workers=args.workers)
+
+
+def cmd_search(args):
+    from database import init_db, get_session, search_comments
+
+    init_db()
+    session = get_session()
+    rows = search_comments(session, " ".join(args.words), channel_id=args.channel, limit=args.limit)
+    for r in rows:
+        kind = "reply" if r.parent_id else "thread"
+        print(f"{r.published_at}  {r.video_id}  [{kind}] {r.author_name}: {(r.text or '').replace(chr(10), ' ')[:100]}")
+    print(f"{len(rows)} match(es)")
+
+
+def cmd_anomalies(args):
+    import datetime
+    from database import init_db, get_session
+    import anomalies
+
+    init_db()
+    session = get_session()
+    since = datetime.date.today() - datetime.timedelta(days=args.days)
+    for cid in channel_ids(session, args.channel):
+        if args.rebuild:
+            anomalies.reset(session, cid)
+            anomalies.update(session, "channel", cid)
+            anomalies.update(session, "video", cid)
+            session.commit()
+        rows = anomalies.recent(session, cid, since, limit=args.top)
+        print(f"{cid}: {len(rows)} anomalies since {since}")
+        for a in rows:
+            name = a["title"] or a["id"] if a["kind"] == "video" else "channel"
+            print(f"  {a['date']}  {a['direction']:<5} z={a['z']:+6.1f}  {a['metric']:<18} "
+                  f"{a['value']:>12,.2f} (expected {a['expected']:,.2f})  {name[:48]}")
+
+
+def cmd_similar(args):
+    import datetime
+    from database import init_db, get_session
+    import similarity
+
+    init_db()
+    session = get_session()
+    embedder = similarity.default_embedder()
+    index = similarity.refresh(similarity.corpus(session), embedder) if args.refresh else similarity.open_index()
+    if index is None:
+        raise SystemExit("No similarity index yet: run a sync or `cli.py similar --refresh`")
+    embedder.load(index.state)
+    kind = None if args.all else similarity.COMPETITOR
+    if args.title:
+        queries = [(args.title, embedder([args.title])[0])]
+    else:
+        ids = args.video_ids
+        if not ids:  # the channel's most viewed videos of the last 30 days
+            import retention
+            end = datetime.date.today()
+            totals = retention.video_totals(session, end - datetime.timedelta(days=30), end, args.channel)
+            ids = sorted(totals, key=lambda v: -(totals[v]["views"] or 0))[:10]
+        vectors, found = index.vectors([(similarity.OWN, v) for v in ids])
+        queries = [(index.titles[index.rows[key]], vec) for key, vec in zip(found, vectors)]
+    t0 = time.perf_counter()
+    skip_self = kind is None and not args.title
+    hits = index.nearest([vec for _, vec in queries], args.k + skip_self, kind=kind)
+    elapsed = (time.perf_counter() - t0) * 1000
+    for (title, _), rows in zip(queries, hits):
+        print(title)
+        for r, score in rows:
+            if skip_self and index.titles[r] == title and score > 0.9999:
+                continue  # the query itself
+            print(f"  {score:.3f}  [{index.kinds[r]}] {index.ids[r]}  {index.titles[r][:70]}")
+    print(f"{len(queries)} queries over {len(index.ids)} titles in {elapsed:.1f} ms")
+
+
+def cmd_formats(args):
+    import datetime
+    from database import init_db, get_session
+    import formats
+
+    init_db()
+    session = get_session()
+    end = datetime.date.today()
+    start = end - datetime.timedelta(days=args.days)
+    for cid in channel_ids(session, args.channel):
+        if args.rebuild:
+            changed, rows = formats.rebuild(session, cid)
+            session.commit()
+            print(f"{cid}: {changed} videos reclassified, {rows} format rows rebuilt")
+        print(f"{cid}: by format {start} .. {end}")
+        for r in formats.totals(session, cid, start, end):
+            print(f"  {r['segment']:<8} videos={r['videos']:>6,}  views={r['views'] or 0:>12,}  "
+                  f"minutes={r['watch_time_minutes'] or 0:>14,.1f}  revenue={r['estimated_revenue'] or 0:>10,.2f}")
+
+
+def cmd_import(args):
+    import config
+    from database import init_db, get_session
+    import transfer
+
+    path = args.file or config.STATS_FILE
+    if not os.path.exists(path):
+        sys.exit(f"{path} not found; pass the CSV or Parquet file to import")
+    init_db()
+    channel = args.channel
+    if args.table == "channel_daily" and not channel:
+        known = channel_ids(get_session())
+        channel = known[0] if len(known) == 1 else None  # only unambiguous with a single channel
+    transfer.import_file(path, args.table, channel_id=channel, chunk_rows=args.chunk)
+
+
+def cmd_export(args):
+    import datetime
+    import transfer
+
+    parse = lambda d: datetime.date.fromisoformat(d) if d else None
+    transfer.export_table(args.table, args.file, channel_id=args.channel, start=parse(args.start),
+                          end=parse(args.end), chunk_rows=args.chunk)
+
+
+def cmd_verify(args):
+    from sqlalchemy import func
+    import database
+
+    ok = True
+    session = database.get_session()
+    print(f"Database: {database.DB_NAME}")
+    label = f"Storage profile '{database.config.SQLITE_PROFILE}'" if database.IS_SQLITE else "Storage"
+    print(f"{label}: {database.describe_storage()}")
+    for model in (database.Channel, database.ChannelDaily, database.Video, database.VideoDaily,
+                  database.Comment, database.Geography, database.TrafficSource, database.CompetitorChannel):
+        try:
+            count = session.query(func.count()).select_from(model).scalar()
+        except Exception as e:
+            print(f"  {model.__tablename__:<28} ERROR {e}")
+            ok = False
+            continue
+        print(f"  {model.__tablename__:<28} {count:>10}")
+
+    if args.import_budget:
+        ok = check_import_budgets() and ok
+    sys.exit(0 if ok else 1)
+
+
+def probe_imports(modules, forbidden):
+    """(seconds, heavy modules loaded) for importing `modules` in a fresh interpreter.
+
+    Raises RuntimeError with the child's stderr when an import fails.
+    """
+    here = os.path.dirname(os.path.abspath(__file__))
+    probe = (
+        "import sys, time\n"
+        "t = time.perf_counter()\n"
+        f"for m in {modules!r}: __import__(m)\n"
+        "elapsed = time.perf_counter() - t\n"
+        f"loaded = [m for m in {forbidden!r} if m in sys.modules]\n"
+        "print(elapsed); print(','.join(loaded))\n"
+    )
+    proc = subprocess.run([sys.executable, "-c", probe], cwd=here, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr[-1000:])
+    elapsed_line, loaded_line = (proc.stdout.strip().splitlines() + [""])[:2]
+    return float(elapsed_line), [m for m in loaded_line.split(",") if m]
+
+
+def check_import_budgets():
+    """Import each subcommand's modules in a fresh interpreter and compare against its budget."""
+    ok = True
+    print(f"\n{'command':<10}{'seconds':>10}{'budget':>10}  heavy modules loaded")
+    for command, (budget, modules, forbidden) in IMPORT_BUDGETS.items():
+        try:
+            elapsed, loaded = probe_imports(modules, forbidden)
+        except RuntimeError as e:
+            print(f"{command:<10} import failed:\n{e}")
+            ok = False
+            continue
+        status = "OK" if elapsed <= budget and not loaded else "FAIL"
+        ok = ok and status == "OK"
+        print(f"{command:<10}{elapsed:>10.3f}{budget:>10.1f}  {','.join(loaded) or '-'}  {status}")
+    return ok
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="YouTube Insight Pipeline")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("sync", help="Fetch from the YouTube APIs and render (args go to fetch_data.py)",
+                       add_help=False)
+    p.set_defaults(func=cmd_sync, passthrough=True)
+
+    p = sub.add_parser("render", help="Re-render dashboard JSON from the DB, keeping the last AI insights")
+    p.add_argument("--channel", help="Channel ID (default: every channel in the DB)")
+    p.set_defaults(func=cmd_render)
+
+    p = sub.add_parser("predict", help="Regenerate prediction_data.json (args go to prediction.py)",
+                       add_help=False)
+    p.set_defaults(func=cmd_predict, passthrough=True)
+
+    p = sub.add_parser("analyze", help="Run predictions + Ollama analysis and render")
+    p.add_argument("--channel", help="Channel ID (default: every channel in the DB)")
+    p.set_defaults(func=cmd_analyze)
+
+    p = sub.add_parser("snapshot", help="Re-export every month of the Parquet snapshots")
+    p.add_argument("--channel", help="Channel ID (default: every channel in the DB)")
+    p.set_defaults(func=cmd_snapshot)
+
+    p = sub.add_parser("cube", help="Top traffic sources/countries/age groups/genders for a date window")
+    p.add_argument("dimension", nargs="?", default="country", choices=["traffic", "country", "age", "gender"])
+    p.add_argument("--channel", help="Channel ID (default: every channel in the DB)")
+    p.add_argument("--start", help="YYYY-MM-DD (default: 30 days before --end)")
+    p.add_argument("--end", help="YYYY-MM-DD (default: today)")
+    p.add_argument("--top", type=int, default=10)
+    p.add_argument("--order-by", default="views", choices=["views", "watch_time", "share"])
+    p.add_argument("--rebuild", action="store_true", help="Recompute the cube from the breakdown tables")
+    p.set_defaults(func=cmd_cube)
+
+    p = sub.add_parser("competitors", help="Competitor growth from the competitor history")
+    p.add_argument("--days", type=int, default=30)
+    p.add_argument("--videos", type=int, default=10, help="Also list the N fastest-growing competitor videos")
+    p.set_defaults(func=cmd_competitors)
+
+    p = sub.add_parser("compact", help="Apply the video_daily_stats retention tiers, then VACUUM/ANALYZE")
+    p.add_argument("--no-vacuum", action="store_true", help="Only ANALYZE after compacting")
+    p.set_defaults(func=cmd_compact)
+
+    p = sub.add_parser("thumbnails", help="Fill the content-addressed thumbnail cache")
+    p.add_argument("--workers", type=int, help="Parallel downloads (default: config.THUMBNAIL_WORKERS)")
+    p.set_defaults(func=cmd_thumbnails)
+
+    p = sub.add_parser("search", help="Full-text search over stored comments")
+    p.add_argument("words", nargs="+")
+    p.add_argument("--channel", help="Channel ID (default: every channel in the DB)")
+    p.add_argument("--limit", type=int, default=20)
+    p.set_defaults(func=cmd_search)
+
+    p = sub.add_parser("anomalies", help="Days flagged by the streaming anomaly detector")
+    p.add_argument("--channel", help="Channel ID (default: every channel in the DB)")
+    p.add_argument("--days", type=int, default=30)
+    p.add_argument("--top", type=int, default=20)
+    p.add_argument("--rebuild", action="store_true",
+                   help="Relearn the baselines from the stored daily history (e.g. after changing thresholds)")
+    p.set_defaults(func=cmd_anomalies)
+
+    p = sub.add_parser("similar", help="Nearest competitor (or all) video titles from the similarity index")
+    p.add_argument("video_ids", nargs="*", help="Own video IDs (default: the most viewed of the last 30 days)")
+    p.add_argument("--title", help="Query with free text instead")
+    p.add_argument("--channel", help="Channel ID for the default query videos")
+    p.add_argument("-k", type=int, default=5)
+    p.add_argument("--all", action="store_true", help="Search own videos too, not only competitors'")
+    p.add_argument("--refresh", action="store_true", help="Embed new titles into the index first")
+    p.set_defaults(func=cmd_similar)
+
+    p = sub.add_parser("formats", help="Views, watch time and revenue by format (Shorts, length buckets)")
+    p.add_argument("--channel", help="Channel ID (default: every channel in the DB)")
+    p.add_argument("--days", type=int, default=30)
+    p.add_argument("--rebuild", action="store_true",
+                   help="Re-parse durations, reclassify Shorts and recompute the format rows")
+    p.set_defaults(func=cmd_formats)
+
+    p = sub.add_parser("import", help="Stream a CSV/Parquet file of daily stats into the DB")
+    p.add_argument("file", nargs="?", default=None, help="Default: the legacy data/youtube_stats.csv")
+    p.add_argument("--table", default="channel_daily", choices=["channel_daily", "video_daily"])
+    p.add_argument("--channel", help="Channel ID for channel_daily files without a channel_id column")
+    p.add_argument("--chunk", type=int, help="Rows per chunk (default: config.TRANSFER_CHUNK_ROWS)")
+    p.set_defaults(func=cmd_import)
+
+    p = sub.add_parser("export", help="Stream a table to a CSV/Parquet file (by extension)")
+    p.add_argument("table", help="A DB table name, or channel_daily / video_daily")
+    p.add_argument("file")
+    p.add_argument("--channel", help="Only rows of this channel (tables with channel_id/video_id)")
+    p.add_argument("--start", help="YYYY-MM-DD (tables with a date column)")
+    p.add_argument("--end", help="YYYY-MM-DD")
+    p.add_argument("--chunk", type=int, help="Rows per chunk (default: config.TRANSFER_CHUNK_ROWS)")
+    p.set_defaults(func=cmd_export)
+
+    p = sub.add_parser("verify", help="Print DB table counts")
+    p.add_argument("--import-budget", action="store_true",
+                   help="Also check per-subcommand import time budgets (exit 1 on regression)")
+    p.set_defaults(func=cmd_verify)
+
+    # sync/predict hand their remaining arguments to the underlying script's parser
+    args, rest = parser.parse_known_args(argv)
+    if rest and not getattr(args, 'passthrough', False):
+        parser.error(f"unrecognized arguments: {' '.join(rest)}")
+    args.rest = rest
+    t0 = time.perf_counter()
+    args.func(args)
+    print(f"[{args.command}] done in {time.perf_counter() - t0:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
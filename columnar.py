@@ -0,0 +1,102 @@
+import datetime
+
+import numpy as np
+
+# dtype marker for date columns: decoded to int32 days since 1970-01-01
+DAYS = "days"
+EPOCH_ORDINAL = datetime.date(1970, 1, 1).toordinal()
+
+
+def column_dtype(column):
+    """NumPy dtype (or DAYS) for a SQLAlchemy column."""
+    from sqlalchemy import Date, Float, Integer
+    if isinstance(column.type, Date):
+        return DAYS
+    if isinstance(column.type, Integer):
+        return np.int64
+    if isinstance(column.type, Float):
+        return np.float64
+    return object
+
+
+def stream_columns(conn, stmt, dtypes, batch=5000):
+    """Execute a Core select and decode each result column into a typed array.
+
+    `dtypes` maps result column name -> numpy dtype or DAYS, in select order.
+    Rows arrive in `batch`-sized partitions (server-side cursor where the
+    driver has one) and are written into arrays preallocated from a COUNT,
+    so no per-row objects or intermediate copies of the history are kept.
+    NULLs become 0.
+    """
+    from sqlalchemy import select, func
+
+    names = list(dtypes)
+    size = conn.execute(select(func.count()).select_from(stmt.subquery())).scalar() or 0
+    out = {n: np.zeros(size, np.int32 if dtypes[n] == DAYS else dtypes[n]) for n in names}
+    pos = 0
+    # Options on the statement, not the connection: Connection.execution_options() mutates the
+    # caller's (session) connection in place and would leave every later query streaming
+    result = conn.execute(stmt.execution_options(yield_per=batch))
+    for rows in result.partitions():
+        end = pos + len(rows)
+        if end > size:  # rows committed between the COUNT and the select
+            size = max(end, size * 2)
+            out = {n: np.resize(a, size) for n, a in out.items()}
+        for i, n in enumerate(names):
+            if dtypes[n] == DAYS:
+                out[n][pos:end] = [r[i].toordinal() - EPOCH_ORDINAL for r in rows]
+            else:
+                out[n][pos:end] = [r[i] or 0 for r in rows]
+        pos = end
+    return {n: a[:pos] for n, a in out.items()}
+
+
+def from_arrow(table, dtypes):
+    """Same result shape as stream_columns() from a pyarrow Table (zero-copy where possible)."""
+    import pyarrow as pa
+    out = {}
+    for n, dtype in dtypes.items():
+        col = table.column(n)
+        if dtype == DAYS:
+            out[n] = col.cast(pa.int32()).to_numpy()
+        else:
+            out[n] = col.fill_null(0).to_numpy().astype(dtype, copy=False)
+    return out
+
+
+def day_strings(days):
+    """int days since epoch -> 'YYYY-MM-DD' strings."""
+    return np.datetime_as_string(days.astype('datetime64[D]'), unit='D').tolist()
+
+
+def _bin_sums(keys, series, step, first):
+    idx = (keys - first) // step
+    nbins = int(idx.max()) + 1 if len(idx) else 0
+    sums = {}
+    for name, values in series.items():
+        s = np.bincount(idx, weights=values, minlength=nbins)
+        sums[name] = np.rint(s).astype(np.int64) if values.dtype.kind in "iu" else s
+    return nbins, sums
+
+
+def rollup_weekly(days, series):
+    """Sum into weeks ending on Monday, labelled by that Monday (pandas 'W-MON')."""
+    if not len(days):
+        return days, {n: v[:0] for n, v in series.items()}
+    weekday = (days + 3) % 7                 # 1970-01-01 was a Thursday; Monday = 0
+    labels = days + (-weekday) % 7           # the Monday on or after each day
+    first = labels.min()
+    nbins, sums = _bin_sums(labels, series, 7, first)
+    return first + 7 * np.arange(nbins), sums
+
+
+def rollup_monthly(days, series):
+    """Sum into calendar months, labelled by the month's last day (pandas 'ME')."""
+    if not len(days):
+        return days, {n: v[:0] for n, v in series.items()}
+    months = days.astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+    first = months.min()
+    nbins, sums = _bin_sums(months, series, 1, first)
+    month_ends = (np.arange(first + 1, first + nbins + 1).astype('datetime64[M]').astype('datetime64[D]')
+                  - np.timedelta64(1, 'D'))
+    return month_ends.astype(np.int64), sums
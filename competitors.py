@@ -0,0 +1,92 @@
+import os
+import json
+import time
+
+from sqlalchemy import text, select, func, case, and_
+
+import config
+from database import CompetitorHistory as H
+
+# History entity kinds and counter codes (stored as small ints in competitor_history)
+CHANNEL, VIDEO = 0, 1
+METRICS = {
+    CHANNEL: {"subscribers": 1, "views": 2, "videos": 3},
+    VIDEO: {"views": 1, "likes": 2, "comments": 3},
+}
+
+# Appends the change since the last stored value, computed inside the statement
+RECORD_SQL = text("""
+    INSERT INTO competitor_history (kind, entity_id, metric, ts, delta)
+    SELECT :kind, :entity_id, :metric, :ts, :value - last.total
+    FROM (SELECT COALESCE(SUM(delta), 0) AS total FROM competitor_history
+          WHERE kind = :kind AND entity_id = :entity_id AND metric = :metric) AS last
+    WHERE :value <> last.total
+""")
+# Under READ COMMITTED two writers would both read the old SUM(delta) and append the same
+# change twice; a transaction-scoped lock per entity makes the second one wait and re-read.
+# (SQLite serializes writers already.)
+LOCK_SQL = text("SELECT pg_advisory_xact_lock(:kind, hashtext(:entity_id))")
+
+
+def load_ids(path=None):
+    """Competitor channel IDs from competitors.json, or the defaults in config."""
+    path = path or config.COMPETITORS_FILE
+    if not os.path.exists(path):
+        return list(config.DEFAULT_COMPETITOR_IDS)
+    with open(path) as f:
+        entries = json.load(f)
+    ids = [e if isinstance(e, str) else e.get("channel_id") for e in entries]
+    bad = [e for e, cid in zip(entries, ids) if not cid]
+    if bad:
+        raise ValueError(f"{path}: entries without a channel_id: {bad}")
+    return list(dict.fromkeys(ids))
+
+
+def record(session, kind, observations, ts=None):
+    """Append changed counters for [(entity_id, {metric name: value})]; returns rows written."""
+    ts = int(ts if ts is not None else time.time())
+    params = [{"kind": kind, "entity_id": entity_id, "metric": METRICS[kind][name], "ts": ts, "value": int(value)}
+              for entity_id, values in observations for name, value in values.items()]
+    if not params:
+        return 0
+    if session.get_bind().dialect.name == "postgresql":
+        # Sorted, so two writers locking overlapping entities can't deadlock
+        for entity_id in sorted({p["entity_id"] for p in params}):
+            session.execute(LOCK_SQL, {"kind": kind, "entity_id": entity_id})
+    result = session.execute(RECORD_SQL, params)
+    return max(result.rowcount, 0)
+
+
+def growth(session, kind, start, end):
+    """Per entity and counter: value at `start`, value at `end`, gain and gain per day.
+
+    `start`/`end` are unix seconds. For an entity first seen inside the range,
+    growth is measured from its first observation. Returns
+    {entity_id: {metric name: (start_value, end_value, gained, per_day)}}.
+    """
+    names = {code: name for name, code in METRICS[kind].items()}
+    firsts = (select(H.entity_id, H.metric, func.min(H.ts).label("first_ts"))
+              .where(H.kind == kind).group_by(H.entity_id, H.metric).subquery())
+    stmt = (select(H.entity_id, H.metric, func.sum(H.delta),
+                   func.sum(case((H.ts <= start, H.delta), (H.ts == firsts.c.first_ts, H.delta), else_=0)),
+                   func.min(firsts.c.first_ts))
+            .join(firsts, and_(H.entity_id == firsts.c.entity_id, H.metric == firsts.c.metric))
+            .where(H.kind == kind, H.ts <= end)
+            .group_by(H.entity_id, H.metric))
+    out = {}
+    for entity_id, metric, at_end, at_start, first_ts in session.execute(stmt):
+        days = max(end - max(start, first_ts), 86400) / 86400  # at least a day: no extrapolating minutes
+        gained = at_end - at_start
+        out.setdefault(entity_id, {})[names[metric]] = (at_start, at_end, gained, gained / days)
+    return out
+
+
+def history(session, kind, entity_id, metric):
+    """[(ts, value)] at every change of one counter (deltas decoded)."""
+    rows = session.execute(select(H.ts, H.delta).where(
+        H.kind == kind, H.entity_id == entity_id, H.metric == METRICS[kind][metric]).order_by(H.ts))
+    out, value = [], 0
+    for ts, delta in rows:
+        value += delta
+        out.append((ts, value))
+    return out
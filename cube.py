@@ -0,0 +1,120 @@
+import datetime
+
+from sqlalchemy import select, update, delete, func, and_, exists
+
+from database import (
+    get_session, upsert, Channel, BreakdownCube as C,
+    TrafficSource, Geography, DemographicsAge, DemographicsGender
+)
+
+# traffic rows are daily facts and add up over a window. country/age/gender rows are
+# per-sync aggregates of the whole sync window, so a window query averages the
+# snapshots inside it instead of summing them.
+ADDITIVE = {"traffic": True, "country": False, "age": False, "gender": False}
+
+CELL_COLUMNS = (C.views, C.watch_time_minutes, C.share, C.samples)
+CUM_COLUMNS = (C.cum_views, C.cum_watch_time, C.cum_share, C.cum_samples)
+
+
+def record(session, channel_id, dimension, cells):
+    """Upsert cells [(day, member, views, watch_time, share)] and repair the running sums.
+
+    Only the days from each member's earliest changed day onward are
+    re-accumulated, so appending new days costs O(new days).
+    """
+    if not cells:
+        return
+    upsert(session, C, [
+        {"channel_id": channel_id, "dimension": dimension, "member": member, "day": day,
+         "views": views, "watch_time_minutes": watch_time, "share": share, "samples": 1}
+        for day, member, views, watch_time, share in cells
+    ], ['channel_id', 'dimension', 'member', 'day'])
+
+    since = {}
+    for day, member, *_ in cells:
+        since[member] = min(since.get(member, day), day)
+    for member, day in since.items():
+        _accumulate(session, channel_id, dimension, member, day)
+
+
+def _accumulate(session, channel_id, dimension, member, since):
+    key = (C.channel_id == channel_id, C.dimension == dimension, C.member == member)
+    base = session.execute(select(*CUM_COLUMNS).where(*key, C.day < since)
+                           .order_by(C.day.desc()).limit(1)).first()
+    views, watch_time, share, samples = base or (0, 0.0, 0.0, 0)
+    updates = []
+    for row in session.execute(select(C.id, *CELL_COLUMNS).where(*key, C.day >= since).order_by(C.day)):
+        views += row.views or 0
+        watch_time += row.watch_time_minutes or 0.0
+        share += row.share or 0.0
+        samples += row.samples or 0
+        updates.append({"id": row.id, "cum_views": views, "cum_watch_time": watch_time,
+                        "cum_share": share, "cum_samples": samples})
+    if updates:
+        session.execute(update(C), updates)
+
+
+def _cum_at(session, channel_id, dimension, day):
+    """member -> running sums at the member's last day <= `day` (one index seek per member)."""
+    scope = (C.channel_id == channel_id, C.dimension == dimension)
+    last = (select(C.member, func.max(C.day).label("day"))
+            .where(*scope, C.day <= day).group_by(C.member).subquery())
+    rows = session.execute(select(C.member, *CUM_COLUMNS)
+                           .join(last, and_(C.member == last.c.member, C.day == last.c.day))
+                           .where(*scope))
+    return {r[0]: tuple(r[1:]) for r in rows}
+
+
+def window(session, channel_id, dimension, start, end, limit=None, order_by="views"):
+    """Per-member totals over [start, end], largest first.
+
+    Returns [(member, views, watch_time_minutes, share)]. Additive dimensions
+    are summed; snapshot dimensions are averaged over the snapshots in range.
+    Cost depends on the number of members, not on the length of the window.
+    """
+    hi = _cum_at(session, channel_id, dimension, end)
+    lo = _cum_at(session, channel_id, dimension, start - datetime.timedelta(days=1))
+    out = []
+    for member, (views, watch_time, share, samples) in hi.items():
+        lv, lw, ls, ln = lo.get(member, (0, 0.0, 0.0, 0))
+        n = samples - ln
+        if n <= 0:
+            continue
+        views, watch_time, share = views - lv, watch_time - lw, share - ls
+        if not ADDITIVE[dimension]:
+            views, watch_time, share = views / n, watch_time / n, share / n
+        out.append((member, views, watch_time, share))
+    column = {"views": 1, "watch_time": 2, "share": 3}[order_by]
+    out.sort(key=lambda r: r[column], reverse=True)
+    return out[:limit] if limit else out
+
+
+def rebuild(session, channel_id):
+    """Recompute a channel's cube from the breakdown tables."""
+    session.execute(delete(C).where(C.channel_id == channel_id))
+    sources = {
+        "traffic": (TrafficSource, TrafficSource.source_type, None),
+        "country": (Geography, Geography.country_code, None),
+        "age": (DemographicsAge, DemographicsAge.age_group, DemographicsAge.viewer_percentage),
+        "gender": (DemographicsGender, DemographicsGender.gender, DemographicsGender.viewer_percentage),
+    }
+    for dimension, (model, member, share) in sources.items():
+        rows = session.execute(select(model.date, member, model.views, model.watch_time_minutes,
+                                      share if share is not None else 0.0)
+                               .where(model.channel_id == channel_id).order_by(model.date)).all()
+        record(session, channel_id, dimension, [tuple(r) for r in rows])
+
+
+def backfill_missing():
+    """Build the cube for channels that have breakdown rows but no cube yet (older DBs)."""
+    session = get_session()
+    try:
+        missing = session.execute(select(Channel.id).where(
+            exists().where(TrafficSource.channel_id == Channel.id),
+            ~exists().where(C.channel_id == Channel.id))).scalars().all()
+        for channel_id in missing:
+            print(f"Building breakdown cube for {channel_id}...")
+            rebuild(session, channel_id)
+            session.commit()
+    finally:
+        session.close()
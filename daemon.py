@@ -0,0 +1,259 @@
+import json
+import time
+import signal
+import argparse
+import datetime
+import threading
+import subprocess
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import config
+import channels
+import fetch_data
+from pipeline import fingerprint
+
+# Data stages each job refreshes; every job then lets the snapshots and json
+# stages decide whether their inputs changed. Jobs run in this order when several are due at once.
+# A job without stages is DB maintenance, run once for all channels.
+JOBS = {
+    "competitors": ["competitors", "similarity"],
+    "daily": ["channel_info", "channel_stats", "videos", "comments", "video_daily", "demographics", "traffic",
+              "thumbnails", "similarity"],
+    "recent_videos": ["video_daily"],
+    "compact": [],
+}
+VOLATILE_KEYS = {"last_updated"}
+JOB_TIMEOUT = 6 * 60 * 60  # a job running longer than this makes /health report degraded
+
+
+def content_hash(path):
+    """Hash of a JSON output ignoring render timestamps, so re-renders of unchanged data don't publish."""
+    def strip(value):
+        if isinstance(value, dict):
+            return {k: strip(v) for k, v in value.items() if k not in VOLATILE_KEYS}
+        if isinstance(value, list):
+            return [strip(v) for v in value]
+        return value
+    try:
+        with open(path) as f:
+            return fingerprint(strip(json.load(f)))
+    except (OSError, ValueError):
+        return None
+
+
+def warm_clients(factory):
+    """Reuse API clients per stage-worker thread name across pipeline runs.
+
+    The pipeline's executor threads are recreated for every run but get the
+    same names (stage_0, stage_1, ...), and jobs run one at a time, so each
+    name maps to exactly one live thread. Any other thread (e.g. a streamed()
+    step) gets its own clients, which the pipeline context keeps per thread.
+    """
+    cache = {}
+    lock = threading.Lock()
+
+    def get():
+        name = threading.current_thread().name
+        if not name.startswith("stage_"):
+            return factory()
+        with lock:
+            if name not in cache:
+                cache[name] = factory()
+            return cache[name]
+    return get
+
+
+class Daemon:
+    def __init__(self, args, entries):
+        self.args = args
+        self.entries = entries
+        self.started_at = time.time()
+        self.running = None  # (job name, start time) while a job runs
+        self.stop = threading.Event()
+        self.lock = threading.Lock()
+        self.clients = {}  # registry key -> warm client factory
+        self.state = self.load_state()
+        self.state.setdefault("jobs", {})
+        self.state.setdefault("published", {})
+        for name in JOBS:
+            self.state["jobs"].setdefault(name, {"last_run": 0, "status": None, "runs": 0, "failures": 0})
+
+    def load_state(self):
+        try:
+            with open(config.DAEMON_STATE_FILE) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save_state(self):
+        with self.lock:
+            with open(config.DAEMON_STATE_FILE, 'w') as f:
+                json.dump(self.state, f, indent=2)
+
+    def next_run(self, name):
+        return self.state["jobs"][name]["last_run"] + config.DAEMON_CADENCES[name]
+
+    def due(self, now):
+        names = [n for n in JOBS if self.next_run(n) <= now]
+        # A due job whose stages another due job also refreshes would only repeat its work
+        return [n for n in names
+                if not (JOBS[n] and any(m != n and set(JOBS[n]) < set(JOBS[m]) for m in names))], names
+
+    def job_args(self, name, entry):
+        args = argparse.Namespace(**vars(self.args))
+        args.only = JOBS[name] + ["snapshots", "json"]
+        args.skip = None
+        args.force = set(JOBS[name])
+        args.init = False
+        args.profile = False
+        args.recent_days = config.DAEMON_RECENT_DAYS if name == "recent_videos" else None
+        args.entry = entry
+        args.interactive = False
+        args.competitors_polled = "competitors" in JOBS[name]  # once per cycle, by run_job
+        return args
+
+    def warm(self, entry, args):
+        if entry['key'] not in self.clients:
+            self.clients[entry['key']] = warm_clients(fetch_data.client_factory(args))
+        return self.clients[entry['key']]
+
+    def run_job(self, name):
+        job = self.state["jobs"][name]
+        self.running = (name, time.time())
+        print(f"\n[daemon] {datetime.datetime.now():%Y-%m-%d %H:%M:%S} running '{name}'")
+        ok = True
+        changed = []
+        if not JOBS[name]:
+            import retention
+            try:
+                retention.maintain()
+            except Exception as e:
+                print(f"[daemon] '{name}' failed: {e}")
+                ok = False
+        if "competitors" in JOBS[name]:
+            entry = self.entries[0]
+            args = self.job_args(name, entry)
+            try:
+                fetch_data.poll_competitors(args, entry, self.warm(entry, args))
+            except Exception as e:
+                print(f"[daemon] '{name}' competitor poll failed: {e}")
+                ok = False
+        for entry in self.entries if JOBS[name] else []:
+            args = self.job_args(name, entry)
+            try:
+                results = fetch_data.run_channel(entry, args, interactive=False,
+                                                 make_clients=self.warm(entry, args))
+            except Exception as e:
+                print(f"[daemon] '{name}' failed for channel '{entry['key']}': {e}")
+                ok = False
+                continue
+            ok = ok and all(r["status"] in ("ran", "skipped") for r in results.values())
+            if results.get("json", {}).get("status") == "ran":
+                changed += self.changed_outputs(entry)
+
+        self.running = None
+        with self.lock:
+            job["last_run"] = time.time()
+            job["status"] = "ok" if ok else "failed"
+            job["runs"] += 1
+            job["failures"] += 0 if ok else 1
+        if changed:
+            self.publish(changed)
+        self.save_state()
+
+    def changed_outputs(self, entry):
+        from database import get_session, Channel
+        session = get_session()
+        try:
+            ids = [entry['channel_id']] if entry['channel_id'] else [c.id for c in session.query(Channel)]
+        finally:
+            session.close()
+        changed = []
+        for cid in ids:
+            h = content_hash(channels.bundle_dir(cid) / "dashboard_data.json")
+            if h and self.state["published"].get(cid) != h:
+                changed.append((cid, h))
+        return changed
+
+    def publish(self, changed):
+        names = ", ".join(cid for cid, _ in changed)
+        if config.PUBLISH_COMMAND:
+            print(f"[daemon] outputs changed for {names}; running: {config.PUBLISH_COMMAND}")
+            proc = subprocess.run(config.PUBLISH_COMMAND, shell=True, cwd=config.BASE_DIR)
+            if proc.returncode != 0:
+                print(f"[daemon] publish failed with exit code {proc.returncode}; will retry on next change")
+                return
+        else:
+            print(f"[daemon] outputs changed for {names} (PUBLISH_COMMAND not set)")
+        with self.lock:
+            for cid, h in changed:
+                self.state["published"][cid] = h
+            self.state["last_publish"] = time.time()
+
+    def status(self):
+        now = time.time()
+        with self.lock:
+            jobs = {name: dict(job, next_run=self.next_run(name)) for name, job in self.state["jobs"].items()}
+            last_publish = self.state.get("last_publish")
+        running = self.running
+        stuck = running is not None and now - running[1] > JOB_TIMEOUT
+        healthy = not stuck and all(j["status"] != "failed" for j in jobs.values())
+        return healthy, {
+            "status": "ok" if healthy else "degraded",
+            "uptime_seconds": round(now - self.started_at),
+            "running": {"job": running[0], "seconds": round(now - running[1])} if running else None,
+            "channels": [e['key'] for e in self.entries],
+            "jobs": jobs,
+            "last_publish": last_publish,
+        }
+
+    def serve_health(self, port):
+        daemon = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip("/") not in ("/health", "/status", ""):
+                    self.send_error(404)
+                    return
+                healthy, body = daemon.status()
+                payload = json.dumps(body, indent=2).encode()
+                self.send_response(200 if healthy else 503)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass  # keep the sync log readable
+
+        server = ThreadingHTTPServer(("0.0.0.0", port), Handler)
+        threading.Thread(target=server.serve_forever, name="health", daemon=True).start()
+        print(f"[daemon] health endpoint on http://0.0.0.0:{port}/health")
+        return server
+
+    def run(self, port=None):
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(sig, lambda *_: self.stop.set())
+        server = self.serve_health(port or config.DAEMON_PORT)
+        try:
+            while not self.stop.is_set():
+                now = time.time()
+                run, due = self.due(now)
+                for name in run:
+                    if self.stop.is_set():
+                        break
+                    self.run_job(name)
+                for name in set(due) - set(run):
+                    self.state["jobs"][name]["last_run"] = time.time()  # covered by a broader job
+                if due:
+                    self.save_state()
+                wake = min(self.next_run(n) for n in JOBS)
+                self.stop.wait(max(1.0, min(wake - time.time(), 60)))
+        finally:
+            server.shutdown()
+            print("[daemon] stopped")
+
+
+def run(args, entries):
+    """Entry point for `fetch_data.py --daemon`."""
+    Daemon(args, entries).run(args.port)
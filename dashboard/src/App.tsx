@@ -3,6 +3,7 @@ import { AreaChart, Area, XAxis, YAxis, CartesianGrid, Tooltip, ResponsiveContai
 import { ChannelStats, VideoData, AIInsights, ChartData, AppTab, DashboardData, PredictionData, CommentData } from './types';
 import StatsCard from './components/StatsCard';
 import InsightSection from './components/InsightSection';
+import Thumbnail from './components/Thumbnail';
 import { translations, Language } from './translations';
 import { TrendingUp, ArrowUpDown, ArrowUp, ArrowDown } from 'lucide-react';
 
@@ -144,6 +145,8 @@ const App: React.FC = () => {
                 id: v.video || `v-${i}`,
                 title: v.title || `Unknown Video (${v.video})`,
                 thumbnail: v.thumbnail || '',
+                thumbnailSources: v.thumbnail_sources,
+                similarCompetitorVideos: v.similar_competitor_videos,
                 publishedAt: 'Recent',
                 views: v.views,
                 likes: v.likes || 0,
@@ -433,8 +436,9 @@ const App: React.FC = () => {
                                     {sortedVideos.map(v => (
                                         <tr key={v.id} className="hover:bg-gray-50/50 transition-colors">
                                             <td className="px-4 py-2">
-                                                <img
+                                                <Thumbnail
                                                     src={v.thumbnail}
+                                                    sources={v.thumbnailSources}
                                                     alt={v.title}
                                                     className="w-10 h-6 object-cover rounded cursor-pointer hover:opacity-80 transition-opacity"
                                                     onClick={() => setSelectedImage(v.thumbnail)}
@@ -0,0 +1,24 @@
+import React from 'react';
+import { ThumbnailSources } from '../types';
+
+interface ThumbnailProps {
+    src: string;
+    sources?: ThumbnailSources;
+    alt: string;
+    className?: string;
+    onClick?: () => void;
+    onError?: React.ReactEventHandler<HTMLImageElement>;
+}
+
+// Card-size AVIF/WebP variants from the thumbnail cache, falling back to the original image
+const Thumbnail: React.FC<ThumbnailProps> = ({ src, sources, alt, className, onClick, onError }) => {
+    return (
+        <picture>
+            {sources?.avif && <source srcSet={sources.avif} type="image/avif" />}
+            {sources?.webp && <source srcSet={sources.webp} type="image/webp" />}
+            <img src={src} alt={alt} className={className} onClick={onClick} onError={onError} loading="lazy" decoding="async" />
+        </picture>
+    );
+};
+
+export default Thumbnail;
@@ -1,5 +1,6 @@
 import React from 'react';
 import { VideoData } from '../types';
+import Thumbnail from './Thumbnail';
 
 interface VideoGridProps {
     videos: VideoData[];
@@ -13,7 +14,7 @@ const VideoGrid: React.FC<VideoGridProps> = ({ videos }) => {
                 {videos.map((video) => (
                     <div key={video.id} className="bg-white rounded-2xl overflow-hidden border border-gray-100 group shadow-sm hover:shadow-md transition-all">
                         <div className="relative aspect-video bg-gray-200">
-                            <img src={video.thumbnail} alt={video.title} className="w-full h-full object-cover" onError={(e) => (e.currentTarget.src = "https://placehold.co/600x400?text=No+Thumbnail")} />
+                            <Thumbnail src={video.thumbnail} sources={video.thumbnailSources} alt={video.title} className="w-full h-full object-cover" onError={(e) => (e.currentTarget.src = "https://placehold.co/600x400?text=No+Thumbnail")} />
                         </div>
                         <div className="p-4">
                             <h3 className="font-semibold text-gray-900 line-clamp-2 leading-tight h-10 mb-2">{video.title}</h3>
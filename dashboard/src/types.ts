@@ -10,10 +10,25 @@ export interface ChannelStats {
     lastUpdated?: string;
 }
 
+export interface ThumbnailSources {
+    avif?: string;
+    webp?: string;
+}
+
+export interface SimilarVideo {
+    video: string;
+    title: string;
+    channel: string | null;
+    views: number | null;
+    similarity: number;
+}
+
 export interface VideoData {
     id: string;
     title: string;
     thumbnail: string;
+    thumbnailSources?: ThumbnailSources;
+    similarCompetitorVideos?: SimilarVideo[];
     publishedAt: string;
     views: number;
     likes: number;
@@ -112,6 +127,40 @@ export interface PredictionData {
             dislikes: number[];
         };
     };
+    // Central `level` prediction bands, keyed like `predictions`
+    intervals?: {
+        level: number;
+        ma: Record<string, PredictionBand>;
+        wma: Record<string, PredictionBand>;
+        xgboost: Record<string, PredictionBand>;
+    };
+}
+
+export interface PredictionBand {
+    lower: number[];
+    upper: number[];
+}
+
+export interface AnomalyData {
+    date: string;
+    kind: "channel" | "video";
+    id: string;
+    title: string | null;
+    metric: string;
+    value: number;
+    expected: number;
+    z: number;
+    direction: "spike" | "drop";
+}
+
+export interface FormatSegment {
+    segment: string;  // "shorts", "<4m", "4-10m", ..., "unknown"
+    videos: number;
+    views: number;
+    estimatedMinutesWatched: number;
+    estimatedRevenue: number;
+    likes: number;
+    subscribersGained: number;
 }
 
 export interface DashboardData {
@@ -138,6 +187,8 @@ export interface DashboardData {
     ai_insights?: AIInsights;
     top_videos: VideoData[];
     comments: CommentData[];
+    anomalies?: AnomalyData[];
+    formats?: FormatSegment[];
     demographics: {
         age_gender: {
             headers: string[];
@@ -1,10 +1,16 @@
-import os
-from sqlalchemy import create_engine, Column, Integer, String, Float, Date, DateTime, ForeignKey, Text, Boolean, UniqueConstraint, BigInteger
+import io
+import csv
+import time
+from sqlalchemy import event, create_engine, make_url, Column, Integer, String, Float, Date, DateTime, ForeignKey, Text, Boolean, UniqueConstraint, BigInteger, SmallInteger, LargeBinary, Index
 from sqlalchemy.orm import declarative_base, sessionmaker, relationship
 from datetime import datetime
 
+import config
+
 # Database Configuration
-DB_NAME = "youtube_data.db"
+DB_URL = make_url(config.DATABASE_URL)
+DB_NAME = DB_URL.render_as_string(hide_password=True)
+IS_SQLITE = DB_URL.get_backend_name() == 'sqlite'
 Base = declarative_base()
 
 class Channel(Base):
@@ -56,7 +62,8 @@ class Video(Base):
     
     # New Fields
     is_shorts = Column(Boolean, default=False)
-    video_length = Column(String) # e.g. "PT5M30S" or Seconds as Integer? Keeping String as usually returned by API duration
+    video_length = Column(String) # ISO-8601 duration as returned by the API, e.g. "PT5M30S"
+    duration_seconds = Column(Integer, index=True) # video_length parsed (formats.parse_duration)
     
     channel = relationship("Channel", back_populates="videos")
     daily_stats = relationship("VideoDaily", back_populates="video", cascade="all, delete-orphan")
@@ -85,16 +92,60 @@ class VideoDaily(Base):
 
     video = relationship("Video", back_populates="daily_stats")
 
+class VideoRollup(Base):
+    """Compacted video_daily_stats: weekly and monthly per-video totals (see retention.py)"""
+    __tablename__ = 'video_rollup_stats'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    video_id = Column(String, ForeignKey('videos.id'), nullable=False)
+    grain = Column(String, nullable=False)        # "week" (Monday or 1st of month) or "month"
+    period_start = Column(Date, nullable=False)
+    period_end = Column(Date, nullable=False)     # last day folded in so far
+    days = Column(Integer, default=0)             # daily rows folded in
+
+    views = Column(BigInteger, default=0)
+    likes = Column(Integer, default=0)
+    dislikes = Column(Integer, default=0)
+    comments = Column(Integer, default=0)
+    shares = Column(Integer, default=0)
+
+    estimated_revenue = Column(Float, default=0.0)
+    watch_time_minutes = Column(Float, default=0.0)
+    subscribers_gained = Column(Integer, default=0)
+
+    __table_args__ = (UniqueConstraint('video_id', 'grain', 'period_start', name='uix_video_rollup'),)
+
+class FormatDaily(Base):
+    """video_daily_stats summed per channel, day and format segment (Shorts or a length bucket; see formats.py)"""
+    __tablename__ = 'format_daily_stats'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    channel_id = Column(String, ForeignKey('channels.id'), nullable=False)
+    date = Column(Date, nullable=False)
+    segment = Column(String, nullable=False)   # "shorts", "<4m", "4-10m", ..., "unknown"
+    videos = Column(Integer, default=0)        # videos with a row that day
+
+    views = Column(BigInteger, default=0)
+    watch_time_minutes = Column(Float, default=0.0)
+    estimated_revenue = Column(Float, default=0.0)
+    likes = Column(Integer, default=0)
+    comments = Column(Integer, default=0)
+    shares = Column(Integer, default=0)
+    subscribers_gained = Column(Integer, default=0)
+
+    __table_args__ = (UniqueConstraint('channel_id', 'date', 'segment', name='uix_format_day'),)
+
 class Comment(Base):
     """Video Comments"""
     __tablename__ = 'video_comments'
     
     id = Column(String, primary_key=True) # Comment ID
-    video_id = Column(String, ForeignKey('videos.id'), nullable=False)
+    video_id = Column(String, ForeignKey('videos.id'), nullable=False, index=True)
+    parent_id = Column(String, index=True) # Top-level comment ID for replies, None for threads
     
     author_name = Column(String)
-    text = Column(Text)
-    published_at = Column(DateTime)
+    text = Column(Text) # Indexed by video_comments_fts (SQLite) / a GIN tsvector index (PostgreSQL)
+    published_at = Column(DateTime, index=True)
     like_count = Column(Integer, default=0)
     reply_count = Column(Integer, default=0)
     
@@ -108,6 +159,7 @@ class Comment(Base):
 class DemographicsAge(Base):
     __tablename__ = 'daily_demographics_age'
     id = Column(Integer, primary_key=True, autoincrement=True)
+    channel_id = Column(String, ForeignKey('channels.id'), nullable=False)
     date = Column(Date, nullable=False)
     
     age_group = Column(String, nullable=False) # e.g. "age25-34"
@@ -118,40 +170,126 @@ class DemographicsAge(Base):
     views = Column(Integer, default=0)
     watch_time_minutes = Column(Float, default=0.0)
     
-    __table_args__ = (UniqueConstraint('date', 'age_group', name='uix_date_age'),)
+    __table_args__ = (UniqueConstraint('channel_id', 'date', 'age_group', name='uix_channel_date_age'),)
 
 class DemographicsGender(Base):
     __tablename__ = 'daily_demographics_gender'
     id = Column(Integer, primary_key=True, autoincrement=True)
+    channel_id = Column(String, ForeignKey('channels.id'), nullable=False)
     date = Column(Date, nullable=False)
     
     gender = Column(String, nullable=False) # "male", "female", "user_specified"
+    viewer_percentage = Column(Float, default=0.0)
     views = Column(Integer, default=0)
     watch_time_minutes = Column(Float, default=0.0)
     
-    __table_args__ = (UniqueConstraint('date', 'gender', name='uix_date_gender'),)
+    __table_args__ = (UniqueConstraint('channel_id', 'date', 'gender', name='uix_channel_date_gender'),)
 
 class Geography(Base):
     __tablename__ = 'daily_geography'
     id = Column(Integer, primary_key=True, autoincrement=True)
+    channel_id = Column(String, ForeignKey('channels.id'), nullable=False)
     date = Column(Date, nullable=False)
     
     country_code = Column(String, nullable=False) # "KR", "US"
     views = Column(Integer, default=0)
     watch_time_minutes = Column(Float, default=0.0)
     
-    __table_args__ = (UniqueConstraint('date', 'country_code', name='uix_date_geo'),)
+    __table_args__ = (UniqueConstraint('channel_id', 'date', 'country_code', name='uix_channel_date_geo'),)
 
 class TrafficSource(Base):
     __tablename__ = 'daily_traffic_sources'
     id = Column(Integer, primary_key=True, autoincrement=True)
+    channel_id = Column(String, ForeignKey('channels.id'), nullable=False)
     date = Column(Date, nullable=False)
     
     source_type = Column(String, nullable=False) # "YT_SEARCH", "RELATED_VIDEO"
     views = Column(Integer, default=0)
     watch_time_minutes = Column(Float, default=0.0)
     
-    __table_args__ = (UniqueConstraint('date', 'source_type', name='uix_date_traffic'),)
+    __table_args__ = (UniqueConstraint('channel_id', 'date', 'source_type', name='uix_channel_date_traffic'),)
+
+
+class BreakdownCube(Base):
+    """Per-day totals by dimension member (traffic source, country, age group, gender)
+    with running sums, so any date-range total is cum(end) - cum(day before start)."""
+    __tablename__ = 'breakdown_cube'
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    channel_id = Column(String, ForeignKey('channels.id'), nullable=False)
+    dimension = Column(String, nullable=False)  # "traffic", "country", "age", "gender"
+    member = Column(String, nullable=False)     # e.g. "YT_SEARCH", "KR", "age25-34"
+    day = Column(Date, nullable=False)
+
+    views = Column(BigInteger, default=0)
+    watch_time_minutes = Column(Float, default=0.0)
+    share = Column(Float, default=0.0)          # viewerPercentage (age/gender)
+    samples = Column(Integer, default=1)        # rows folded into this cell
+
+    # Prefix sums over this member's days up to and including `day`
+    cum_views = Column(BigInteger, default=0)
+    cum_watch_time = Column(Float, default=0.0)
+    cum_share = Column(Float, default=0.0)
+    cum_samples = Column(Integer, default=0)
+
+    # Also the index the range lookups seek on
+    __table_args__ = (UniqueConstraint('channel_id', 'dimension', 'member', 'day', name='uix_cube_cell'),)
+
+
+class Thumbnail(Base):
+    """A downloaded thumbnail URL (thumbnails.py). Files are shared by content hash."""
+    __tablename__ = 'thumbnails'
+
+    url = Column(String, primary_key=True)
+    digest = Column(String, nullable=False, index=True)  # sha256 of the downloaded bytes
+    width = Column(Integer)
+    height = Column(Integer)
+    variants = Column(Text)  # JSON: format -> path under dashboard/public ("jpg", "webp", "avif")
+    fetched_at = Column(DateTime, default=datetime.utcnow)
+
+
+class AnomalyState(Base):
+    """Running EWMA baseline of one daily metric of a channel or video (anomalies.py)."""
+    __tablename__ = 'anomaly_state'
+
+    kind = Column(String, primary_key=True)        # "channel" or "video"
+    entity_id = Column(String, primary_key=True)   # channel or video ID
+    metric = Column(String, primary_key=True)      # column of channel_daily_stats / video_daily_stats
+    channel_id = Column(String, nullable=False, index=True)
+    last_day = Column(Date, nullable=False)        # newest day folded into the state
+    n = Column(Integer, default=0)                 # days observed
+    level = Column(Float, default=0.0)             # EWMA of the deseasonalized value
+    var = Column(Float, default=0.0)               # EWMA variance of the residuals
+    weekday = Column(LargeBinary)                  # 7 little-endian float64 additive offsets, Monday first
+
+
+class ForecastTuning(Base):
+    """Best forecast settings for one metric of a channel, from prediction.py --tune."""
+    __tablename__ = 'forecast_tuning'
+
+    channel_id = Column(String, primary_key=True)  # "" for the all-rows (legacy) forecast
+    metric = Column(String, primary_key=True)      # prediction metric: view_count, revenue, ...
+    days = Column(Integer, nullable=False)         # history length the search ran on
+    params = Column(Text, nullable=False)          # JSON: window lengths and XGBoost settings
+    scores = Column(Text)                          # JSON: model -> mean cross-validated MAE
+    tuned_at = Column(DateTime, default=datetime.utcnow)
+
+
+class Anomaly(Base):
+    """A day whose metric fell outside the EWMA band of its channel or video."""
+    __tablename__ = 'anomalies'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    kind = Column(String, nullable=False)
+    entity_id = Column(String, nullable=False)
+    channel_id = Column(String, nullable=False)
+    metric = Column(String, nullable=False)
+    date = Column(Date, nullable=False)
+    value = Column(Float, nullable=False)
+    expected = Column(Float, nullable=False)
+    z = Column(Float, nullable=False)              # (value - expected) / baseline std; sign = spike or drop
+
+    __table_args__ = (UniqueConstraint('kind', 'entity_id', 'metric', 'date', name='uix_anomaly'),
+                      Index('ix_anomalies_channel_date', 'channel_id', 'date'))
 
 
 class CompetitorChannel(Base):
@@ -191,15 +329,284 @@ class CompetitorVideo(Base):
 
     channel = relationship("CompetitorChannel", back_populates="videos")
 
+class CompetitorHistory(Base):
+    """Append-only competitor counter history (see competitors.py).
+
+    A row is written only when a counter changed since the last poll and holds
+    the change, not the value: the value at any time is the sum of the deltas
+    up to it, and growth over a range is the sum of the deltas inside it.
+    """
+    __tablename__ = 'competitor_history'
+
+    kind = Column(SmallInteger, primary_key=True)       # competitors.CHANNEL / competitors.VIDEO
+    entity_id = Column(String, primary_key=True)        # competitor channel or video ID
+    metric = Column(SmallInteger, primary_key=True)     # competitors.METRICS code
+    ts = Column(BigInteger, primary_key=True)           # unix seconds of the poll
+    delta = Column(BigInteger, nullable=False)
+
+    # The primary key is the only index, so store rows in it directly
+    __table_args__ = {'sqlite_with_rowid': False}
+
 # Database Setup
-engine = create_engine(f'sqlite:///{DB_NAME}', echo=False)
+# One pooled engine for the whole process (sync workers, rendering, prediction).
+if IS_SQLITE:
+    # check_same_thread=False lets pooled connections move between the sync's worker threads.
+    _engine_args = {"connect_args": {"check_same_thread": False}}
+else:
+    # Server connections can be dropped by the server or a proxy between runs
+    _engine_args = {"pool_pre_ping": True}
+engine = create_engine(
+    DB_URL, echo=False,
+    pool_size=config.DB_POOL_SIZE, max_overflow=config.DB_POOL_SIZE,
+    **_engine_args,
+)
 SessionLocal = sessionmaker(bind=engine)
 
+def storage_pragmas():
+    if config.SQLITE_PROFILE not in config.SQLITE_PROFILES:
+        raise ValueError(f"Unknown SQLITE_PROFILE '{config.SQLITE_PROFILE}' "
+                         f"(choose from {', '.join(config.SQLITE_PROFILES)})")
+    return config.SQLITE_PROFILES[config.SQLITE_PROFILE]
+
+if IS_SQLITE:
+    @event.listens_for(engine, "connect")
+    def _apply_storage_profile(dbapi_conn, connection_record):
+        cursor = dbapi_conn.cursor()
+        for name, value in storage_pragmas().items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+def describe_storage():
+    """Effective storage settings on a pooled connection (for `cli.py verify`)."""
+    with engine.connect() as conn:
+        if not IS_SQLITE:
+            return {"dialect": engine.dialect.name,
+                    "server_version": conn.exec_driver_sql("SHOW server_version").scalar()}
+        return {name: conn.exec_driver_sql(f"PRAGMA {name}").scalar() for name in storage_pragmas()}
+
 def init_db():
     """Initialize the database and create tables."""
     print(f"Initializing database: {DB_NAME}")
     Base.metadata.create_all(engine)
+    migrate_channel_scope()
+    migrate_comments()
+    ensure_comment_search()
+    migrate_video_durations()
+    migrate_gender_share()
+    import cube  # imports this module: keep it out of module scope
+    cube.backfill_missing()
+    import formats
+    formats.backfill_missing()
+
+# Tables that were channel-wide before multi-channel support, with their old unique constraint
+CHANNEL_SCOPED_TABLES = {
+    'daily_demographics_age': 'uix_date_age',
+    'daily_demographics_gender': 'uix_date_gender',
+    'daily_geography': 'uix_date_geo',
+    'daily_traffic_sources': 'uix_date_traffic',
+}
+
+def migrate_channel_scope():
+    """Add channel_id to the demographics/geography/traffic tables of an older DB.
+
+    Existing rows belong to the single channel the DB was synced for. SQLite
+    cannot change a unique constraint in place, so the table is rebuilt there.
+    """
+    from sqlalchemy import inspect
+    inspector = inspect(engine)
+    for table_name, old_constraint in CHANNEL_SCOPED_TABLES.items():
+        columns = [c['name'] for c in inspector.get_columns(table_name)]
+        if 'channel_id' in columns:
+            continue
+        print(f"Migrating {table_name}: adding channel_id")
+        table = Base.metadata.tables[table_name]
+        col_list = ", ".join(columns)
+        with engine.begin() as conn:
+            owner = conn.exec_driver_sql("SELECT id FROM channels ORDER BY last_updated LIMIT 1").scalar()
+            if IS_SQLITE:
+                conn.exec_driver_sql(f"ALTER TABLE {table_name} RENAME TO {table_name}_old")
+                table.create(conn)
+                if owner:
+                    conn.exec_driver_sql(
+                        f"INSERT INTO {table_name} (channel_id, {col_list}) "
+                        f"SELECT ?, {col_list} FROM {table_name}_old", (owner,))
+                conn.exec_driver_sql(f"DROP TABLE {table_name}_old")
+            else:
+                conn.exec_driver_sql(f"ALTER TABLE {table_name} ADD COLUMN channel_id VARCHAR REFERENCES channels(id)")
+                conn.exec_driver_sql(f"UPDATE {table_name} SET channel_id = %s", (owner,))
+                if not owner:
+                    conn.exec_driver_sql(f"DELETE FROM {table_name}")
+                conn.exec_driver_sql(f"ALTER TABLE {table_name} ALTER COLUMN channel_id SET NOT NULL")
+                conn.exec_driver_sql(f"ALTER TABLE {table_name} DROP CONSTRAINT {old_constraint}")
+                for c in table.constraints:
+                    if isinstance(c, UniqueConstraint):
+                        cols = ", ".join(col.name for col in c.columns)
+                        conn.exec_driver_sql(f"ALTER TABLE {table_name} ADD CONSTRAINT {c.name} UNIQUE ({cols})")
+
+def migrate_comments():
+    """Add parent_id and the lookup indexes to an older video_comments table."""
+    from sqlalchemy import inspect
+    table = Comment.__table__
+    if 'parent_id' not in [c['name'] for c in inspect(engine).get_columns(table.name)]:
+        print("Migrating video_comments: adding parent_id")
+        with engine.begin() as conn:
+            conn.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN parent_id VARCHAR")
+    with engine.begin() as conn:
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
+
+def migrate_video_durations():
+    """Add the indexed duration_seconds column to an older videos table (formats.py fills it)."""
+    from sqlalchemy import inspect
+    table = Video.__table__
+    if 'duration_seconds' not in [c['name'] for c in inspect(engine).get_columns(table.name)]:
+        print("Migrating videos: adding duration_seconds")
+        with engine.begin() as conn:
+            conn.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN duration_seconds INTEGER")
+    with engine.begin() as conn:
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
+
+def migrate_gender_share():
+    """Add viewer_percentage to an older daily_demographics_gender table (rows before it stay 0)."""
+    from sqlalchemy import inspect
+    table = DemographicsGender.__table__
+    if 'viewer_percentage' not in [c['name'] for c in inspect(engine).get_columns(table.name)]:
+        print("Migrating daily_demographics_gender: adding viewer_percentage")
+        with engine.begin() as conn:
+            conn.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN viewer_percentage FLOAT DEFAULT 0.0")
+
+# External-content FTS5 index: stores only the token index and reads text back from
+# video_comments by rowid. The triggers keep it in step with every insert, upsert and delete.
+COMMENT_FTS_TRIGGERS = [
+    """CREATE TRIGGER IF NOT EXISTS video_comments_fts_ai AFTER INSERT ON video_comments BEGIN
+        INSERT INTO video_comments_fts(rowid, text, author_name) VALUES (new.rowid, new.text, new.author_name);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS video_comments_fts_ad AFTER DELETE ON video_comments BEGIN
+        INSERT INTO video_comments_fts(video_comments_fts, rowid, text, author_name)
+        VALUES ('delete', old.rowid, old.text, old.author_name);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS video_comments_fts_au AFTER UPDATE OF text, author_name ON video_comments BEGIN
+        INSERT INTO video_comments_fts(video_comments_fts, rowid, text, author_name)
+        VALUES ('delete', old.rowid, old.text, old.author_name);
+        INSERT INTO video_comments_fts(rowid, text, author_name) VALUES (new.rowid, new.text, new.author_name);
+    END""",
+]
+
+def ensure_comment_search():
+    """Create the comment full-text index (and fill it once for existing rows)."""
+    with engine.begin() as conn:
+        if not IS_SQLITE:
+            conn.exec_driver_sql(
+                "CREATE INDEX IF NOT EXISTS ix_video_comments_text_fts ON video_comments "
+                "USING gin (to_tsvector('simple', coalesce(text, '')))")
+            return
+        exists = conn.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'video_comments_fts'").scalar()
+        if not exists:
+            conn.exec_driver_sql(
+                "CREATE VIRTUAL TABLE video_comments_fts USING fts5("
+                "text, author_name, content='video_comments', content_rowid='rowid', "
+                "tokenize='unicode61 remove_diacritics 2')")
+            conn.exec_driver_sql("INSERT INTO video_comments_fts(video_comments_fts) VALUES ('rebuild')")
+        for ddl in COMMENT_FTS_TRIGGERS:
+            conn.exec_driver_sql(ddl)
+
+def search_comments(session, query, channel_id=None, limit=20):
+    """Comments matching every word of `query` (prefix match on SQLite), best match first.
+
+    Returns rows with id, video_id, parent_id, author_name, text, published_at.
+    """
+    from sqlalchemy import text
+    words = [w.replace('"', '""') for w in query.split()]
+    if not words:
+        return []
+    params = {"limit": limit, "channel_id": channel_id}
+    scope = "AND v.channel_id = :channel_id" if channel_id else ""
+    cols = "c.id, c.video_id, c.parent_id, c.author_name, c.text, c.published_at"
+    if IS_SQLITE:
+        params["q"] = " ".join(f'"{w}"*' for w in words)
+        sql = (f"SELECT {cols} FROM video_comments_fts f "
+               f"JOIN video_comments c ON c.rowid = f.rowid JOIN videos v ON v.id = c.video_id "
+               f"WHERE video_comments_fts MATCH :q {scope} ORDER BY f.rank LIMIT :limit")
+    else:
+        params["q"] = query
+        vector = "to_tsvector('simple', coalesce(c.text, ''))"
+        sql = (f"SELECT {cols} FROM video_comments c JOIN videos v ON v.id = c.video_id "
+               f"WHERE {vector} @@ websearch_to_tsquery('simple', :q) {scope} "
+               f"ORDER BY ts_rank({vector}, websearch_to_tsquery('simple', :q)) DESC LIMIT :limit")
+    return session.execute(text(sql), params).all()
 
 def get_session():
     """Return a new database session."""
     return SessionLocal()
+
+def enable_sql_profiling(callback, target=None):
+    """Time every SQL statement on the engine and report it via callback(statement, seconds)."""
+    target = target or engine
+
+    @event.listens_for(target, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_start_time', []).append(time.perf_counter())
+
+    @event.listens_for(target, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        callback(statement, time.perf_counter() - conn.info['query_start_time'].pop())
+
+# --- Dialect-aware writes ---
+
+def _insert(session):
+    dialect = session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise NotImplementedError(f"Upserts are not implemented for '{dialect}'")
+    return insert
+
+def upsert(session, model, rows, keys):
+    """INSERT ... ON CONFLICT (keys) DO UPDATE for a list of column dicts.
+
+    `keys` must match a unique constraint of the table. Runs as one
+    executemany inside the session's transaction; the caller commits.
+    """
+    if not rows:
+        return
+    insert = _insert(session)
+    stmt = insert(model.__table__)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=keys,
+        set_={c: stmt.excluded[c] for c in rows[0] if c not in keys},
+    )
+    session.execute(stmt, rows)
+
+def bulk_load_video_daily(session, rows):
+    """Upsert per-video daily Analytics rows into video_daily_stats.
+
+    On PostgreSQL the rows are streamed with COPY into a temp table and merged
+    with one INSERT ... ON CONFLICT per batch; elsewhere this is upsert().
+    """
+    if not rows:
+        return
+    if session.get_bind().dialect.name != 'postgresql':
+        return upsert(session, VideoDaily, rows, ['video_id', 'date'])
+
+    cols = list(rows[0])
+    col_list = ", ".join(cols)
+    updates = ", ".join(f"{c} = EXCLUDED.{c}" for c in cols if c not in ('video_id', 'date'))
+    # Same connection (and transaction) as the session, so session.commit() covers the load
+    raw = session.connection().connection.dbapi_connection
+    with raw.cursor() as cur:
+        # Every column, not this call's: the temp table outlives the call on the pooled
+        # connection, and later calls may COPY a different column subset (e.g. transfer imports)
+        cur.execute("CREATE TEMP TABLE IF NOT EXISTS video_daily_load "
+                    "AS SELECT * FROM video_daily_stats WITH NO DATA")
+        for i in range(0, len(rows), config.COPY_BATCH_ROWS):
+            buf = io.StringIO()
+            csv.writer(buf).writerows([r[c] for c in cols] for r in rows[i:i + config.COPY_BATCH_ROWS])
+            buf.seek(0)
+            cur.copy_expert(f"COPY video_daily_load ({col_list}) FROM STDIN WITH (FORMAT csv)", buf)
+            cur.execute(f"INSERT INTO video_daily_stats ({col_list}) SELECT {col_list} FROM video_daily_load "
+                        f"ON CONFLICT (video_id, date) DO UPDATE SET {updates}")
+            cur.execute("TRUNCATE video_daily_load")
@@ -1,49 +1,55 @@
 import os
 import sys
+import time
+import hashlib
 import datetime
 import argparse
 import json
-import pandas as pd
 import shutil
-from dateutil.relativedelta import relativedelta
-import requests # For Ollama
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
 
 import config
+import cube
+import channels
+import snapshots
+import competitors
+import anomalies
+import formats
 from database import (
-    init_db, get_session, engine,
+    init_db, get_session, engine, upsert, bulk_load_video_daily,
     Channel, ChannelDaily, Video, VideoDaily, Comment,
-    DemographicsAge, DemographicsGender, Geography, TrafficSource,
+    DemographicsAge, DemographicsGender, Geography, TrafficSource, Thumbnail,
     CompetitorChannel, CompetitorVideo
 )
-import prediction # Import prediction engine
+# NOTE: numpy, requests, the Google client stack and `prediction` (pandas/xgboost/sklearn)
+# are imported inside the functions that use them, so `render`/`verify` start fast.
+from resilience import (
+    RetryPolicy, CircuitBreaker, CapabilityCache, COUNTERS,
+    MONETARY_METRICS, RETRYABLE_STATUSES, http_status, split_metrics, print_counters
+)
+from instrumentation import RUN, timed_execute
+from pipeline import Stage, Pipeline, PipelineContext, streamed
 
 # --- Constants ---
 DATE_FORMAT = "%Y-%m-%d"
 # Use host.docker.internal for Mac/Windows Docker, or localhost if running natively
 OLLAMA_API_URL = os.getenv("OLLAMA_API_URL", "http://host.docker.internal:11434/api/generate")
 OLLAMA_MODEL = "llama3.1"
-
-# TODO: Add your competitor channel IDs here
-# Example: UC..., UC...
-COMPETITOR_CHANNEL_IDS = [
-    "UCSJ4gkVC6NrvII8umztf0Ow", # Lofi Girl
-    "UC_aEa8K-EOJ3D6gOs7HcyNg", # NoCopyrightSounds
-    "UC0FiLCwZZPqaVHUPz72Cr-A", # Chillhop Music
-    "UCWzZ5TIGoZ6o-vpMwTuMWog", # College Music
-    "UC5nc_ZtjKW1htCVZVRxlQAQ", # MrSuicideSheep
-    "UC3ifMxTEKLV40GhD9i07M8g", # Proximity
-]
+# Swapped for a recording/replay/synthetic backend by client_factory(); None means requests.post/get
+OLLAMA_POST = None
+THUMBNAIL_GET = None
 
 # --- Auth ---
-def get_credentials():
+def get_credentials(token_file=None, interactive=True):
+    """Load/refresh the OAuth token for one channel; start the consent flow only if interactive."""
+    from google.auth.transport.requests import Request
+    from google.oauth2.credentials import Credentials
+    from google_auth_oauthlib.flow import InstalledAppFlow
+
+    token_file = token_file or config.TOKEN_FILE
     creds = None
-    if os.path.exists(config.TOKEN_FILE):
+    if os.path.exists(token_file):
         try:
-            creds = Credentials.from_authorized_user_file(config.TOKEN_FILE, config.SCOPES)
+            creds = Credentials.from_authorized_user_file(token_file, config.SCOPES)
         except Exception as e:
             print(f"Error loading credentials: {e}")
             creds = None
@@ -57,6 +63,9 @@ def get_credentials():
                 print(f"Error refreshing: {e}")
                 creds = None
         
+        if not creds and not interactive:
+            raise RuntimeError(f"No valid credentials in {token_file}; "
+                               f"authorize once with a single-channel run (--channel KEY)")
         if not creds:
             print("No valid credentials. Starting OAuth...")
             flow = InstalledAppFlow.from_client_secrets_file(
@@ -68,28 +77,58 @@ def get_credentials():
             flow.fetch_token(code=code)
             creds = flow.credentials
         
-        with open(config.TOKEN_FILE, 'w') as token:
+        os.makedirs(os.path.dirname(token_file) or ".", exist_ok=True)
+        with open(token_file, 'w') as token:
             token.write(creds.to_json())
     return creds
 
+def client_factory(args):
+    """Return a callable building (youtube, analytics) for live, --record, --replay or --synthetic mode.
+
+    Authentication happens once here; the callable is invoked per worker thread
+    because googleapiclient/httplib2 objects must not be shared between threads.
+    """
+    global OLLAMA_POST, THUMBNAIL_GET
+    import replay
+    from googleapiclient.discovery import build
+    latency = args.latency / 1000.0
+    entry = args.entry
+    if args.replay:
+        backend = replay.ReplayBackend(args.replay, latency=latency)
+    elif args.synthetic:
+        backend = replay.SyntheticBackend.from_spec(args.synthetic, latency=latency,
+                                                    channel_id=entry['channel_id'] or replay.SYNTHETIC_CHANNEL_ID)
+    else:
+        creds = get_credentials(entry['token_file'], interactive=args.interactive)
+        if not creds: return None
+        if not args.record:
+            return lambda: (build("youtube", "v3", credentials=creds), build("youtubeAnalytics", "v2", credentials=creds))
+        backend = replay.RecordingBackend(args.record, creds)
+
+    OLLAMA_POST = backend.post
+    THUMBNAIL_GET = backend.get
+    def make_clients():
+        http = backend.new_http()
+        return build("youtube", "v3", http=http), build("youtubeAnalytics", "v2", http=http)
+    return make_clients
+
 # --- Data Fetching (YouTube Data API) ---
 
 def fetch_channel_info(youtube):
     print("Fetching Channel Info...")
     req = youtube.channels().list(part="snippet,contentDetails,statistics", mine=True)
-    res = req.execute()
+    res = timed_execute(req)
     if not res['items']: return None
     return res['items'][0]
 
-def fetch_all_videos(youtube, channel_id):
-    print("Fetching ALL Videos (Data API)...")
+def playlist_pages(youtube, channel_id):
+    """The channel's uploads playlist, one page (up to 50 video dicts) at a time."""
     # 1. Get Uploads Playlist ID
     req = youtube.channels().list(part="contentDetails", id=channel_id)
-    res = req.execute()
-    if not res['items']: return []
+    res = timed_execute(req)
+    if not res['items']: return
     uploads_id = res['items'][0]['contentDetails']['relatedPlaylists']['uploads']
     
-    videos = []
     next_page = None
     
     while True:
@@ -99,103 +138,175 @@ def fetch_all_videos(youtube, channel_id):
             maxResults=50,
             pageToken=next_page
         )
-        pl_res = pl_req.execute()
+        pl_res = timed_execute(pl_req)
         
+        page = []
         for item in pl_res['items']:
             snippet = item['snippet']
-            videos.append({
+            page.append({
                 'id': snippet['resourceId']['videoId'],
                 'title': snippet['title'],
                 'published_at': snippet['publishedAt'],
                 'thumbnail': snippet['thumbnails'].get('medium', snippet['thumbnails']['default'])['url']
             })
+        yield page
             
         next_page = pl_res.get('nextPageToken')
         if not next_page: break
-        
-    print(f"Found {len(videos)} videos.")
-    
-    # Enrich with Duration (to check Shorts) in batches
+
+def enrich_durations(youtube, pages, chunk_size=50):
+    """Add the duration (to check Shorts) to each page of videos, yielding chunks of up to 50."""
     # YouTube Data API allows 50 ids per call
-    videos_enriched = []
-    chunk_size = 50
-    for i in range(0, len(videos), chunk_size):
-        chunk = videos[i:i+chunk_size]
-        ids = ",".join([v['id'] for v in chunk])
-        
-        v_req = youtube.videos().list(part="contentDetails", id=ids)
-        v_res = v_req.execute()
-        
-        durations = {item['id']: item['contentDetails']['duration'] for item in v_res['items']}
-        
-        for v in chunk:
-            dur = durations.get(v['id'], "")
-            # Simple heuristic: Shorts are usually <= 60s. 
-            # Duration format PT1M, PT59S. 
-            # We will just store the duration string for now or parse it if strictly needed.
-            # Let's simple check: if 'M' is missing or 1M0S, likely short.
-            # But accurate parsing is safer. Let's just store the duration string in DB.
-            is_short = False 
-            if "M" not in dur and "H" not in dur: is_short = True # Less than a minute
-            if "PT1M0S" == dur: is_short = True
+    for page in pages:
+        for i in range(0, len(page), chunk_size):
+            chunk = page[i:i+chunk_size]
+            ids = ",".join([v['id'] for v in chunk])
+            
+            v_req = youtube.videos().list(part="contentDetails", id=ids)
+            v_res = timed_execute(v_req)
             
-            v['duration'] = dur
-            v['is_shorts'] = is_short
-            videos_enriched.append(v)
+            durations = {item['id']: item['contentDetails']['duration'] for item in v_res['items']}
             
-    return videos_enriched
+            for v in chunk:
+                dur = durations.get(v['id'], "")
+                seconds = formats.parse_duration(dur)
+                published = datetime.datetime.strptime(v['published_at'][:19], "%Y-%m-%dT%H:%M:%S")
+                v['duration'] = dur
+                v['duration_seconds'] = seconds
+                v['is_shorts'] = formats.is_short(seconds, published)
+            yield chunk
+
+def comment_row(obj, video_id, parent_id=None, reply_count=0):
+    snip = obj['snippet']
+    return {
+        'id': obj['id'],
+        'video_id': snip.get('videoId') or video_id,
+        'parent_id': parent_id,
+        'text': snip['textDisplay'],
+        'author': snip['authorDisplayName'],
+        'published_at': snip['publishedAt'],
+        'likes': snip['likeCount'],
+        'reply_count': reply_count,
+    }
+
+def fetch_replies(youtube, thread_id, video_id):
+    replies = []
+    next_page = None
+    while True:
+        res = timed_execute(youtube.comments().list(
+            part="snippet", parentId=thread_id, maxResults=100, pageToken=next_page, textFormat="plainText"))
+        replies += [comment_row(item, video_id, thread_id) for item in res.get('items', [])]
+        next_page = res.get('nextPageToken')
+        if not next_page: break
+    return replies
+
+def fetch_comments(youtube, channel_id, newest_known=None):
+    """Comment threads newer than `newest_known` ('YYYY-MM-DDTHH:MM:SSZ'), with their replies.
 
-def fetch_comments(youtube, channel_id):
-    print("Fetching Comments...")
+    Threads arrive newest first, so paging stops at the first one already
+    stored. Replies beyond the few embedded in a thread are paged in via
+    comments.list. A failure returns nothing rather than a partial newest
+    slice, which would make the next run stop early and leave a gap.
+    """
+    print("Fetching Comments" + (f" newer than {newest_known}..." if newest_known else " (full history)..."))
+    comments = []
+    next_page = None
     try:
-        req = youtube.commentThreads().list(
-            part="snippet",
-            allThreadsRelatedToChannelId=channel_id,
-            maxResults=50,
-            order="time"
-        )
-        res = req.execute()
-        comments = []
-        for item in res.get('items', []):
-            top_obj = item['snippet']['topLevelComment']
-            top_snip = top_obj['snippet']
-            comments.append({
-                'id': top_obj['id'],
-                'video_id': top_snip.get('videoId'),
-                'text': top_snip['textDisplay'],
-                'author': top_snip['authorDisplayName'],
-                'published_at': top_snip['publishedAt'],
-                'likes': top_snip['likeCount']
-            })
-        return comments
+        while True:
+            res = timed_execute(youtube.commentThreads().list(
+                part="snippet,replies",
+                allThreadsRelatedToChannelId=channel_id,
+                maxResults=100,
+                order="time",
+                pageToken=next_page
+            ))
+            for item in res.get('items', []):
+                top_obj = item['snippet']['topLevelComment']
+                if newest_known and top_obj['snippet']['publishedAt'] <= newest_known:
+                    next_page = None
+                    break
+                video_id = top_obj['snippet'].get('videoId')
+                reply_count = item['snippet'].get('totalReplyCount', 0)
+                comments.append(comment_row(top_obj, video_id, reply_count=reply_count))
+                embedded = item.get('replies', {}).get('comments', [])
+                if reply_count > len(embedded):
+                    comments += fetch_replies(youtube, top_obj['id'], video_id)
+                else:
+                    comments += [comment_row(r, video_id, top_obj['id']) for r in embedded]
+            else:
+                next_page = res.get('nextPageToken')
+            if not next_page: break
     except Exception as e:
         print(f"Error fetching comments: {e}")
         return []
+    print(f"Fetched {len(comments)} new comments and replies.")
+    return comments
+
+def newest_comment_time(session, channel_id):
+    """publishedAt of the newest stored top-level comment of a channel (API format), or None."""
+    from sqlalchemy import func
+    newest = session.query(func.max(Comment.published_at)).join(Video).filter(
+        Video.channel_id == channel_id, Comment.parent_id.is_(None)).scalar()
+    return newest.strftime("%Y-%m-%dT%H:%M:%SZ") if newest else None
+
+ANALYTICS_RETRY = RetryPolicy()
+ANALYTICS_BREAKER = CircuitBreaker()
+# One breaker per registry channel: the daemon syncs every channel in one process, and one
+# channel's failure streak must not short-circuit the others' queries
+ANALYTICS_BREAKERS = {}
+ANALYTICS_CAPABILITIES = CapabilityCache()
 
 def robust_analytics_query(analytics, **kwargs):
-    """Wrapper to handle retries or missing metrics (e.g. revenue) gracefully."""
-    try:
-        return analytics.reports().query(**kwargs).execute()
-    except Exception as e:
-        metrics = kwargs.get('metrics', "")
-        print(f"Query Error for metrics='{metrics}': {e}")
-        
-        # Check for permission/401 related to revenue
-        if "revenue" in metrics.lower():
-            print("Attempting retry without revenue metrics...")
-            new_metrics = metrics.replace("estimatedRevenue", "").replace(",,", ",").strip(",")
-            if new_metrics.startswith(","): new_metrics = new_metrics[1:]
-            if new_metrics.endswith(","): new_metrics = new_metrics[:-1]
-            
-            kwargs['metrics'] = new_metrics
-            try:
-                return analytics.reports().query(**kwargs).execute()
-            except Exception as e2:
-                print(f"Retry failed: {e2}")
-                return {'rows': [], 'columnHeaders': []}
-        else:
-            print(f"Analytics Query Failed (Non-Revenue): {e}")
-            return {'rows': [], 'columnHeaders': []}
+    """Wrapper to handle retries or missing metrics (e.g. revenue) gracefully.
+
+    - 429/5xx are retried with exponential backoff + jitter.
+    - Metrics the account was denied before (revenue) are dropped up front.
+    - Repeated failures open a circuit breaker that short-circuits further calls.
+    """
+    empty = {'rows': [], 'columnHeaders': []}
+    kwargs['metrics'] = ANALYTICS_CAPABILITIES.filter_metrics(kwargs.get('metrics', ""))
+    COUNTERS['queries'] += 1
+
+    if not ANALYTICS_BREAKER.allow():
+        COUNTERS['short_circuited'] += 1
+        return empty
+
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            res = timed_execute(analytics.reports().query(**kwargs))
+            ANALYTICS_BREAKER.record_success()
+            COUNTERS['succeeded'] += 1
+            return res
+        except Exception as e:
+            metrics = kwargs.get('metrics', "")
+            if ANALYTICS_RETRY.should_retry(e, attempt):
+                wait = ANALYTICS_RETRY.delay(attempt)
+                print(f"Analytics HTTP {http_status(e)}, retrying in {wait:.1f}s (attempt {attempt})...")
+                COUNTERS['retried'] += 1
+                time.sleep(wait)
+                continue
+
+            print(f"Query Error for metrics='{metrics}': {e}")
+            monetary = [m for m in split_metrics(metrics) if m in MONETARY_METRICS]
+            if monetary and http_status(e) not in RETRYABLE_STATUSES:
+                # Likely a permission problem with revenue: retry once without it and,
+                # if that works, remember the denial so later calls skip it directly.
+                print("Attempting retry without revenue metrics...")
+                kwargs['metrics'] = ",".join(m for m in split_metrics(metrics) if m not in MONETARY_METRICS)
+                try:
+                    res = timed_execute(analytics.reports().query(**kwargs))
+                    ANALYTICS_CAPABILITIES.mark_denied(monetary)
+                    ANALYTICS_BREAKER.record_success()
+                    COUNTERS['capability_fallback'] += 1
+                    return res
+                except Exception as e2:
+                    print(f"Retry failed: {e2}")
+
+            ANALYTICS_BREAKER.record_failure()
+            COUNTERS['failed'] += 1
+            return empty
 
 # --- Upsert Logic ---
 
@@ -203,86 +314,100 @@ def upsert_channel_stats(session, channel, daily_res):
     if not daily_res.get('rows'): return
     headers = [h['name'] for h in daily_res.get('columnHeaders')]
     
+    rows = []
     for row in daily_res.get('rows'):
         data = dict(zip(headers, row))
-        date_obj = datetime.datetime.strptime(data['day'], DATE_FORMAT).date()
-        
-        stat = session.query(ChannelDaily).filter_by(channel_id=channel.id, date=date_obj).first()
-        if not stat:
-            stat = ChannelDaily(channel_id=channel.id, date=date_obj)
-            session.add(stat)
-        
-        stat.views = int(data.get('views', 0))
-        stat.estimated_revenue = float(data.get('estimatedRevenue', 0.0))
-        stat.watch_time_minutes = float(data.get('estimatedMinutesWatched', 0))
-        stat.subscribers_gained = int(data.get('subscribersGained', 0))
-        stat.likes = int(data.get('likes', 0))
-        stat.dislikes = int(data.get('dislikes', 0))
-        stat.comments = int(data.get('comments', 0))
-        stat.shares = int(data.get('shares', 0))
-        stat.avg_view_duration_seconds = float(data.get('averageViewDuration', 0.0))
+        rows.append({
+            'channel_id': channel.id,
+            'date': datetime.datetime.strptime(data['day'], DATE_FORMAT).date(),
+            'views': int(data.get('views', 0)),
+            'estimated_revenue': float(data.get('estimatedRevenue', 0.0)),
+            'watch_time_minutes': float(data.get('estimatedMinutesWatched', 0)),
+            'subscribers_gained': int(data.get('subscribersGained', 0)),
+            'likes': int(data.get('likes', 0)),
+            'dislikes': int(data.get('dislikes', 0)),
+            'comments': int(data.get('comments', 0)),
+            'shares': int(data.get('shares', 0)),
+            'avg_view_duration_seconds': float(data.get('averageViewDuration', 0.0)),
+        })
+    snapshots.invalidate(channel.id, "channel_daily", min(r['date'] for r in rows), max(r['date'] for r in rows))
+    upsert(session, ChannelDaily, rows, ['channel_id', 'date'])
+    RUN.add_rows(len(rows))
 
 def upsert_videos(session, channel_id, video_list):
+    rows = []
     for v in video_list:
-        db_vid = session.query(Video).filter_by(id=v['id']).first()
-        if not db_vid:
-            db_vid = Video(id=v['id'], channel_id=channel_id)
-            session.add(db_vid)
-        
-        db_vid.title = v['title']
-        db_vid.thumbnail_url = v['thumbnail']
         try:
-            pub_dt = datetime.datetime.strptime(v['published_at'], "%Y-%m-%dT%H:%M:%SZ")
-            db_vid.published_at = pub_dt
-        except:
-            pass
-            
-        db_vid.video_length = v.get('duration', '')
-        db_vid.is_shorts = v.get('is_shorts', False)
+            published = datetime.datetime.strptime(v['published_at'], "%Y-%m-%dT%H:%M:%SZ")
+        except (TypeError, ValueError):
+            published = None
+        length = v.get('duration', '')
+        rows.append({
+            'id': v['id'],
+            'channel_id': channel_id,
+            'title': v['title'],
+            'thumbnail_url': v['thumbnail'],
+            'published_at': published,
+            'video_length': length,
+            'duration_seconds': v.get('duration_seconds', formats.parse_duration(length)),
+            'is_shorts': v.get('is_shorts', False),
+        })
+    upsert(session, Video, rows, ['id'])
+    RUN.add_rows(len(rows))
 
 def upsert_comments(session, comments):
+    # Comments on videos we don't store (deleted, private, not yet synced) are skipped
+    # to keep the video_id foreign key intact
+    ids = list({c['video_id'] for c in comments if c.get('video_id')})
+    known = set()
+    for k in range(0, len(ids), 500):
+        known.update(v for (v,) in session.query(Video.id).filter(Video.id.in_(ids[k:k + 500])))
+
+    rows = []
     for c in comments:
-        if not c.get('video_id'): continue
-        
-        # Ensure video exists (sometimes comments exist for videos we haven't synced if very old?)
-        # But we create video placeholders if needed or skip? 
-        # Better to skip if video doesn't exist to maintain integrity, or upsert video ID only.
-        
-        # Check if exists
-        db_comment = session.query(Comment).get(c['id'])
-        if not db_comment:
-            db_comment = Comment(id=c['id'], video_id=c['video_id'])
-            session.add(db_comment)
-            
-        db_comment.text = c['text']
-        db_comment.author_name = c['author']
-        db_comment.like_count = c['likes']
+        if c.get('video_id') not in known: continue
         try:
-            db_comment.published_at = datetime.datetime.strptime(c['published_at'], "%Y-%m-%dT%H:%M:%SZ")
-        except:
-            pass
+            published = datetime.datetime.strptime(c['published_at'], "%Y-%m-%dT%H:%M:%SZ")
+        except (TypeError, ValueError):
+            published = None
+        rows.append({
+            'id': c['id'],
+            'video_id': c['video_id'],
+            'parent_id': c.get('parent_id'),
+            'text': c['text'],
+            'author_name': c['author'],
+            'like_count': c['likes'],
+            'reply_count': c.get('reply_count', 0),
+            'published_at': published,
+        })
+    upsert(session, Comment, rows, ['id'])
+    RUN.add_rows(len(rows))
 
-def upsert_video_daily(session, video_id, daily_res):
-    if not daily_res.get('rows'): return
+def video_daily_rows(video_id, daily_res):
+    if not daily_res.get('rows'): return []
     headers = [h['name'] for h in daily_res.get('columnHeaders')]
     
+    rows = []
     for row in daily_res.get('rows'):
         data = dict(zip(headers, row))
-        date_obj = datetime.datetime.strptime(data['day'], DATE_FORMAT).date()
-        
-        stat = session.query(VideoDaily).filter_by(video_id=video_id, date=date_obj).first()
-        if not stat:
-            stat = VideoDaily(video_id=video_id, date=date_obj)
-            session.add(stat)
-        
-        stat.views = int(data.get('views', 0))
-        stat.estimated_revenue = float(data.get('estimatedRevenue', 0.0))
-        stat.watch_time_minutes = float(data.get('estimatedMinutesWatched', 0))
-        stat.subscribers_gained = int(data.get('subscribersGained', 0))
-        stat.likes = int(data.get('likes', 0))
-        stat.dislikes = int(data.get('dislikes', 0))
-        stat.comments = int(data.get('comments', 0))
-        stat.shares = int(data.get('shares', 0))
+        rows.append({
+            'video_id': video_id,
+            'date': datetime.datetime.strptime(data['day'], DATE_FORMAT).date(),
+            'views': int(data.get('views', 0)),
+            'estimated_revenue': float(data.get('estimatedRevenue', 0.0)),
+            'watch_time_minutes': float(data.get('estimatedMinutesWatched', 0)),
+            'subscribers_gained': int(data.get('subscribersGained', 0)),
+            'likes': int(data.get('likes', 0)),
+            'dislikes': int(data.get('dislikes', 0)),
+            'comments': int(data.get('comments', 0)),
+            'shares': int(data.get('shares', 0)),
+        })
+    return rows
+
+def upsert_video_daily(session, video_id, daily_res):
+    rows = video_daily_rows(video_id, daily_res)
+    bulk_load_video_daily(session, rows)
+    RUN.add_rows(len(rows))
 
 def fetch_channel_daily(analytics, start, end):
     print(f"Fetching Channel Daily Stats ({start} to {end})...")
@@ -346,159 +471,197 @@ def fetch_traffic_daily(analytics, start, end):
 
 # --- Upsert Logic ---
 
-def upsert_demographics_age(session, res, date_obj):
+def upsert_demographics_age(session, channel_id, res, date_obj):
     if not res.get('rows'): return
     headers = [h['name'] for h in res.get('columnHeaders')]
     
+    rows = []
     for row in res.get('rows'):
         data = dict(zip(headers, row)) 
-        group = data['ageGroup']
-        
-        rec = session.query(DemographicsAge).filter_by(date=date_obj, age_group=group).first()
-        if not rec:
-            rec = DemographicsAge(date=date_obj, age_group=group)
-            session.add(rec)
-            
-        rec.viewer_percentage = float(data.get('viewerPercentage', 0.0))
-        rec.views = int(data.get('views', 0))
-        rec.watch_time_minutes = float(data.get('estimatedMinutesWatched', 0))
+        rows.append({
+            'channel_id': channel_id,
+            'date': date_obj,
+            'age_group': data['ageGroup'],
+            'viewer_percentage': float(data.get('viewerPercentage', 0.0)),
+            'views': int(data.get('views', 0)),
+            'watch_time_minutes': float(data.get('estimatedMinutesWatched', 0)),
+        })
+    upsert(session, DemographicsAge, rows, ['channel_id', 'date', 'age_group'])
+    cube.record(session, channel_id, "age", [(r['date'], r['age_group'], r['views'], r['watch_time_minutes'],
+                                              r['viewer_percentage']) for r in rows])
+    RUN.add_rows(len(rows))
 
-def upsert_demographics_gender(session, res, date_obj):
+def upsert_demographics_gender(session, channel_id, res, date_obj):
     if not res.get('rows'): return
     headers = [h['name'] for h in res.get('columnHeaders')]
     
+    rows = []
     for row in res.get('rows'):
         data = dict(zip(headers, row))
-        gender = data['gender']
-        
-        rec = session.query(DemographicsGender).filter_by(date=date_obj, gender=gender).first()
-        if not rec:
-            rec = DemographicsGender(date=date_obj, gender=gender)
-            session.add(rec)
-        
-        rec.viewer_percentage = float(data.get('viewerPercentage', 0.0))
-        rec.views = int(data.get('views', 0))
-        rec.watch_time_minutes = float(data.get('estimatedMinutesWatched', 0))
+        rows.append({
+            'channel_id': channel_id,
+            'date': date_obj,
+            'gender': data['gender'],
+            'viewer_percentage': float(data.get('viewerPercentage', 0.0)),
+            'views': int(data.get('views', 0)),
+            'watch_time_minutes': float(data.get('estimatedMinutesWatched', 0)),
+        })
+    upsert(session, DemographicsGender, rows, ['channel_id', 'date', 'gender'])
+    cube.record(session, channel_id, "gender", [(r['date'], r['gender'], r['views'], r['watch_time_minutes'],
+                                                 r['viewer_percentage']) for r in rows])
+    RUN.add_rows(len(rows))
 
-def upsert_geography(session, res, date_obj):
+def upsert_geography(session, channel_id, res, date_obj):
     if not res.get('rows'): return
     headers = [h['name'] for h in res.get('columnHeaders')]
     
+    rows = []
     for row in res.get('rows'):
         data = dict(zip(headers, row))
-        code = data['country']
-        
-        rec = session.query(Geography).filter_by(date=date_obj, country_code=code).first()
-        if not rec:
-            rec = Geography(date=date_obj, country_code=code)
-            session.add(rec)
-        
-        rec.views = int(data.get('views', 0))
-        rec.watch_time_minutes = float(data.get('estimatedMinutesWatched', 0))
+        rows.append({
+            'channel_id': channel_id,
+            'date': date_obj,
+            'country_code': data['country'],
+            'views': int(data.get('views', 0)),
+            'watch_time_minutes': float(data.get('estimatedMinutesWatched', 0)),
+        })
+    snapshots.invalidate(channel_id, "geography", date_obj, date_obj)
+    upsert(session, Geography, rows, ['channel_id', 'date', 'country_code'])
+    cube.record(session, channel_id, "country", [(r['date'], r['country_code'], r['views'],
+                                                  r['watch_time_minutes'], 0.0) for r in rows])
+    RUN.add_rows(len(rows))
 
-def upsert_traffic(session, res):
+def upsert_traffic(session, channel_id, res):
     if not res.get('rows'): return
     headers = [h['name'] for h in res.get('columnHeaders')]
     
+    rows = []
     for row in res.get('rows'):
         data = dict(zip(headers, row))
-        date_obj = datetime.datetime.strptime(data['day'], DATE_FORMAT).date()
-        src = data['insightTrafficSourceType']
-        
-        rec = session.query(TrafficSource).filter_by(date=date_obj, source_type=src).first()
-        if not rec:
-            rec = TrafficSource(date=date_obj, source_type=src)
-            session.add(rec)
-        
-        rec.views = int(data.get('views', 0))
-        rec.watch_time_minutes = float(data.get('estimatedMinutesWatched', 0))
+        rows.append({
+            'channel_id': channel_id,
+            'date': datetime.datetime.strptime(data['day'], DATE_FORMAT).date(),
+            'source_type': data['insightTrafficSourceType'],
+            'views': int(data.get('views', 0)),
+            'watch_time_minutes': float(data.get('estimatedMinutesWatched', 0)),
+        })
+    snapshots.invalidate(channel_id, "traffic", min(r['date'] for r in rows), max(r['date'] for r in rows))
+    upsert(session, TrafficSource, rows, ['channel_id', 'date', 'source_type'])
+    cube.record(session, channel_id, "traffic", [(r['date'], r['source_type'], r['views'],
+                                                  r['watch_time_minutes'], 0.0) for r in rows])
+    RUN.add_rows(len(rows))
 
 
 # --- Competitor & AI Logic ---
 
-def fetch_competitors(youtube, session):
-    if not COMPETITOR_CHANNEL_IDS:
+def fetch_competitors(youtube):
+    """Poll the configured competitors; returns {"channels": [...], "videos": [...], "fetched_at": now}.
+
+    Network only: the rows are plain dicts for store_competitors(), so no DB
+    lock or write transaction is held while the API calls run.
+    """
+    ids = competitors.load_ids()
+    if not ids:
         print("No competitor IDs configured. Skipping competitor fetch.")
-        return
+        return None
 
-    print("Fetching Competitor Data...")
-    ids_str = ",".join(COMPETITOR_CHANNEL_IDS)
+    print(f"Fetching Competitor Data ({len(ids)} channels)...")
+    now = datetime.datetime.utcnow()
     
-    # 1. Channel Stats
-    req = youtube.channels().list(
-        part="snippet,statistics,contentDetails",
-        id=ids_str
-    )
-    res = req.execute()
-    
-    for item in res.get('items', []):
-        cid = item['id']
-        snippet = item['snippet']
-        stats = item['statistics']
-        
-        comp = session.query(CompetitorChannel).get(cid)
-        if not comp:
-            comp = CompetitorChannel(channel_id=cid, channel_name=snippet['title'])
-            session.add(comp)
-            
-        comp.channel_name = snippet['title']
-        comp.custom_url = snippet.get('customUrl')
-        comp.thumbnail_url = snippet['thumbnails']['default']['url']
-        comp.subscribers = int(stats.get('subscriberCount', 0))
-        comp.total_views = int(stats.get('viewCount', 0))
-        comp.video_count = int(stats.get('videoCount', 0))
-        comp.last_fetched = datetime.datetime.utcnow()
+    # 1. Channel Stats (50 IDs per call)
+    channel_rows = []
+    uploads = {}
+    for k in range(0, len(ids), 50):
+        req = youtube.channels().list(
+            part="snippet,statistics,contentDetails",
+            id=",".join(ids[k:k + 50])
+        )
+        res = timed_execute(req)
         
-        # 2. Recent Videos (Last 3)
-        uploads_id = item['contentDetails']['relatedPlaylists']['uploads']
+        for item in res.get('items', []):
+            snippet = item['snippet']
+            stats = item['statistics']
+            channel_rows.append({
+                'channel_id': item['id'],
+                'channel_name': snippet['title'],
+                'custom_url': snippet.get('customUrl'),
+                'thumbnail_url': snippet['thumbnails']['default']['url'],
+                'subscribers': int(stats.get('subscriberCount', 0)),
+                'total_views': int(stats.get('viewCount', 0)),
+                'video_count': int(stats.get('videoCount', 0)),
+            })
+            uploads[item['id']] = item['contentDetails']['relatedPlaylists']['uploads']
         
+    # 2. Recent Videos
+    video_snippets = {}
+    for cid, uploads_id in uploads.items():
         pl_req = youtube.playlistItems().list(
             part="snippet",
             playlistId=uploads_id,
-            maxResults=3
+            maxResults=config.COMPETITOR_RECENT_VIDEOS
         )
         try:
-            pl_res = pl_req.execute()
-            video_ids = []
-            video_snippets = {}
-            for v_item in pl_res.get('items', []):
-                vid = v_item['snippet']['resourceId']['videoId']
-                video_ids.append(vid)
-                video_snippets[vid] = v_item['snippet']
+            pl_res = timed_execute(pl_req)
+        except Exception as e:
+            print(f"Error fetching videos for {cid}: {e}")
+            continue
+        for v_item in pl_res.get('items', []):
+            video_snippets[v_item['snippet']['resourceId']['videoId']] = (cid, v_item['snippet'])
             
-            # Fetch Video Stats
-            if video_ids:
-                v_stats_req = youtube.videos().list(
-                    part="statistics",
-                    id=",".join(video_ids)
-                )
-                v_stats_res = v_stats_req.execute()
-                
-                for v_item in v_stats_res.get('items', []):
-                    vid = v_item['id']
-                    stats = v_item['statistics']
-                    snippet = video_snippets.get(vid)
-                    
-                    cv = session.query(CompetitorVideo).get(vid)
-                    if not cv:
-                        cv = CompetitorVideo(video_id=vid, channel_id=cid)
-                        session.add(cv)
-                    
-                    if snippet:
-                        cv.title = snippet['title']
-                        cv.published_at = datetime.datetime.strptime(snippet['publishedAt'], "%Y-%m-%dT%H:%M:%SZ")
-                    
-                    cv.view_count = int(stats.get('viewCount', 0))
-                    cv.like_count = int(stats.get('likeCount', 0))
-                    cv.comment_count = int(stats.get('commentCount', 0))
-                    cv.last_fetched = datetime.datetime.utcnow()
-                    
+    # Fetch Video Stats (50 IDs per call across all competitors)
+    video_rows = []
+    video_ids = list(video_snippets)
+    for k in range(0, len(video_ids), 50):
+        v_stats_req = youtube.videos().list(
+            part="statistics",
+            id=",".join(video_ids[k:k + 50])
+        )
+        try:
+            v_stats_res = timed_execute(v_stats_req)
         except Exception as e:
-            print(f"Error fetching videos for {comp.channel_name}: {e}")
+            print(f"Error fetching competitor video stats: {e}")
+            continue
+            
+        for v_item in v_stats_res.get('items', []):
+            stats = v_item['statistics']
+            cid, snippet = video_snippets[v_item['id']]
+            video_rows.append({
+                'video_id': v_item['id'],
+                'channel_id': cid,
+                'title': snippet['title'],
+                'published_at': datetime.datetime.strptime(snippet['publishedAt'], "%Y-%m-%dT%H:%M:%SZ"),
+                'view_count': int(stats.get('viewCount', 0)),
+                'like_count': int(stats.get('likeCount', 0)),
+                'comment_count': int(stats.get('commentCount', 0)),
+            })
+
+    return {"channels": channel_rows, "videos": video_rows, "fetched_at": now}
 
+def store_competitors(session, fetched):
+    """Upsert a fetch_competitors() result and append the changed counters to the history."""
+    now = fetched["fetched_at"]
+    # Rows in key order, so concurrent writers take the row locks in the same order
+    channel_rows = sorted(fetched["channels"], key=lambda r: r['channel_id'])
+    video_rows = sorted(fetched["videos"], key=lambda r: r['video_id'])
+    upsert(session, CompetitorChannel, [dict(r, last_fetched=now) for r in channel_rows], ['channel_id'])
+    upsert(session, CompetitorVideo, [dict(r, last_fetched=now) for r in video_rows], ['video_id'])
+    RUN.add_rows(len(fetched["channels"]) + len(fetched["videos"]))
+
+    # History: only counters that changed since the last poll are appended
+    channel_obs = [(r['channel_id'], {"subscribers": r['subscribers'], "views": r['total_views'],
+                                      "videos": r['video_count']}) for r in fetched["channels"]]
+    video_obs = [(r['video_id'], {"views": r['view_count'], "likes": r['like_count'],
+                                  "comments": r['comment_count']}) for r in fetched["videos"]]
+    ts = now.replace(tzinfo=datetime.timezone.utc).timestamp()
+    written = (competitors.record(session, competitors.CHANNEL, channel_obs, ts) +
+               competitors.record(session, competitors.VIDEO, video_obs, ts))
+    print(f"Competitor history: {written} changed counters recorded.")
     session.commit()
 
-def analyze_with_ollama(session, my_channel_id):
+def analyze_with_ollama(session, my_channel_id, out_dir):
+    import requests
+    import prediction
+
     print("Running AI Analysis (Ollama)...")
     
     # Gather Data
@@ -507,15 +670,20 @@ def analyze_with_ollama(session, my_channel_id):
     
     # --- Intergrate Prediction Engine ---
     print("Generating Fresh Predictions (XGBoost/MA/WMA)...")
-    try:
-        prediction.generate_predictions() # This updates dashboard/public/prediction_data.json
-    except Exception as e:
-        print(f"Prediction Generation Failed: {e}")
+    pred_path = out_dir / "prediction_data.json"
+    with RUN.stage("prediction"):
+        try:
+            prediction.generate_predictions(my_channel_id, pred_path)
+            RUN.add_bytes(os.path.getsize(pred_path))
+            if channels.single_channel():
+                shutil.copy(pred_path, prediction.OUTPUT_PATH)  # legacy location the dashboard reads
+        except Exception as e:
+            print(f"Prediction Generation Failed: {e}")
         
     # Read Prediction Data
     pred_summary = "No prediction data available."
     try:
-        with open('dashboard/public/prediction_data.json', 'r') as f:
+        with open(pred_path, 'r') as f:
             p_data = json.load(f)
             # Extract XGBoost for Views
             xgb_views = p_data.get('predictions', {}).get('xgboost', {}).get('view_count', [])
@@ -545,10 +713,13 @@ def analyze_with_ollama(session, my_channel_id):
     my_subs_30d = sum(s.subscribers_gained for s in my_stats)
     my_avg_views = int(my_views_30d / len(my_stats)) if my_stats else 0
     
-    competitors = session.query(CompetitorChannel).all()
+    now = time.time()
+    comp_growth = competitors.growth(session, competitors.CHANNEL, now - 30 * 86400, now)
     comp_context = []
-    for c in competitors:
-        comp_context.append(f"- {c.channel_name}: {c.subscribers} Subs, {c.total_views} Total Views")
+    for c in session.query(CompetitorChannel).all():
+        gained = comp_growth.get(c.channel_id, {}).get("subscribers")
+        trend = f" ({gained[2]:+d} Subs in 30d)" if gained else ""
+        comp_context.append(f"- {c.channel_name}: {c.subscribers} Subs, {c.total_views} Total Views{trend}")
         
     comp_text = "\\n".join(comp_context) if comp_context else "No competitor data available."
     
@@ -587,12 +758,13 @@ def analyze_with_ollama(session, my_channel_id):
     """
     
     try:
-        response = requests.post(OLLAMA_API_URL, json={
-            "model": OLLAMA_MODEL,
-            "prompt": prompt,
-            "stream": False,
-            "format": "json"
-        }, timeout=300) # 300s timeout for slower CPUs
+        with RUN.stage("ai"):
+            response = (OLLAMA_POST or requests.post)(OLLAMA_API_URL, json={
+                "model": OLLAMA_MODEL,
+                "prompt": prompt,
+                "stream": False,
+                "format": "json"
+            }, timeout=300) # 300s timeout for slower CPUs
         
         if response.status_code == 200:
             res_json = response.json()
@@ -633,25 +805,74 @@ def analyze_with_ollama(session, my_channel_id):
 
 # --- JSON Generator (Frontend Compat) ---
 
-def generate_frontend_json(session, channel_id):
-    print("Generating dashboard_data.json from Relational DB...")
+def previous_ai_insights(channel_id):
+    """AI insights from the channel's last dashboard JSON (kept when re-rendering without AI)."""
+    paths = [channels.bundle_dir(channel_id) / "dashboard_data.json"]
+    if channels.single_channel():
+        paths.append(config.DASHBOARD_DATA_FILE)  # renders from before per-channel bundles
+    for path in paths:
+        try:
+            with open(path, 'r') as f:
+                return json.load(f).get('ai_insights')
+        except (OSError, ValueError):
+            continue
+    return None
+
+# Trend chart series -> channel_daily_stats column
+TREND_COLUMNS = {
+    'views': 'views',
+    'revenue': 'estimated_revenue',
+    'subscribers': 'subscribers_gained',
+    'likes': 'likes',
+    'comments': 'comments',
+    'averageViewDuration': 'avg_view_duration_seconds',
+    'estimatedMinutesWatched': 'watch_time_minutes',
+}
+
+def channel_history(session, channel_id):
+    """Daily channel stats as typed arrays: 'day' (days since epoch) plus every TREND_COLUMNS series.
+
+    Reads the Parquet snapshot when there is one, otherwise streams a Core
+    select; either way no ORM objects or DataFrames are built.
+    """
+    import columnar
+
+    dtypes = {'date': columnar.DAYS}
+    dtypes.update((c, columnar.column_dtype(ChannelDaily.__table__.c[c])) for c in TREND_COLUMNS.values())
+    table = snapshots.read_table("channel_daily", columns=list(dtypes), channel_id=channel_id)
+    if table is not None:
+        arrays = columnar.from_arrow(table, dtypes)
+    else:
+        from sqlalchemy import select
+        stmt = select(*[ChannelDaily.__table__.c[c] for c in dtypes]).where(
+            ChannelDaily.channel_id == channel_id).order_by(ChannelDaily.date)
+        arrays = columnar.stream_columns(session.connection(), stmt, dtypes)
+    out = {'day': arrays.pop('date')}
+    out.update((name, arrays[col]) for name, col in TREND_COLUMNS.items())
+    return out
+
+def generate_frontend_json(session, channel_id, with_ai=True):
+    import columnar
+
+    print(f"Generating dashboard_data.json for {channel_id} from Relational DB...")
+    out_dir = channels.bundle_dir(channel_id)
+    out_dir.mkdir(parents=True, exist_ok=True)
     
     # 1. Summary (Last 30 days)
-    # We can query ChannelDaily for the last 30 entries
     end_date = datetime.date.today()
     start_date = end_date - datetime.timedelta(days=30)
     
     channel = session.query(Channel).filter_by(id=channel_id).first()
-    stats_30d = session.query(ChannelDaily).filter(
-        ChannelDaily.channel_id == channel_id,
-        ChannelDaily.date >= start_date
-    ).all()
+    # Full daily history as typed arrays: feeds the 30-day summary and every trend rollup
+    history = channel_history(session, channel_id)
+    days = history.pop('day')
+    recent = days >= start_date.toordinal() - columnar.EPOCH_ORDINAL
     
-    total_views = sum(s.views for s in stats_30d)
-    total_rev = sum(s.estimated_revenue for s in stats_30d)
-    total_subs = sum(s.subscribers_gained for s in stats_30d)
-    total_wt = sum(s.watch_time_minutes for s in stats_30d) / 60
-    total_likes = sum(s.likes for s in stats_30d)
+    total_views = int(history['views'][recent].sum())
+    total_rev = float(history['revenue'][recent].sum())
+    total_subs = int(history['subscribers'][recent].sum())
+    total_wt = float(history['estimatedMinutesWatched'][recent].sum()) / 60
+    total_likes = int(history['likes'][recent].sum())
     
     summary = {
         "channel_name": channel.name if channel else "Unknown",
@@ -666,39 +887,16 @@ def generate_frontend_json(session, channel_id):
     }
     
     # 2. Trends (Daily/Weekly/Monthly)
-    # Fetch ALL history for trends
-    all_stats = session.query(ChannelDaily).filter_by(channel_id=channel_id).order_by(ChannelDaily.date).all()
-    
-    df = pd.DataFrame([{
-        'dates': s.date.strftime(DATE_FORMAT),
-        'views': s.views,
-        'revenue': s.estimated_revenue,
-        'subscribers': s.subscribers_gained,
-        'likes': s.likes,
-        'comments': s.comments,
-        'averageViewDuration': s.avg_view_duration_seconds,
-        'estimatedMinutesWatched': s.watch_time_minutes
-    } for s in all_stats])
-    
-    if df.empty:
+    if not len(days):
         trend_data = {"daily": {}, "weekly": {}, "monthly": {}}
     else:
-        df['dt'] = pd.to_datetime(df['dates'])
-        
-        # Resample logic
-        def resample_df(frame, freq):
-            r = frame.set_index('dt').resample(freq).sum().reset_index()
-            r['dates'] = r['dt'].dt.strftime(DATE_FORMAT)
-            return r.drop(columns=['dt'])
-            
-        daily = df.drop(columns=['dt'])
-        weekly = resample_df(df, 'W-MON')
-        monthly = resample_df(df, 'ME')
-        
+        def series_json(labels, series):
+            return {"dates": columnar.day_strings(labels), **{k: v.tolist() for k, v in series.items()}}
+
         trend_data = {
-            "daily": daily.to_dict(orient='list'),
-            "weekly": weekly.to_dict(orient='list'),
-            "monthly": monthly.to_dict(orient='list')
+            "daily": series_json(days, history),
+            "weekly": series_json(*columnar.rollup_weekly(days, history)),
+            "monthly": series_json(*columnar.rollup_monthly(days, history))
         }
         
     # 3. Top Videos (Aggregated from VideoDaily or from Video metadata + Snapshot?)
@@ -713,43 +911,58 @@ def generate_frontend_json(session, channel_id):
         func.sum(VideoDaily.comments).label('total_comments'),
         func.sum(VideoDaily.shares).label('total_shares'),
         func.sum(VideoDaily.estimated_revenue).label('total_rev')
-    ).filter(
+    ).join(Video, Video.id == VideoDaily.video_id).filter(
+        Video.channel_id == channel_id,
         VideoDaily.date >= start_date
     ).group_by(VideoDaily.video_id).order_by(func.sum(VideoDaily.views).desc()).limit(10).all()
     
+    import thumbnails
+    import similarity
+    top_meta = {v.id: v for v in session.query(Video).filter(Video.id.in_([r.video_id for r in top_v_query]))}
+    # Hashed local copies (original + card-size AVIF/WebP) where cached, else the remote URL
+    local_thumbs = thumbnails.lookup(session, [v.thumbnail_url for v in top_meta.values()])
+    # Nearest competitor titles from the similarity index (built by the similarity stage)
+    similar = similarity.similar_competitor_videos(similarity.open_index(), [r.video_id for r in top_v_query])
+    similar_meta = {v.video_id: v for v in session.query(CompetitorVideo).filter(
+        CompetitorVideo.video_id.in_([vid for hits in similar.values() for vid, _, _ in hits]))}
+    
     top_videos_list = []
     for row in top_v_query:
-        vid = session.query(Video).get(row.video_id)
+        vid = top_meta.get(row.video_id)
+        remote = vid.thumbnail_url if vid else ""
+        variants = dict(local_thumbs.get(remote, {}))
+        original = next((variants.pop(ext) for ext in ("jpg", "png", "gif") if ext in variants), None)
         top_videos_list.append({
             "video": row.video_id,
             "title": vid.title if vid else row.video_id,
-            "thumbnail": vid.thumbnail_url if vid else "",
+            "thumbnail": original or variants.get("webp") or remote,
+            "thumbnail_sources": variants,
             "views": row.total_views,
             "likes": row.total_likes,
             "comments": row.total_comments,
             "shares": row.total_shares,
-            "estimatedRevenue": round(row.total_rev, 2)
+            "estimatedRevenue": round(row.total_rev, 2),
+            "similar_competitor_videos": [{
+                "video": cvid,
+                "title": title,
+                "channel": similar_meta[cvid].channel.channel_name if cvid in similar_meta else None,
+                "views": similar_meta[cvid].view_count if cvid in similar_meta else None,
+                "similarity": round(score, 3),
+            } for cvid, title, score in similar.get(row.video_id, [])]
         })
 
-    # 4. Demographics
-    # Aggregate Age
-    age_query = session.query(
-        DemographicsAge.age_group,
-        func.sum(DemographicsAge.views).label('total_views')
-    ).filter(DemographicsAge.date >= start_date).group_by(DemographicsAge.age_group).all()
+    # 4. Demographics, geography and traffic come from the breakdown cube:
+    # window totals are two prefix-sum lookups per member, whatever the window length
+    age_cells = cube.window(session, channel_id, "age", start_date, end_date)
+    total_age_views = sum(v for _, v, _, _ in age_cells)
+    if total_age_views:
+        age_rows = [[m, "All", v / total_age_views * 100] for m, v, _, _ in age_cells]
+    else:  # the API reports viewerPercentage only
+        age_rows = [[m, "All", share] for m, _, _, share in age_cells]
     
-    # Calculate %
-    total_age_views = sum(x.total_views for x in age_query) or 1
-    age_rows = [[x.age_group, "All", x.total_views/total_age_views*100] for x in age_query] # Approximation
-    
-    # Geography
-    geo_query = session.query(
-        Geography.country_code,
-        func.sum(Geography.views).label('v'),
-        func.sum(Geography.watch_time_minutes).label('wt')
-    ).group_by(Geography.country_code).order_by(func.sum(Geography.views).desc()).limit(10).all()
-    
-    geo_rows = [[x.country_code, x.v, x.wt] for x in geo_query]
+    # Geography rows are per-sync window totals; the cube averages the syncs in the last 30 days
+    geo_rows = [[m, int(round(v)), wt] for m, v, wt, _ in
+                cube.window(session, channel_id, "country", start_date, end_date, limit=10)]
     
     demographics = {
         "age_gender": {"headers": ["ageGroup", "gender", "viewerPercentage"], "rows": age_rows},
@@ -757,16 +970,22 @@ def generate_frontend_json(session, channel_id):
     }
     
     # 5. Traffic
-    traf_query = session.query(
-        TrafficSource.source_type,
-        func.sum(TrafficSource.views).label('v'),
-        func.sum(TrafficSource.watch_time_minutes).label('wt')
-    ).filter(TrafficSource.date >= start_date).group_by(TrafficSource.source_type).order_by(func.sum(TrafficSource.views).desc()).all()
-    
-    traffic_out = [{"insightTrafficSourceType": x.source_type, "views": x.v, "estimatedMinutesWatched": x.wt} for x in traf_query]
+    traffic_out = [{"insightTrafficSourceType": m, "views": v, "estimatedMinutesWatched": wt}
+                   for m, v, wt, _ in cube.window(session, channel_id, "traffic", start_date, end_date)]
 
-    # 6. AI Insights
-    ai_insights = analyze_with_ollama(session, channel_id)
+    # 6. Shorts vs long-form (by length) from the precomputed per-format daily rows
+    formats_out = [{
+        "segment": r["segment"],
+        "videos": r["videos"],
+        "views": int(r["views"] or 0),
+        "estimatedMinutesWatched": round(r["watch_time_minutes"] or 0, 1),
+        "estimatedRevenue": round(r["estimated_revenue"] or 0, 2),
+        "likes": int(r["likes"] or 0),
+        "subscribersGained": int(r["subscribers_gained"] or 0),
+    } for r in formats.totals(session, channel_id, start_date, end_date)]
+
+    # 7. AI Insights (render-only runs keep the previous analysis)
+    ai_insights = analyze_with_ollama(session, channel_id, out_dir) if with_ai else previous_ai_insights(channel_id)
     if not ai_insights:
         # Fallback/Default
         ai_insights = {
@@ -784,8 +1003,12 @@ def generate_frontend_json(session, channel_id):
             }
         }
 
-    # 7. Recent Comments
-    recent_comments = session.query(Comment).outerjoin(Video).order_by(Comment.published_at.desc()).limit(50).all()
+    # 8. Anomalies flagged by the streaming detector in the last 30 days
+    anomalies_json = anomalies.recent(session, channel_id, start_date)
+
+    # 9. Recent Comments
+    recent_comments = session.query(Comment).join(Video).filter(
+        Video.channel_id == channel_id, Comment.parent_id.is_(None)).order_by(Comment.published_at.desc()).limit(50).all()
     print(f"DEBUG: Found {len(recent_comments)} comments in DB for JSON.")
     comments_json = []
     for c in recent_comments:
@@ -807,109 +1030,442 @@ def generate_frontend_json(session, channel_id):
         "top_videos": top_videos_list,
         "demographics": demographics,
         "traffic_sources": traffic_out,
-        "comments": comments_json
+        "formats": formats_out,
+        "comments": comments_json,
+        "anomalies": anomalies_json
     }
     
-    with open(config.DASHBOARD_DATA_FILE, 'w') as f:
+    bundle_path = out_dir / "dashboard_data.json"
+    with open(bundle_path, 'w') as f:
         json.dump(final_json, f, indent=4)
-        
-    # Copy to public
-    public_path = config.BASE_DIR / "dashboard" / "public" / "dashboard_data.json"
-    public_path.parent.mkdir(parents=True, exist_ok=True)
-    shutil.copy(config.DASHBOARD_DATA_FILE, public_path)
+    RUN.add_bytes(os.path.getsize(bundle_path))
+    channels.write_index(session.query(Channel).all())
+
+    if channels.single_channel():
+        # Legacy top-level files the current dashboard build reads
+        shutil.copy(bundle_path, config.DASHBOARD_DATA_FILE)
+        public_path = config.PUBLIC_DIR / "dashboard_data.json"
+        public_path.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copy(bundle_path, public_path)
     print("Dashboard JSON Generated & Synced.")
+    return bundle_path
     
 
 # --- Main Logic ---
 
-def main():
+def main(argv=None):
     parser = argparse.ArgumentParser(description="YouTube Data Fetcher & Sync")
     parser.add_argument("--init", action="store_true", help="Run 3-Year Historical Backfill")
-    args = parser.parse_args()
-    
-    init_db()
+    parser.add_argument("--profile", action="store_true", help="Collect cProfile dumps, SQL timings and peak RSS per stage")
+    parser.add_argument("--record", nargs="?", const=str(config.FIXTURES_DIR), metavar="DIR",
+                        help="Capture Data API, Analytics and Ollama responses to a fixture store")
+    parser.add_argument("--replay", nargs="?", const=str(config.FIXTURES_DIR), metavar="DIR",
+                        help="Serve API and Ollama responses from a recorded fixture store")
+    parser.add_argument("--synthetic", metavar="SPEC",
+                        help="Serve a generated channel, e.g. 'videos=10000,years=3,comments=2000'")
+    parser.add_argument("--latency", type=float, default=0.0, metavar="MS",
+                        help="Artificial per-request latency for --replay/--synthetic")
+    stage_list = lambda s: [x.strip() for x in s.split(",") if x.strip()]
+    parser.add_argument("--only", type=stage_list, metavar="STAGES",
+                        help=f"Run only these stages (comma separated): {', '.join(SYNC_PIPELINE.stages)}")
+    parser.add_argument("--skip", type=stage_list, metavar="STAGES", help="Skip these stages (comma separated)")
+    parser.add_argument("--force", action="store_true", help="Run stages even if their inputs are unchanged")
+    parser.add_argument("--workers", type=int, default=4, help="Max concurrently running network stages")
+    parser.add_argument("--channel", type=stage_list, metavar="KEYS",
+                        help="Sync only these channels from the registry (comma separated keys)")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1,
+                        help="Channels synced in parallel, one process each")
+    parser.add_argument("--daemon", action="store_true",
+                        help="Stay resident and run jobs at their cadences (config.DAEMON_CADENCES)")
+    parser.add_argument("--port", type=int, default=config.DAEMON_PORT, help="--daemon health endpoint port")
+    args = parser.parse_args(argv)
+    entries = channels.select(channels.load_registry(), args.channel)
+
+    init_db()  # create/migrate the schema once, before any channel process starts
+    if args.daemon:
+        import daemon
+        daemon.run(args, entries)
+    elif len(entries) == 1:
+        run_channel(entries[0], args)
+    else:
+        sync_all(entries, args)
+
+def run_channel(entry, args, interactive=True, make_clients=None):
+    """Sync one registry channel in this process, with its own state, capabilities and metrics."""
+    global ANALYTICS_CAPABILITIES, ANALYTICS_BREAKER
+    args.entry = entry
+    args.interactive = interactive
+    ANALYTICS_CAPABILITIES = CapabilityCache(channels.state_path(entry, config.ANALYTICS_CAPABILITIES_FILE))
+    ANALYTICS_BREAKER = ANALYTICS_BREAKERS.setdefault(entry['key'], CircuitBreaker())
+
+    if args.profile:
+        from profiling import Profiler
+        from database import enable_sql_profiling
+        out_dir = None if channels.is_legacy(entry) else \
+            os.path.join(config.PROFILE_DIR, entry['key'], datetime.datetime.now().strftime("%Y%m%d-%H%M%S"))
+        RUN.profiler = Profiler(out_dir)
+        enable_sql_profiling(RUN.profiler.record_sql)
+
+    RUN.reset()
+    try:
+        return sync(args, make_clients)
+    finally:
+        if channels.is_legacy(entry):
+            RUN.write()
+        else:
+            prom_root, _ = os.path.splitext(config.PROMETHEUS_TEXTFILE)
+            RUN.write(channels.state_path(entry, config.METRICS_DIR),
+                      f"{prom_root}_{entry['key']}.prom", labels={"channel": entry['key']})
+        if RUN.profiler:
+            RUN.profiler.dump()
+
+def poll_competitors(args, entry, make_clients=None):
+    """Poll the competitor list once for a multi-channel run, with `entry`'s API clients.
+
+    Competitors are shared by every channel, so sync_all and the daemon call
+    this before the channel syncs and set args.competitors_polled; their
+    competitors stage then only reads the stored list instead of spending
+    quota on the same requests once per channel. Honours --only/--skip, and
+    polls at most once a day unless the stage is forced.
+    """
+    from sqlalchemy import func
+    if "competitors" not in SYNC_PIPELINE.select(args.only, args.skip):
+        return
     session = get_session()
-    
-    creds = get_credentials()
-    if not creds: return
-    
-    youtube = build("youtube", "v3", credentials=creds)
-    analytics = build("youtubeAnalytics", "v2", credentials=creds)
-    
-    # 1. Channel Info
+    try:
+        last = session.query(func.max(CompetitorChannel.last_fetched)).scalar()
+        forced = args.force is True or (args.force and "competitors" in args.force)
+        if not forced and last and last.date() == datetime.datetime.utcnow().date():
+            print("Competitors already polled today.")
+            return
+        if not make_clients:
+            make_clients = client_factory(argparse.Namespace(**dict(vars(args), entry=entry, interactive=False)))
+            if not make_clients:
+                return
+        youtube, _ = make_clients()
+        fetched = fetch_competitors(youtube)
+        if fetched:
+            store_competitors(session, fetched)
+    finally:
+        session.close()
+
+def sync_all(entries, args):
+    """Sync every channel in its own process so throughput scales with cores."""
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    failed = []
+    try:
+        poll_competitors(args, entries[0])
+    except Exception as e:
+        print(f"Competitor poll failed: {e}")
+        failed.append("competitors")
+    args.competitors_polled = True
+
+    workers = max(1, min(args.processes, len(entries)))
+    print(f"Syncing {len(entries)} channels in {workers} processes...")
+    # spawn: children must not inherit this process's pooled DB connections
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        futures = {pool.submit(run_channel, e, args, False): e['key'] for e in entries}
+        for fut in as_completed(futures):
+            key = futures[fut]
+            try:
+                fut.result()
+                print(f"[{key}] sync finished")
+            except Exception as e:
+                print(f"[{key}] sync failed: {e}")
+                failed.append(key)
+    if failed:
+        raise SystemExit(f"Sync failed for: {', '.join(failed)}")
+
+# --- Sync Pipeline (DAG) ---
+
+def sync_window(args):
+    from dateutil.relativedelta import relativedelta
+    today = datetime.date.today()
+    if args.init:
+        start_date = (today - relativedelta(years=3)).strftime(DATE_FORMAT)
+    else:
+        start_date = (today - datetime.timedelta(days=30)).strftime(DATE_FORMAT)
+    end_date = (today - datetime.timedelta(days=3)).strftime(DATE_FORMAT) # T-3 safety
+    return start_date, end_date
+
+def window_params(ctx):
+    return {"window": sync_window(ctx.args)}
+
+def video_window_params(ctx):
+    return {"window": sync_window(ctx.args), "recent_days": getattr(ctx.args, 'recent_days', None)}
+
+def today_params(ctx):
+    return {"day": datetime.date.today().isoformat()}
+
+def stage_channel_info(ctx):
+    youtube, _ = ctx.clients()
     c_info = fetch_channel_info(youtube)
     if not c_info:
-        print("Channel Not Found.")
-        return
+        raise RuntimeError("Channel Not Found.")
         
     cid = c_info['id']
-    # Upsert Channel
-    ch = session.query(Channel).filter_by(id=cid).first()
+    expected = ctx.args.entry['channel_id']
+    if expected and cid != expected:
+        raise RuntimeError(f"Token {ctx.args.entry['token_file']} belongs to {cid}, "
+                           f"but channel '{ctx.args.entry['key']}' is registered as {expected}")
+    with ctx.db_lock:
+        session = ctx.session()
+        # Upsert Channel
+        ch = session.query(Channel).filter_by(id=cid).first()
+        if not ch:
+            ch = Channel(id=cid, name="Loading...")
+            session.add(ch)
+        
+        ch.name = c_info['snippet']['title']
+        ch.profile_image = c_info['snippet']['thumbnails']['default']['url']
+        ch.last_updated = datetime.datetime.utcnow()
+        session.commit()
+    return {"channel": cid}
+
+def restore_channel(ctx):
+    query = ctx.session().query(Channel)
+    if ctx.args.entry['channel_id']:
+        query = query.filter_by(id=ctx.args.entry['channel_id'])
+    ch = query.first()
     if not ch:
-        ch = Channel(id=cid, name="Loading...")
-        session.add(ch)
-    
-    ch.name = c_info['snippet']['title']
-    ch.profil_image = c_info['snippet']['thumbnails']['default']['url']
-    ch.last_updated = datetime.datetime.utcnow()
-    session.commit()
+        raise RuntimeError("No channel in DB; run the channel_info stage first.")
+    return {"channel": ch.id}
+
+def stage_competitors(ctx):
+    # A multi-channel run polls the shared competitor list once up front (poll_competitors)
+    if not getattr(ctx.args, 'competitors_polled', False):
+        youtube, _ = ctx.clients()
+        fetched = fetch_competitors(youtube)
+        with ctx.db_lock:
+            if fetched:
+                store_competitors(ctx.session(), fetched)
+    return {"competitors": [c.channel_id for c in ctx.session().query(CompetitorChannel).all()]}
+
+def stage_channel_stats(ctx):
+    _, analytics = ctx.clients()
+    start_date, end_date = sync_window(ctx.args)
+    res = fetch_channel_daily(analytics, start_date, end_date)
+    with ctx.db_lock:
+        session = ctx.session()
+        upsert_channel_stats(session, session.get(Channel, ctx.get("channel")), res)
+        anomalies.update(session, "channel", ctx.get("channel"))
+        session.commit()
+    return {"channel_daily": res.get('rows')}
+
+def stage_videos(ctx):
+    # Playlist pages -> duration lookups -> upserts, each step in its own thread with
+    # bounded buffers: the first page is stored while later ones are still being listed
+    cid = ctx.get("channel")
+
+    def pages():
+        youtube, _ = ctx.clients()
+        yield from playlist_pages(youtube, cid)
+
+    def enrich(pages):
+        youtube, _ = ctx.clients()
+        yield from enrich_durations(youtube, pages)
+
+    print("Fetching ALL Videos (Data API)...")
+    digest, count = hashlib.sha1(), 0
+    for chunk in streamed(pages(), enrich):
+        with ctx.db_lock:
+            upsert_videos(ctx.session(), cid, chunk)
+            ctx.session().commit()
+        digest.update(json.dumps(chunk, sort_keys=True).encode())
+        count += len(chunk)
+    print(f"Found {count} videos.")
+    # Downstream stages read the catalog from the DB; the digest only tells them it changed
+    return {"videos": digest.hexdigest()}
+
+def stage_comments(ctx):
+    youtube, _ = ctx.clients()
+    channel_id = ctx.get("channel")
+    with ctx.db_lock:
+        newest = None if ctx.args.init else newest_comment_time(ctx.session(), channel_id)
+    comments = fetch_comments(youtube, channel_id, newest)
+    with ctx.db_lock:
+        upsert_comments(ctx.session(), comments)
+        ctx.session().commit()
+    return {"comments": [c['id'] for c in comments]}
+
+def channel_videos_query(session, channel_id, published_after=None):
+    query = session.query(Video.id, Video.title).filter(Video.channel_id == channel_id)
+    if published_after:
+        query = query.filter(Video.published_at >= published_after)
+    return query
+
+def channel_videos(ctx, channel_id, published_after=None, page=500):
+    """(id, title) of a channel's videos, read in keyset pages so no read transaction outlives a page."""
+    last = ""
+    while True:
+        with ctx.db_lock:
+            rows = channel_videos_query(ctx.session(), channel_id, published_after).filter(
+                Video.id > last).order_by(Video.id).limit(page).all()
+            ctx.session().commit()
+        if not rows:
+            return
+        yield from rows
+        last = rows[-1][0]
+
+def stage_video_daily(ctx):
+    import retention
+    start_date, end_date = sync_window(ctx.args)
+    with ctx.db_lock:
+        horizon = retention.compacted_through(ctx.session(), ctx.get("channel"))
+    if horizon and start_date <= horizon.strftime(DATE_FORMAT):
+        # Days up to the horizon are already folded into weekly/monthly rows; re-fetching them would double count
+        start_date = (horizon + datetime.timedelta(days=1)).strftime(DATE_FORMAT)
+        print(f"video_daily: history up to {horizon} is compacted; fetching from {start_date}")
+    channel_id = ctx.get("channel")
+    published_after = None
+    recent_days = getattr(ctx.args, 'recent_days', None)
+    if recent_days:
+        # Daemon's frequent job: only videos young enough for their stats to still move
+        published_after = datetime.datetime.combine(
+            datetime.date.today() - datetime.timedelta(days=recent_days), datetime.time.min)
+    with ctx.db_lock:
+        total = channel_videos_query(ctx.session(), channel_id, published_after).count()
+
+    def fetch(videos):
+        _, analytics = ctx.clients()
+        for vid, title in videos:
+            yield vid, title, fetch_video_daily(analytics, vid, start_date, end_date)
+
+    digest = hashlib.sha1()
+    batch = []
+
+    def flush():
+        # Commit inside the lock so no SQLite write transaction outlives it
+        rows = [r for vid, v_res in batch for r in video_daily_rows(vid, v_res)]
+        with ctx.db_lock:
+            bulk_load_video_daily(ctx.session(), rows)
+            ctx.session().commit()
+        RUN.add_rows(len(rows))
+        batch.clear()
+
+    snapshots.invalidate(channel_id, "video_daily", *(datetime.datetime.strptime(d, DATE_FORMAT).date()
+                                                     for d in (start_date, end_date)))
+    print(f"Syncing daily stats for {total} videos...")
+    # Stats requests run in their own thread and keep going while a batch is being loaded
+    videos = streamed(channel_videos(ctx, channel_id, published_after), fetch)
+    for i, (vid, title, v_res) in enumerate(videos):
+        if i % 10 == 0: print(f"Processing {i}/{total}: {(title or '')[:20]}...")
+        digest.update(json.dumps(v_res.get('rows') or []).encode())
+        batch.append((vid, v_res))
+        if len(batch) >= 20: flush()
+    flush()
+    with ctx.db_lock:
+        # One vectorized pass over every video's new days
+        anomalies.update(ctx.session(), "video", channel_id)
+        formats.refresh(ctx.session(), channel_id,
+                        *(datetime.datetime.strptime(d, DATE_FORMAT).date() for d in (start_date, end_date)))
+        ctx.session().commit()
+    return {"video_daily": digest.hexdigest()}
+
+def stage_demographics(ctx):
+    _, analytics = ctx.clients()
+    start_date, end_date = sync_window(ctx.args)
+    snapshot_date = datetime.datetime.strptime(end_date, DATE_FORMAT).date()
+    age = fetch_demographics_daily(analytics, start_date, end_date, "ageGroup")
+    gender = fetch_demographics_daily(analytics, start_date, end_date, "gender")
+    country = fetch_demographics_daily(analytics, start_date, end_date, "country")
+    cid = ctx.get("channel")
+    with ctx.db_lock:
+        session = ctx.session()
+        upsert_demographics_age(session, cid, age, snapshot_date)
+        upsert_demographics_gender(session, cid, gender, snapshot_date)
+        upsert_geography(session, cid, country, snapshot_date)
+        session.commit()
+    return {"demographics": [age.get('rows'), gender.get('rows'), country.get('rows')]}
+
+def stage_traffic(ctx):
+    _, analytics = ctx.clients()
+    res = fetch_traffic_daily(analytics, *sync_window(ctx.args))
+    with ctx.db_lock:
+        upsert_traffic(ctx.session(), ctx.get("channel"), res)
+        ctx.session().commit()
+    return {"traffic": res.get('rows')}
+
+def stage_snapshots(ctx):
+    if not snapshots.available():
+        print("Parquet snapshots disabled (pyarrow not installed or USE_SNAPSHOTS=0)")
+        return {"snapshots": None}
+    cid = ctx.get("channel")
+    if snapshots.manifest(cid) is None:
+        print("Exporting full Parquet snapshot history...")
+        counts = snapshots.rebuild(cid)
+    else:
+        # Only the month partitions the sync window could have touched
+        start, end = (datetime.datetime.strptime(d, DATE_FORMAT).date() for d in sync_window(ctx.args))
+        counts = snapshots.refresh(cid, start, end)
+    print(f"Snapshot partitions refreshed: {counts}")
+    return {"snapshots": counts}
+
+def stage_thumbnails(ctx):
+    import requests
+    import thumbnails
+    from sqlalchemy import func
+    thumbnails.sync(ctx.session(), THUMBNAIL_GET or requests.get, lock=ctx.db_lock)
+    with ctx.db_lock:
+        return {"thumbnails": ctx.session().query(func.count(Thumbnail.url)).scalar()}
+
+def stage_similarity(ctx):
+    import similarity
+    with ctx.db_lock:
+        items = similarity.corpus(ctx.session())
+    index = similarity.refresh(items, similarity.default_embedder(OLLAMA_POST))
+    return {"similarity": index.data}
+
+def stage_json(ctx):
+    # Runs alone once every data stage is done; includes prediction + AI
+    path = generate_frontend_json(ctx.session(), ctx.get("channel"))
+    return {"dashboard": path.stat().st_mtime}
+
+SYNC_PIPELINE = Pipeline([
+    Stage("channel_info", stage_channel_info, outputs=["channel"], params=today_params, restore=restore_channel),
+    Stage("competitors", stage_competitors, outputs=["competitors"], params=today_params),
+    Stage("channel_stats", stage_channel_stats, inputs=["channel"], outputs=["channel_daily"], params=window_params),
+    Stage("videos", stage_videos, inputs=["channel"], outputs=["videos"], params=today_params),
+    Stage("comments", stage_comments, inputs=["channel", "videos"], outputs=["comments"], params=today_params),
+    Stage("video_daily", stage_video_daily, inputs=["videos"], outputs=["video_daily"], params=video_window_params),
+    Stage("demographics", stage_demographics, inputs=["channel"], outputs=["demographics"], params=window_params),
+    Stage("traffic", stage_traffic, inputs=["channel"], outputs=["traffic"], params=window_params),
+    Stage("thumbnails", stage_thumbnails, inputs=["videos"], outputs=["thumbnails"], params=today_params),
+    Stage("similarity", stage_similarity, inputs=["videos", "competitors"], outputs=["similarity"],
+          network=bool(config.TITLE_EMBED_MODEL), params=today_params),
+    Stage("snapshots", stage_snapshots, network=False, params=window_params,
+          inputs=["channel", "channel_daily", "video_daily", "demographics", "traffic"], outputs=["snapshots"]),
+    Stage("json", stage_json, network=False, params=today_params,
+          inputs=["channel", "competitors", "channel_daily", "videos", "comments", "video_daily", "demographics", "traffic",
+                  "thumbnails", "similarity", "snapshots"],
+          outputs=["dashboard"]),
+], config.PIPELINE_STATE_FILE)
 
-    # 1.5 Fetch Competitors
-    fetch_competitors(youtube, session)
+def sync(args, make_clients=None):
+    """Run the sync DAG for args.entry; returns the per-stage results.
+
+    make_clients lets a long-running caller (the daemon) keep its API clients warm.
+    """
+    make_clients = make_clients or client_factory(args)
+    if not make_clients: return {}
     
-    # 2. Scope Determination
-    today = datetime.date.today()
+    print(f"=== Channel '{args.entry['key']}' ===")
     if args.init:
         print("!!! INITIALIZATION MODE: Fetching 3 Years of History !!!")
-        start_date = (today - relativedelta(years=3)).strftime(DATE_FORMAT)
     else:
         print("--- SYNC MODE: Fetching 30 Days ---")
-        start_date = (today - datetime.timedelta(days=30)).strftime(DATE_FORMAT)
-        
-    end_date = (today - datetime.timedelta(days=3)).strftime(DATE_FORMAT) # T-3 safety
-    
-    # 3. Channel Daily Stats
-    res = fetch_channel_daily(analytics, start_date, end_date)
-    upsert_channel_stats(session, ch, res)
-    session.commit()
-    
-    # 4. Videos List
-    videos = fetch_all_videos(youtube, cid)
-    upsert_videos(session, cid, videos)
-    session.commit()
-    
-    # 4b. Comments
-    comments = fetch_comments(youtube, cid)
-    upsert_comments(session, comments)
-    session.commit()
-    
-    # 5. Video Daily Stats (Iterate)
-    print(f"Syncing daily stats for {len(videos)} videos...")
-    for i, v in enumerate(videos):
-        if i % 10 == 0: print(f"Processing {i}/{len(videos)}: {v['title'][:20]}...")
-        v_res = fetch_video_daily(analytics, v['id'], start_date, end_date)
-        upsert_video_daily(session, v['id'], v_res)
-        if i % 20 == 0: session.commit()
-    session.commit()
-    
-    # 6. Demographics & Traffic
-    snapshot_date = datetime.datetime.strptime(end_date, DATE_FORMAT).date()
-    
-    # Age
-    upsert_demographics_age(session, fetch_demographics_daily(analytics, start_date, end_date, "ageGroup"), snapshot_date)
-    # Gender
-    upsert_demographics_gender(session, fetch_demographics_daily(analytics, start_date, end_date, "gender"), snapshot_date)
-    # Country
-    upsert_geography(session, fetch_demographics_daily(analytics, start_date, end_date, "country"), snapshot_date)
-    
-    # Traffic
-    upsert_traffic(session, fetch_traffic_daily(analytics, start_date, end_date))
-    session.commit()
     
+    ctx = PipelineContext(args, get_session, make_clients)
+    try:
+        results = SYNC_PIPELINE.run(ctx, only=args.only, skip=args.skip, force=args.force, max_workers=args.workers,
+                          state_path=channels.state_path(args.entry, config.PIPELINE_STATE_FILE))
+    finally:
+        ctx.close()
     print("Data Sync Complete.")
-    
-    # 7. Generate JSON
-    generate_frontend_json(session, cid)
+    print_counters()
+    return results
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,143 @@
+"""Video formats: parsed durations, Shorts classification and per-format daily rollups.
+
+Durations are parsed once from the API's ISO-8601 string into the indexed
+videos.duration_seconds column, and is_shorts is derived from that value.
+format_daily_stats holds video_daily_stats summed per channel, day and
+segment ("shorts" or a long-form length bucket); refresh() recomputes a date
+range with one INSERT ... SELECT after each video_daily sync, so the
+dashboard's format split reads a few precomputed rows per day.
+"""
+import re
+import datetime
+
+from sqlalchemy import select, delete, insert, update, func, case, literal, exists
+
+import config
+from database import get_session, Channel, Video, VideoDaily, FormatDaily
+
+ISO_DURATION = re.compile(r"^P(?:(\d+)W)?(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?(?:(\d+(?:\.\d+)?)S)?)?$")
+METRICS = ["views", "watch_time_minutes", "estimated_revenue", "likes", "comments", "shares", "subscribers_gained"]
+
+
+def parse_duration(value):
+    """ISO-8601 duration ('PT1H2M3S', 'P1DT2M') -> whole seconds; None if empty or malformed."""
+    match = ISO_DURATION.match(value or "")
+    if not match or value in ("P", "PT"):
+        return None
+    weeks, days, hours, minutes, seconds = (float(g) if g else 0 for g in match.groups())
+    return int(((weeks * 7 + days) * 24 + hours) * 3600 + minutes * 60 + seconds)
+
+
+def is_short(seconds, published_at=None):
+    """Shorts length rule; `published_at` (datetime) picks the limit in force at upload."""
+    if not seconds:
+        return False  # unknown, or 0 for upcoming live streams
+    limit = config.SHORTS_MAX_SECONDS
+    if published_at and published_at.date() < datetime.date.fromisoformat(config.SHORTS_LIMIT_CHANGED):
+        limit = 60
+    return seconds <= limit
+
+
+def segments():
+    """Segment keys in display order."""
+    keys, low = ["shorts"], 0
+    for high in config.FORMAT_LENGTH_BUCKETS:
+        keys.append(f"{low}-{high}m" if low else f"<{high}m")
+        low = high
+    return keys + [f"{low}m+", "unknown"]
+
+
+def segment_expr():
+    """SQL CASE mapping a videos row to its segment key (same order as segments())."""
+    keys = segments()
+    whens = [(Video.is_shorts.is_(True), keys[0]), (Video.duration_seconds.is_(None), keys[-1])]
+    whens += [(Video.duration_seconds < high * 60, key)
+              for high, key in zip(config.FORMAT_LENGTH_BUCKETS, keys[1:])]
+    return case(*whens, else_=keys[-2])
+
+
+def refresh(session, channel_id, start, end):
+    """Recompute a channel's format rows for [start, end] (dates); the caller commits.
+
+    Days already compacted out of video_daily_stats keep their stored rows.
+    """
+    import retention
+    horizon = retention.compacted_through(session, channel_id)
+    if horizon and start <= horizon:
+        start = horizon + datetime.timedelta(days=1)
+    if start > end:
+        return 0
+    session.execute(delete(FormatDaily).where(
+        FormatDaily.channel_id == channel_id, FormatDaily.date >= start, FormatDaily.date <= end))
+    segment = segment_expr().label("segment")
+    totals = (select(literal(channel_id), VideoDaily.date, segment, func.count(),
+                     *[func.coalesce(func.sum(getattr(VideoDaily, m)), 0) for m in METRICS])
+              .join(Video, Video.id == VideoDaily.video_id)
+              .where(Video.channel_id == channel_id, VideoDaily.date >= start, VideoDaily.date <= end)
+              .group_by(VideoDaily.date, segment))
+    result = session.execute(insert(FormatDaily).from_select(
+        ["channel_id", "date", "segment", "videos", *METRICS], totals))
+    return result.rowcount
+
+
+def totals(session, channel_id, start, end):
+    """Per segment over [start, end]: catalog size and summed metrics, in segments() order."""
+    catalog = dict(session.execute(select(segment_expr(), func.count(Video.id))
+                                   .where(Video.channel_id == channel_id).group_by(segment_expr())).all())
+    sums = {row[0]: row[1:] for row in session.execute(
+        select(FormatDaily.segment, *[func.sum(getattr(FormatDaily, m)) for m in METRICS])
+        .where(FormatDaily.channel_id == channel_id, FormatDaily.date >= start, FormatDaily.date <= end)
+        .group_by(FormatDaily.segment))}
+    out = []
+    for key in segments():
+        values = dict(zip(METRICS, sums.get(key) or [0] * len(METRICS)))
+        if catalog.get(key) or any(values.values()):
+            out.append({"segment": key, "videos": catalog.get(key, 0), **values})
+    return out
+
+
+def classify(session, channel_id=None):
+    """Fill duration_seconds from video_length and recompute is_shorts; returns videos changed."""
+    query = session.query(Video)
+    if channel_id:
+        query = query.filter(Video.channel_id == channel_id)
+    changes = []
+    for v in query:
+        seconds = parse_duration(v.video_length)
+        short = is_short(seconds, v.published_at)
+        if seconds != v.duration_seconds or short != bool(v.is_shorts):
+            changes.append({"id": v.id, "duration_seconds": seconds, "is_shorts": short})
+    if changes:
+        session.execute(update(Video), changes)
+    return len(changes)
+
+
+def rebuild(session, channel_id):
+    """Reclassify a channel's videos and recompute every daily format row still derivable."""
+    changed = classify(session, channel_id)
+    span = session.execute(select(func.min(VideoDaily.date), func.max(VideoDaily.date))
+                           .join(Video, Video.id == VideoDaily.video_id)
+                           .where(Video.channel_id == channel_id)).one()
+    rows = refresh(session, channel_id, *span) if span[0] else 0
+    return changed, rows
+
+
+def backfill_missing():
+    """Parse durations of older rows and build format rows for channels that have none yet."""
+    session = get_session()
+    try:
+        pending = session.query(Video.id).filter(Video.duration_seconds.is_(None),
+                                                 Video.video_length.isnot(None), Video.video_length != '').first()
+        if pending:
+            print(f"Parsed durations of {classify(session)} videos")
+            session.commit()
+        missing = session.execute(select(Channel.id).where(
+            exists().where(Video.channel_id == Channel.id, VideoDaily.video_id == Video.id),
+            ~exists().where(FormatDaily.channel_id == Channel.id))).scalars().all()
+        for channel_id in missing:
+            _, rows = rebuild(session, channel_id)
+            if rows:
+                print(f"Built {rows} format rows for {channel_id}")
+            session.commit()
+    finally:
+        session.close()
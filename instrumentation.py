@@ -0,0 +1,199 @@
+import os
+import json
+import time
+import datetime
+import threading
+from contextlib import contextmanager, nullcontext
+
+import config
+
+# Estimated quota cost per API method (YouTube Data API v3 cost table).
+# Analytics API queries are not unit-metered the same way; we count 1 per query
+# so regressions in call volume still show up.
+QUOTA_COSTS = {
+    "youtube.search.list": 100,
+    "youtubeAnalytics.reports.query": 1,
+}
+DEFAULT_QUOTA_COST = 1  # every other *.list call
+
+
+class RunMetrics:
+    """Collects wall time, API calls, quota units, rows and bytes for one sync run."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.profiler = None  # profiling.Profiler when running with --profile
+        self.reset()
+
+    def reset(self):
+        from resilience import COUNTERS
+        with self._lock:
+            self.started_at = time.time()
+            self.stages = {}   # name -> {seconds, calls, quota_units, rows, bytes, parent}
+            self.api = {}      # methodId -> {calls, errors, seconds, quota_units}
+            COUNTERS.clear()   # analytics_outcomes cover this run only (the daemon runs many in one process)
+        self._local.stack = []
+
+    def _stack(self):
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+        return self._local.stack
+
+    def _current(self):
+        stack = self._stack()
+        return stack[-1] if stack else None
+
+    def _stage_entry(self, name):
+        return self.stages.setdefault(name, {
+            "seconds": 0.0, "calls": 0, "quota_units": 0, "rows": 0, "bytes": 0, "parent": None
+        })
+
+    @contextmanager
+    def stage(self, name):
+        """Time a pipeline stage; API calls, rows and bytes inside it are attributed to it."""
+        stack = self._stack()
+        with self._lock:
+            entry = self._stage_entry(name)
+            entry["parent"] = stack[-1] if stack else None
+        stack.append(name)
+        profiled = self.profiler.stage(name) if self.profiler else nullcontext()
+        t0 = time.perf_counter()
+        try:
+            with profiled:
+                yield entry
+        finally:
+            elapsed = time.perf_counter() - t0
+            stack.pop()
+            with self._lock:
+                entry["seconds"] += elapsed
+
+    def context(self):
+        """The calling thread's open stages, to hand to a worker thread (see adopt)."""
+        return list(self._stack())
+
+    def adopt(self, stack):
+        """Attribute this worker thread's calls, rows and bytes to another thread's open stages.
+
+        The stages' time is already measured by the thread that opened them.
+        """
+        self._local.stack = list(stack)
+
+    def record_call(self, method_id, seconds, ok=True):
+        units = QUOTA_COSTS.get(method_id, DEFAULT_QUOTA_COST)
+        stage = self._current()
+        with self._lock:
+            api = self.api.setdefault(method_id, {"calls": 0, "errors": 0, "seconds": 0.0, "quota_units": 0})
+            api["calls"] += 1
+            api["seconds"] += seconds
+            api["quota_units"] += units
+            if not ok:
+                api["errors"] += 1
+            if stage:
+                entry = self._stage_entry(stage)
+                entry["calls"] += 1
+                entry["quota_units"] += units
+
+    def add_rows(self, n):
+        stage = self._current()
+        if stage and n:
+            with self._lock:
+                self._stage_entry(stage)["rows"] += n
+
+    def add_bytes(self, n):
+        stage = self._current()
+        if stage and n:
+            with self._lock:
+                self._stage_entry(stage)["bytes"] += n
+
+    def summary(self):
+        from resilience import COUNTERS
+        with self._lock:
+            return {
+                "started_at": datetime.datetime.fromtimestamp(self.started_at).isoformat(timespec='seconds'),
+                "run_seconds": round(time.time() - self.started_at, 3),
+                "quota_units": sum(a["quota_units"] for a in self.api.values()),
+                "stages": {k: dict(v) for k, v in self.stages.items()},
+                "api": {k: dict(v) for k, v in self.api.items()},
+                "analytics_outcomes": dict(COUNTERS),
+            }
+
+    def write(self, metrics_dir=None, prom_path=None, labels=None):
+        """Write the per-run JSON (plus latest.json) and the Prometheus textfile.
+
+        `labels` are added to every Prometheus sample (e.g. {"channel": key}).
+        """
+        metrics_dir = metrics_dir or config.METRICS_DIR
+        prom_path = prom_path or config.PROMETHEUS_TEXTFILE
+        os.makedirs(metrics_dir, exist_ok=True)
+        data = self.summary()
+
+        stamp = datetime.datetime.fromtimestamp(self.started_at).strftime("%Y%m%d-%H%M%S")
+        run_file = os.path.join(metrics_dir, f"run-{stamp}.json")
+        for path in (run_file, os.path.join(metrics_dir, "latest.json")):
+            with open(path, 'w') as f:
+                json.dump(data, f, indent=2)
+
+        # node_exporter reads the textfile while we write it: write then rename atomically
+        os.makedirs(os.path.dirname(os.path.abspath(prom_path)), exist_ok=True)
+        tmp = f"{prom_path}.tmp"
+        with open(tmp, 'w') as f:
+            f.write(to_prometheus(data, labels))
+        os.replace(tmp, prom_path)
+        print(f"Run metrics written to {run_file} ({data['quota_units']} quota units, {data['run_seconds']}s)")
+        return run_file
+
+
+def to_prometheus(data, extra_labels=None):
+    lines = []
+    extra_labels = extra_labels or {}
+
+    def metric(name, kind, help_text, samples):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in samples:
+            labels = {**extra_labels, **labels}
+            label_str = ",".join(f'{k}="{v}"' for k, v in labels.items())
+            lines.append(f"{name}{{{label_str}}} {value}" if label_str else f"{name} {value}")
+
+    stages = data["stages"].items()
+    api = data["api"].items()
+    metric("youtube_sync_last_run_timestamp_seconds", "gauge", "Unix time the last sync run finished.",
+           [({}, int(time.time()))])
+    metric("youtube_sync_run_seconds", "gauge", "Wall time of the last sync run.",
+           [({}, data["run_seconds"])])
+    metric("youtube_sync_stage_seconds", "gauge", "Wall time per pipeline stage.",
+           [({"stage": k}, round(v["seconds"], 3)) for k, v in stages])
+    metric("youtube_sync_stage_api_calls", "gauge", "API calls issued per pipeline stage.",
+           [({"stage": k}, v["calls"]) for k, v in stages])
+    metric("youtube_sync_stage_rows_written", "gauge", "Rows upserted per pipeline stage.",
+           [({"stage": k}, v["rows"]) for k, v in stages])
+    metric("youtube_sync_stage_bytes_emitted", "gauge", "Output bytes written per pipeline stage.",
+           [({"stage": k}, v["bytes"]) for k, v in stages])
+    metric("youtube_sync_api_calls", "gauge", "API calls per method in the last run.",
+           [({"method": k}, v["calls"]) for k, v in api])
+    metric("youtube_sync_api_errors", "gauge", "Failed API calls per method in the last run.",
+           [({"method": k}, v["errors"]) for k, v in api])
+    metric("youtube_sync_api_seconds", "gauge", "Time spent waiting on each API method.",
+           [({"method": k}, round(v["seconds"], 3)) for k, v in api])
+    metric("youtube_sync_quota_units", "gauge", "Estimated quota units consumed per method.",
+           [({"method": k}, v["quota_units"]) for k, v in api])
+    metric("youtube_sync_analytics_outcomes", "gauge", "Analytics query outcomes (retries, fallbacks, ...).",
+           [({"outcome": k}, v) for k, v in data["analytics_outcomes"].items()])
+    return "\n".join(lines) + "\n"
+
+
+RUN = RunMetrics()
+
+
+def timed_execute(request):
+    """Execute a googleapiclient request, recording latency and quota under its methodId."""
+    method_id = getattr(request, 'methodId', None) or "unknown"
+    t0 = time.perf_counter()
+    try:
+        res = request.execute()
+    except Exception:
+        RUN.record_call(method_id, time.perf_counter() - t0, ok=False)
+        raise
+    RUN.record_call(method_id, time.perf_counter() - t0)
+    return res
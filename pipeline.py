@@ -0,0 +1,265 @@
+import json
+import time
+import queue
+import hashlib
+import itertools
+import traceback
+import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from instrumentation import RUN
+
+
+def fingerprint(value):
+    """Stable short hash of any JSON-able value (dates etc. via str)."""
+    blob = json.dumps(value, sort_keys=True, default=str).encode()
+    return hashlib.sha1(blob).hexdigest()[:16]
+
+
+_DONE = object()
+_STREAMS = itertools.count()  # numbers each streamed() call so its thread names are unique
+
+
+class _Failed:
+    def __init__(self, error):
+        self.error = error
+
+
+def streamed(source, *steps, buffer=2):
+    """Chain generator steps through bounded queues, each step in its own thread.
+
+    `source` is an iterable and each step a function taking an iterable and
+    returning one. Items move downstream as soon as they are produced, with
+    at most `buffer` items waiting between two steps, so the first item
+    reaches the consumer after one pass through every step and memory stays
+    bounded whatever the input size. An exception in any step is re-raised
+    to the consumer; closing the returned generator early stops every step.
+    Step threads keep the caller's run-metrics stage.
+    """
+    stop = threading.Event()
+    stack = RUN.context()
+
+    def put(q, item):
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def drain(q):
+        while True:
+            try:
+                item = q.get(timeout=0.1)
+            except queue.Empty:
+                if stop.is_set():
+                    return
+                continue
+            if item is _DONE:
+                return
+            if isinstance(item, _Failed):
+                raise item.error
+            yield item
+
+    def pump(step, inbox, outbox):
+        RUN.adopt(stack)
+        try:
+            for item in (step(drain(inbox)) if step else source):
+                if not put(outbox, item):
+                    return
+            put(outbox, _DONE)
+        except BaseException as e:
+            put(outbox, _Failed(e))
+
+    call = next(_STREAMS)
+    queues, threads = [None], []
+    for step in (None,) + steps:
+        queues.append(queue.Queue(maxsize=buffer))
+        threads.append(threading.Thread(target=pump, args=(step, queues[-2], queues[-1]), daemon=True,
+                                        name=f"streamed-{call}-{len(threads)}"))
+    for t in threads:
+        t.start()
+    try:
+        yield from drain(queues[-1])
+    finally:
+        stop.set()  # put() and drain() poll it, so every step returns within one timeout
+        for t in threads:
+            t.join()
+
+
+class Stage:
+    """One node of the sync DAG.
+
+    func(ctx) returns {output_name: value} for every name in `outputs`.
+    params(ctx) returns the non-artifact inputs (e.g. the date window) that are
+    part of the skip fingerprint. restore(ctx) rebuilds the outputs from the DB
+    when the stage was skipped but a downstream stage needs the values.
+    Network stages may overlap; other stages run on their own.
+    """
+
+    def __init__(self, name, func, inputs=(), outputs=(), network=True, params=None, restore=None):
+        self.name = name
+        self.func = func
+        self.inputs = tuple(inputs)
+        self.outputs = tuple(outputs)
+        self.network = network
+        self.params = params or (lambda ctx: {})
+        self.restore = restore
+
+
+class PipelineContext:
+    """Shared state for one run: artifacts, per-thread sessions/API clients and the DB write lock."""
+
+    def __init__(self, args, make_session, make_clients):
+        self.args = args
+        self.artifacts = {}
+        self.db_lock = threading.Lock()  # SQLite has one writer: upserts + commits happen under this lock
+        self._make_session = make_session
+        self._make_clients = make_clients
+        self._local = threading.local()
+        self._sessions = []
+        self._producers = {}
+        self._restore_lock = threading.RLock()  # restores may chain (videos -> channel)
+
+    def session(self):
+        if not hasattr(self._local, 'session'):
+            self._local.session = self._make_session()
+            self._sessions.append(self._local.session)
+        return self._local.session
+
+    def clients(self):
+        # googleapiclient/httplib2 objects are not thread-safe: one pair per worker thread
+        if not hasattr(self._local, 'clients'):
+            self._local.clients = self._make_clients()
+        return self._local.clients
+
+    def get(self, name):
+        with self._restore_lock:
+            if name not in self.artifacts:
+                stage = self._producers.get(name)
+                if stage is None or stage.restore is None:
+                    raise KeyError(f"Artifact '{name}' is not available (its stage did not run)")
+                self.artifacts.update(stage.restore(self))
+            return self.artifacts[name]
+
+    def close(self):
+        for s in self._sessions:
+            s.close()
+
+
+class Pipeline:
+    def __init__(self, stages, state_path):
+        self.stages = {s.name: s for s in stages}
+        self.state_path = state_path
+        self.producers = {out: s for s in stages for out in s.outputs}
+
+    def load_state(self, path=None):
+        try:
+            with open(path or self.state_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save_state(self, state, path=None):
+        with open(path or self.state_path, 'w') as f:
+            json.dump(state, f, indent=2)
+
+    def select(self, only=None, skip=None):
+        names = list(self.stages)
+        unknown = [n for n in (only or []) + (skip or []) if n not in self.stages]
+        if unknown:
+            raise SystemExit(f"Unknown stage(s): {', '.join(unknown)}. Available: {', '.join(names)}")
+        if only:
+            names = [n for n in names if n in only]
+        return [n for n in names if n not in (skip or [])]
+
+    def _input_fingerprint(self, stage, ctx, output_fps):
+        inputs = {name: output_fps.get(name) for name in stage.inputs}
+        return fingerprint({"params": stage.params(ctx), "inputs": inputs})
+
+    def run(self, ctx, only=None, skip=None, force=False, max_workers=4, state_path=None):
+        """Run the selected stages, overlapping independent network stages.
+
+        A stage is skipped when the fingerprint of its params and input
+        artifacts matches the last successful run, unless force is True or
+        a collection containing the stage's name.
+        state_path overrides where that run state lives (one file per channel).
+        """
+        ctx._producers = self.producers
+        selected = self.select(only, skip)
+        state = self.load_state(state_path)
+        # Output fingerprints start from the last run so unselected producers still feed skip checks
+        output_fps = {out: state.get(s.name, {}).get("outputs", {}).get(out)
+                      for out, s in self.producers.items()}
+        pending = list(selected)
+        results = {}
+        running = {}   # future -> (stage name, input fingerprint)
+
+        def blocked(stage):
+            return any(results.get(self.producers[i].name, {}).get("status") in ("failed", "blocked")
+                       for i in stage.inputs if i in self.producers)
+
+        def ready(stage):
+            active = {n for n, _ in running.values()}
+            return all(self.producers[i].name not in pending and self.producers[i].name not in active
+                       for i in stage.inputs if i in self.producers)
+
+        def execute(stage):
+            with RUN.stage(stage.name):
+                t0 = time.perf_counter()
+                outputs = stage.func(ctx) or {}
+                return outputs, time.perf_counter() - t0
+
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="stage") as pool:
+            while pending or running:
+                exclusive = any(not self.stages[n].network for n, _ in running.values())
+                for name in list(pending):
+                    stage = self.stages[name]
+                    if blocked(stage):
+                        pending.remove(name)
+                        results[name] = {"status": "blocked", "seconds": 0.0}
+                        continue
+                    if not ready(stage) or exclusive or (not stage.network and running):
+                        continue
+                    fp = self._input_fingerprint(stage, ctx, output_fps)
+                    pending.remove(name)
+                    forced = force is True or (force and name in force)
+                    if not forced and state.get(name, {}).get("fingerprint") == fp:
+                        results[name] = {"status": "skipped", "seconds": 0.0}
+                        continue
+                    running[pool.submit(execute, stage)] = (name, fp)
+                    if not stage.network:
+                        break  # run CPU/DB-bound stages alone
+
+                if not running:
+                    continue
+                finished, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                for fut in finished:
+                    name, fp = running.pop(fut)
+                    stage = self.stages[name]
+                    try:
+                        outputs, seconds = fut.result()
+                    except Exception as e:
+                        print(f"Stage '{name}' failed: {e}")
+                        traceback.print_exception(e)
+                        results[name] = {"status": "failed", "seconds": 0.0, "error": str(e)}
+                        continue
+                    ctx.artifacts.update(outputs)
+                    fps = {out: fingerprint(outputs.get(out)) for out in stage.outputs}
+                    output_fps.update(fps)
+                    state[name] = {
+                        "fingerprint": fp,
+                        "outputs": fps,
+                        "seconds": round(seconds, 3),
+                        "finished_at": datetime.datetime.now().isoformat(timespec='seconds'),
+                    }
+                    self.save_state(state, state_path)
+                    results[name] = {"status": "ran", "seconds": seconds}
+
+        print(f"\n{'stage':<16}{'status':>10}{'seconds':>10}")
+        for name in selected:
+            r = results.get(name, {"status": "?", "seconds": 0.0})
+            print(f"{name:<16}{r['status']:>10}{r['seconds']:>10.2f}")
+        return results
@@ -1,29 +1,98 @@
 import os
-import sqlite3
 import json
+import shutil
+import hashlib
 import logging
+import argparse
+from contextlib import nullcontext
 from datetime import datetime, timedelta
 import pandas as pd
 import numpy as np
-from sklearn.linear_model import LinearRegression
-import xgboost as xgb
+# sklearn/xgboost are imported inside the model functions: they dominate startup time
+
+import config
 
 # Configuration
-DB_PATH = os.path.join(os.path.dirname(__file__), 'youtube_data.db')
-OUTPUT_PATH = os.path.join(os.path.dirname(__file__), 'dashboard/public/prediction_data.json')
+OUTPUT_PATH = str(config.PUBLIC_DIR / 'prediction_data.json')
 DAYS_TO_PREDICT = 30
 
+# Prediction intervals: the central INTERVAL_LEVEL band of BOOTSTRAP_PATHS simulated futures,
+# resampled from the forecast errors of the last BACKTEST_ORIGINS days
+INTERVAL_LEVEL = 0.8
+BOOTSTRAP_PATHS = 1000
+BACKTEST_ORIGINS = 365
+
+# Settings used until --tune has stored better ones for a (channel, metric)
+DEFAULT_PARAMS = {"ma_window": 7, "wma_window": 30, "n_estimators": 100, "learning_rate": 0.05, "max_depth": 6}
+# --tune search space; n_estimators is found by early stopping, up to TUNE_MAX_ESTIMATORS
+MA_WINDOWS = [3, 7, 14, 28]
+WMA_WINDOWS = [14, 30, 60, 90]
+XGBOOST_GRID = [{"learning_rate": lr, "max_depth": depth} for lr in (0.03, 0.05, 0.1) for depth in (2, 4, 6)]
+TUNE_MAX_ESTIMATORS = 500
+XGBOOST_WARMUP = 30  # leading rows xgboost_forecast drops (no 30-day lag yet)
+# XGBoost has no one-product backtest: its band resamples the errors of refits on the history
+# before XGBOOST_BACKTEST_ORIGINS origins, one every XGBOOST_BACKTEST_STEP days
+XGBOOST_BACKTEST_ORIGINS = 26
+XGBOOST_BACKTEST_STEP = 7
+
+# profiling.Profiler when run with --profile
+PROFILER = None
+
+# Trained XGBoost models by (metric, hash of the training data). A resident
+# daemon re-renders often; while a channel's history is unchanged its models are reused.
+MODEL_CACHE = {}
+MODEL_CACHE_SIZE = 64
+
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(levelname)s - %(message)s'
 )
 
+def stage(name):
+    return PROFILER.stage(name) if PROFILER else nullcontext()
+
 def get_db_connection():
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+    # Pooled connection from the shared engine: gets the storage profile (WAL etc.)
+    # so forecasting can read while a sync is writing.
+    from database import engine
+    return engine.connect()
+
+# prediction column -> channel_daily_stats column
+HISTORY_COLUMNS = {
+    'view_count': 'views',
+    'subscriber_count': 'subscribers_gained',
+    'revenue': 'estimated_revenue',
+    'watch_time': 'watch_time_minutes',
+    'likes': 'likes',
+    'dislikes': 'dislikes',
+}
+
+def fetch_snapshot(channel_id=None):
+    """Column-pruned read of the Parquet snapshot; None when it is unavailable."""
+    import snapshots
+    df = snapshots.read("channel_daily", columns=["date"] + list(HISTORY_COLUMNS.values()), channel_id=channel_id)
+    if df is None or df.empty:
+        return None
+    return df.rename(columns={v: k for k, v in HISTORY_COLUMNS.items()})[['date'] + list(HISTORY_COLUMNS)]
+
+def channel_ids():
+    """Channels in the DB, in the order render/analyze go through them."""
+    from database import get_session, Channel
+    session = get_session()
+    try:
+        return [cid for (cid,) in session.query(Channel.id).order_by(Channel.id)]
+    finally:
+        session.close()
+
+def fetch_data(channel_id=None):
+    if channel_id is None and len(channel_ids()) > 1:
+        # All rows would interleave several channels' days into one series
+        raise ValueError("The DB holds several channels: forecast them one channel_id at a time")
+    df = fetch_snapshot(channel_id)
+    if df is not None:
+        return df
 
-def fetch_data():
+    from sqlalchemy import text
     conn = get_db_connection()
     # Fetch last 365 days of data for better training, including 'my_channel'
     # Assuming 'channel_stats' has daily snapshots or 'video_stats' aggregation
@@ -42,10 +111,11 @@ def fetch_data():
                likes,
                dislikes
         FROM channel_daily_stats
+        WHERE :channel_id IS NULL OR channel_id = :channel_id
         ORDER BY date ASC
     """
     try:
-        df = pd.read_sql_query(query, conn)
+        df = pd.read_sql_query(text(query), conn, params={"channel_id": channel_id})
         conn.close()
         return df
     except Exception as e:
@@ -53,101 +123,288 @@ def fetch_data():
         conn.close()
         return pd.DataFrame()
 
+def forecast_weights(window, horizon, weights=None):
+    """(window, horizon) matrix C such that forecast = last `window` values @ C.
+
+    Without weights it is the flat mean (MA); with weights it is the weighted
+    least-squares line through the window, extended `horizon` days (WMA).
+    """
+    if weights is None or window < 2:
+        return np.full((window, horizon), 1.0 / window)
+    x = np.arange(window, dtype=float)
+    w = np.asarray(weights, dtype=float) / np.sum(weights)
+    x_mean = w @ x
+    slope = w * (x - x_mean) / (w @ (x - x_mean) ** 2)  # slope = y @ slope
+    intercept = w - x_mean * slope                      # intercept = y @ intercept
+    future = np.arange(window, window + horizon, dtype=float)
+    return intercept[:, None] + slope[:, None] * future[None, :]
+
+def backtest_errors(values, coef, origins=BACKTEST_ORIGINS):
+    """Errors of the forecast made at each of the last `origins` days, at every horizon.
+
+    Returns (origins, horizon): every historical window is forecast with one
+    matrix product, no loop over origins.
+    """
+    window, horizon = coef.shape
+    values = np.asarray(values, dtype=float)
+    if len(values) < window + horizon:
+        return np.empty((0, horizon))
+    windows = np.lib.stride_tricks.sliding_window_view(values[:len(values) - horizon], window)
+    actual = np.lib.stride_tricks.sliding_window_view(values[window:], horizon)
+    return actual[-origins:] - windows[-origins:] @ coef
+
+def bootstrap_band(point, errors, level=INTERVAL_LEVEL, paths=BOOTSTRAP_PATHS, seed=0):
+    """(lower, upper) around `point` from resampled backtest error paths, or None.
+
+    Each row of `errors` is one origin's error over the whole horizon, so
+    drawing rows is a block bootstrap whose blocks keep consecutive days'
+    errors together. All paths are drawn and summarized in single array ops.
+    """
+    if not len(errors) or not len(point):
+        return None
+    rng = np.random.default_rng(seed)
+    sims = np.asarray(point, dtype=float)[None, :] + errors[rng.integers(0, len(errors), size=paths)]
+    lower, upper = np.quantile(sims, [(1 - level) / 2, (1 + level) / 2], axis=0)
+    return lower, upper
+
 def moving_average_forecast(data, window=7, horizon=30):
-    """Simple Moving Average Forecast"""
+    """Simple Moving Average Forecast: the last window's mean, held flat.
+
+    Returns (forecast, band) with band = (lower, upper) or None.
+    """
     if len(data) < window:
-        return []
-    
-    # Calculate last window average
-    last_avg = data[-window:].mean()
-    
-    # Project flat line (or slight trend if we want, but MA is usually flat or simple trend)
-    # MA usually implies 'next value is average of last N'
-    # For a 30 day forecast, pure MA is just a flat line of the last calculated average
-    # To make it slightly more useful, we can use a moving trend, but let's stick to Simple MA definition
-    
-    forecast = [last_avg] * horizon
-    return forecast
+        return [], None
+    coef = forecast_weights(window, horizon)
+    values = np.asarray(data, dtype=float)
+    forecast = values[-window:] @ coef
+    return forecast.tolist(), bootstrap_band(forecast, backtest_errors(values, coef))
 
 def weighted_moving_average_forecast(data, window=30, horizon=30):
-    """Weighted Moving Average Forecast (Linear Weights)"""
+    """Weighted Moving Average Forecast: a recency-weighted (linear weights) trend line.
+
+    Returns (forecast, band) with band = (lower, upper) or None.
+    """
     if len(data) < window:
-        return []
-    
-    recent_data = data[-window:]
-    weights = np.arange(1, window + 1)
-    
-    # Calculate WMA for the last point
-    wma = np.sum(recent_data * weights) / weights.sum()
-    
-    # For forecast, we fit a simple linear trend on the weighted data or just project the WMA?
-    # A better 'WMA Prediction' often involves projecting the recent *trend*.
-    # Let's fit a linear line to the last 'window' days, weighted by recency.
-    
-    X = np.arange(window).reshape(-1, 1)
-    y = recent_data.values
-    
-    model = LinearRegression()
-    model.fit(X, y, sample_weight=weights)
-    
-    future_X = np.arange(window, window + horizon).reshape(-1, 1)
-    forecast = model.predict(future_X)
-    
-    return forecast.tolist()
+        return [], None
+    coef = forecast_weights(window, horizon, weights=np.arange(1, window + 1))
+    values = np.asarray(data, dtype=float)
+    forecast = values[-window:] @ coef
+    return forecast.tolist(), bootstrap_band(forecast, backtest_errors(values, coef))
+
+def xgboost_forecast(df, metric, horizon=30, params=None):
+    """XGBoost Forecast; returns (forecast, band) like the MA/WMA forecasts.
+
+    The band is the bootstrap of out-of-sample errors, as for MA/WMA: the
+    model is refit on the history before each backtest origin and its
+    errors over the following `horizon` days are resampled.
+    """
+    import xgboost as xgb
+
+    params = {**DEFAULT_PARAMS, **(params or {})}
+    xgb_params = {k: params[k] for k in ("n_estimators", "learning_rate", "max_depth")}
 
-def xgboost_forecast(df, metric, horizon=30):
-    """XGBoost Forecast"""
     if len(df) < 30: # Need enough data
         # Fallback to linear if not enough data
         return weighted_moving_average_forecast(df[metric], window=len(df), horizon=horizon)
 
     df = df.copy()
     df['day_index'] = np.arange(len(df))
-    
-    # Feature Engineering
-    # Lag features
-    for lag in [1, 7, 30]:
-        df[f'lag_{lag}'] = df[metric].shift(lag)
-    
-    # Drop NaN
-    train_df = df.dropna()
+    # Train on the time index after the warmup (the rows a 30-day lag would drop), as --tune does
+    train_df = df.iloc[XGBOOST_WARMUP:].dropna(subset=[metric])
     
     if len(train_df) < 10:
          return weighted_moving_average_forecast(df[metric], window=len(df), horizon=horizon)
 
-    X = train_df[['day_index', 'lag_1', 'lag_7', 'lag_30']]
-    y = train_df[metric]
-    
-    model = xgb.XGBRegressor(objective='reg:squarederror', n_estimators=100, learning_rate=0.1)
-    model.fit(X, y)
-    
-    # Recursive Forecasting
-    last_known = df.iloc[-1].copy()
-    forecast = []
-    
-    current_day_index = last_known['day_index'] + 1
-    
-    for _ in range(horizon):
-        # Update features
-        # We need to dynamically update lags based on previous predictions
-        # This is tricky with recursiveness.
-        # Simplified approach: Train on day_index only for robust long-term trend if lags are hard to compute
-        # OR: Just use day_index + trend features
-        pass
-
-    # Simplified XGBoost: Train on Time Index & Time Features only for direct multi-step or recursive
-    # To keep it robust without complex lag management in loop:
     X_simple = train_df[['day_index']]
-    model_simple = xgb.XGBRegressor(objective='reg:squarederror', n_estimators=100, learning_rate=0.05)
+    y = train_df[metric]
+    future_X = np.arange(len(df), len(df) + horizon).reshape(-1, 1)
+
+    digest = hashlib.sha1(np.ascontiguousarray(X_simple.values, dtype=float).tobytes())
+    digest.update(np.ascontiguousarray(y.values, dtype=float).tobytes())
+    key = (metric, digest.hexdigest(), tuple(sorted(xgb_params.items())))
+    if key in MODEL_CACHE:
+        model_simple, errors = MODEL_CACHE[key]
+        forecast = model_simple.predict(future_X)
+        return forecast.tolist(), bootstrap_band(forecast, errors)
+
+    model_simple = xgb.XGBRegressor(objective='reg:squarederror', **xgb_params)
     model_simple.fit(X_simple, y)
-    
-    future_X = np.array([[last_known['day_index'] + i + 1] for i in range(horizon)])
     forecast = model_simple.predict(future_X)
-    
-    return forecast.tolist()
+    errors = xgboost_backtest_errors(X_simple.values, y.values, xgb_params, horizon)
+
+    if len(MODEL_CACHE) >= MODEL_CACHE_SIZE:
+        MODEL_CACHE.pop(next(iter(MODEL_CACHE)))
+    MODEL_CACHE[key] = (model_simple, errors)
+    return forecast.tolist(), bootstrap_band(forecast, errors)
+
+def xgboost_backtest_errors(X, y, xgb_params, horizon, origins=XGBOOST_BACKTEST_ORIGINS,
+                            step=XGBOOST_BACKTEST_STEP):
+    """(origins, horizon) errors of the model refit on the rows before each of the last origins.
+
+    Origins are whole steps back from the end of the data, so with a 7-day
+    step each one falls on the same weekday as the real forecast and the
+    error paths carry its weekly phase. Origins leaving fewer than `horizon`
+    training rows are skipped.
+    """
+    import xgboost as xgb
+    errors = []
+    latest = len(y) - step * -(-horizon // step)  # the last origin whose whole horizon is known
+    for origin in range(latest, horizon - 1, -step)[:origins]:
+        model = xgb.XGBRegressor(objective='reg:squarederror', **xgb_params)
+        model.fit(X[:origin], y[:origin])
+        errors.append(y[origin:origin + horizon] - model.predict(X[origin:origin + horizon]))
+    return np.array(errors).reshape(-1, horizon)
+
+def tuned_params(channel_id=None):
+    """{metric: params} stored by --tune for a channel; {} when it was never tuned."""
+    from sqlalchemy.exc import DBAPIError
+    from database import get_session, ForecastTuning
+    session = get_session()
+    try:
+        rows = session.query(ForecastTuning.metric, ForecastTuning.params).filter(
+            ForecastTuning.channel_id == (channel_id or "")).all()
+    except DBAPIError:  # no forecast_tuning table before init_db has run
+        return {}
+    finally:
+        session.close()
+    return {metric: json.loads(params) for metric, params in rows}
+
+def _score_windows(values, splits, windows, weighted):
+    """{window: mean MAE} of the MA (or WMA) forecast made at the end of each training fold."""
+    origins = np.array([train[-1] + 1 for train, _ in splits])
+    actual = np.stack([values[test] for _, test in splits])
+    scores = {}
+    for window in windows:
+        if window > origins.min():
+            continue
+        coef = forecast_weights(window, actual.shape[1], np.arange(1, window + 1) if weighted else None)
+        history = np.stack([values[origin - window:origin] for origin in origins])
+        scores[window] = float(np.mean(np.abs(actual - history @ coef)))
+    return scores
+
+def _score_xgboost(day_index, y, splits, params):
+    """Mean validation MAE and median early-stopped tree count of one XGBoost setting over the folds.
+
+    Early stopping watches the last DAYS_TO_PREDICT days of each training
+    fold, so the test fold is only ever used for scoring. Runs in a --tune
+    worker process.
+    """
+    import xgboost as xgb
+    X = day_index.reshape(-1, 1)
+    errors, rounds = [], []
+    for train, test in splits:
+        fit, stop = train[:-DAYS_TO_PREDICT], train[-DAYS_TO_PREDICT:]
+        model = xgb.XGBRegressor(objective='reg:squarederror', n_estimators=TUNE_MAX_ESTIMATORS, n_jobs=1,
+                                 early_stopping_rounds=config.TUNE_EARLY_STOPPING_ROUNDS, **params)
+        model.fit(X[fit], y[fit], eval_set=[(X[stop], y[stop])], verbose=False)
+        best = model.best_iteration + 1
+        errors.append(np.mean(np.abs(model.predict(X[test], iteration_range=(0, best)) - y[test])))
+        rounds.append(best)
+    return float(np.mean(errors)), int(np.median(rounds))
+
+def tune(channel_id=None, force=False, processes=None):
+    """Time-series cross-validated search of window lengths and XGBoost settings per metric.
+
+    Each fold trains on the history up to an origin and scores the next
+    DAYS_TO_PREDICT days (expanding window, config.TUNE_FOLDS origins). Window
+    lengths are scored in-process with one matrix product per candidate; the
+    XGBoost grid runs in a process pool, each fold early-stopped on the tail
+    of its training days. A metric is searched only when it has
+    config.TUNE_MIN_NEW_DAYS more days than at its last search (or `force`).
+    Returns the metrics tuned.
+    """
+    import time
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    from sklearn.model_selection import TimeSeriesSplit
+    from database import get_session, upsert, ForecastTuning
 
-def generate_predictions():
-    df = fetch_data()
+    df = fetch_data(channel_id)
+    if df.empty:
+        logging.warning("No data found in DB")
+        return []
+    df = df.assign(date=pd.to_datetime(df['date'])).sort_values('date')
+    key = channel_id or ""
+    session = get_session()
+    try:
+        seen = dict(session.query(ForecastTuning.metric, ForecastTuning.days).filter(
+            ForecastTuning.channel_id == key).all())
+    finally:
+        session.close()
+
+    days = len(df)
+    todo = [m for m in HISTORY_COLUMNS if force or days - seen.get(m, 0) >= config.TUNE_MIN_NEW_DAYS]
+    folds = TimeSeriesSplit(n_splits=config.TUNE_FOLDS, test_size=DAYS_TO_PREDICT)
+    # Every fold needs training days before its early-stopping window, which precedes its test window
+    if days - XGBOOST_WARMUP < (config.TUNE_FOLDS + 2) * DAYS_TO_PREDICT:
+        logging.warning(f"Tuning needs {(config.TUNE_FOLDS + 2) * DAYS_TO_PREDICT + XGBOOST_WARMUP} days "
+                        f"of history, have {days}")
+        return []
+    if not todo:
+        logging.info(f"Tuning: every metric is current (fewer than {config.TUNE_MIN_NEW_DAYS} new days)")
+        return []
+
+    t0 = time.perf_counter()
+    results = {}
+    workers = max(1, min(processes or config.TUNE_PROCESSES, len(todo) * len(XGBOOST_GRID)))
+    # spawn: children must not inherit this process's pooled DB connections
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        futures = {}
+        for metric in todo:
+            values = df[metric].fillna(0).to_numpy(dtype=float)
+            splits = list(folds.split(values))
+            results[metric] = {
+                "ma": _score_windows(values, splits, MA_WINDOWS, weighted=False),
+                "wma": _score_windows(values, splits, WMA_WINDOWS, weighted=True),
+            }
+            # XGBoost trains on the rows after the lag warmup, at their original day_index
+            y = df[metric].to_numpy(dtype=float)[XGBOOST_WARMUP:]
+            day_index = np.arange(XGBOOST_WARMUP, days, dtype=float)[~np.isnan(y)]
+            y = y[~np.isnan(y)]
+            xgb_splits = list(folds.split(y))
+            for i, params in enumerate(XGBOOST_GRID):
+                futures[metric, i] = pool.submit(_score_xgboost, day_index, y, xgb_splits, params)
+        for (metric, i), future in futures.items():
+            results[metric].setdefault("xgboost", {})[i] = future.result()
+
+    rows = []
+    for metric in todo:
+        ma, wma, xgb = results[metric]["ma"], results[metric]["wma"], results[metric]["xgboost"]
+        best = min(xgb, key=lambda i: xgb[i][0])
+        params = {"ma_window": min(ma, key=ma.get), "wma_window": min(wma, key=wma.get),
+                  "n_estimators": xgb[best][1], **XGBOOST_GRID[best]}
+        scores = {"ma": ma[params["ma_window"]], "wma": wma[params["wma_window"]], "xgboost": xgb[best][0]}
+        rows.append({"channel_id": key, "metric": metric, "days": days, "params": json.dumps(params),
+                     "scores": json.dumps(scores), "tuned_at": datetime.utcnow()})
+        logging.info(f"Tuned {metric}: {params} (MAE " + ", ".join(f"{m} {v:,.2f}" for m, v in scores.items()) + ")")
+    session = get_session()
+    try:
+        upsert(session, ForecastTuning, rows, ['channel_id', 'metric'])
+        session.commit()
+    finally:
+        session.close()
+    logging.info(f"Tuned {len(todo)} metric(s) over {days} days in {time.perf_counter() - t0:.1f}s "
+                 f"({workers} processes)")
+    return todo
+
+def _round_series(values, digits):
+    return [max(0, round(float(x), digits)) for x in values]
+
+def _store(output, model, metric, forecast, band, digits):
+    """Write a forecast and its band (when there is one) into the output dict, clipped at 0."""
+    output['predictions'][model][metric] = _round_series(forecast, digits)
+    if band is not None:
+        lower, upper = band
+        output['intervals'][model][metric] = {
+            "lower": _round_series(np.minimum(lower, forecast), digits),
+            "upper": _round_series(np.maximum(upper, forecast), digits),
+        }
+
+def generate_predictions(channel_id=None, output_path=None):
+    """Forecast one channel's daily stats into output_path (channel_id None: a single-channel DB's rows)."""
+    output_path = str(output_path or OUTPUT_PATH)
+    with stage("load"):
+        df = fetch_data(channel_id)
     
     if df.empty:
         logging.warning("No data found in DB")
@@ -167,6 +424,13 @@ def generate_predictions():
             "ma": {},
             "wma": {},
             "xgboost": {}
+        },
+        # Central INTERVAL_LEVEL prediction band per model and metric, next to the point forecasts
+        "intervals": {
+            "level": INTERVAL_LEVEL,
+            "ma": {},
+            "wma": {},
+            "xgboost": {}
         }
     }
     
@@ -175,6 +439,7 @@ def generate_predictions():
     future_dates = [(last_date + timedelta(days=i+1)).strftime('%Y-%m-%d') for i in range(DAYS_TO_PREDICT)]
     output['dates'] = future_dates
     
+    tuned = tuned_params(channel_id)
     for metric in metrics:
         # Pre-process: Handle NaNs, cumulative vs daily?
         # The DB stores Cumulative stats usually.
@@ -182,34 +447,71 @@ def generate_predictions():
         # Let's predict cumulative.
         
         series = df[metric].fillna(0)
+        digits = 2 if metric in ['revenue', 'watch_time'] else None
+        params = {**DEFAULT_PARAMS, **tuned.get(metric, {})}
         
         # 1. MA
-        ma_pred = moving_average_forecast(series, window=7, horizon=DAYS_TO_PREDICT)
-        if metric in ['revenue', 'watch_time']:
-             output['predictions']['ma'][metric] = [max(0, round(x, 2)) for x in ma_pred]
-        else:
-             output['predictions']['ma'][metric] = [max(0, round(x)) for x in ma_pred]
+        with stage("ma"):
+            ma_pred, ma_band = moving_average_forecast(series, window=params['ma_window'], horizon=DAYS_TO_PREDICT)
+        _store(output, 'ma', metric, ma_pred, ma_band, digits)
         
         # 2. WMA
-        wma_pred = weighted_moving_average_forecast(series, window=30, horizon=DAYS_TO_PREDICT)
-        if metric in ['revenue', 'watch_time']:
-             output['predictions']['wma'][metric] = [max(0, round(x, 2)) for x in wma_pred]
-        else:
-             output['predictions']['wma'][metric] = [max(0, round(x)) for x in wma_pred]
+        with stage("wma"):
+            wma_pred, wma_band = weighted_moving_average_forecast(series, window=params['wma_window'],
+                                                                  horizon=DAYS_TO_PREDICT)
+        _store(output, 'wma', metric, wma_pred, wma_band, digits)
         
         # 3. XGBoost
-        xgb_pred = xgboost_forecast(df, metric, horizon=DAYS_TO_PREDICT)
-        if metric in ['revenue', 'watch_time']:
-             output['predictions']['xgboost'][metric] = [max(0, round(x, 2)) for x in xgb_pred]
-        else:
-             output['predictions']['xgboost'][metric] = [max(0, round(x)) for x in xgb_pred]
+        with stage("xgboost"):
+            xgb_pred, xgb_band = xgboost_forecast(df, metric, horizon=DAYS_TO_PREDICT, params=params)
+        _store(output, 'xgboost', metric, xgb_pred, xgb_band, digits)
 
     # Save to JSON
-    with open(OUTPUT_PATH, 'w', encoding='utf-8') as f:
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    with stage("write"), open(output_path, 'w', encoding='utf-8') as f:
         json.dump(output, f, ensure_ascii=False, indent=2)
     
-    logging.info(f"Predictions saved to {OUTPUT_PATH}")
+    logging.info(f"Predictions saved to {output_path}")
+
+def main(argv=None):
+    global PROFILER
+    parser = argparse.ArgumentParser(description="Forecast Engine (MA/WMA/XGBoost)")
+    parser.add_argument("--profile", action="store_true", help="Collect cProfile dumps and peak RSS per stage")
+    parser.add_argument("--channel", metavar="CHANNEL_ID",
+                        help="Forecast one channel into its dashboard bundle (default: every channel in the DB)")
+    parser.add_argument("--tune", action="store_true",
+                        help="Search window lengths and XGBoost settings per metric and store the best "
+                             "(only metrics with enough new days since their last search)")
+    parser.add_argument("--force", action="store_true", help="--tune every metric regardless of new data")
+    parser.add_argument("--processes", type=int, help="--tune worker processes (default: config.TUNE_PROCESSES)")
+    args = parser.parse_args(argv)
+
+    if args.profile:
+        from profiling import Profiler
+        from database import enable_sql_profiling
+        PROFILER = Profiler()
+        enable_sql_profiling(PROFILER.record_sql)
+
+    try:
+        import channels
+        cids = [args.channel] if args.channel else channel_ids()
+        if not cids:
+            logging.warning("No channels in the DB; run `cli.py sync` first.")
+        if args.tune:
+            for cid in cids:
+                with stage("tune"):
+                    tune(cid, force=args.force, processes=args.processes)
+            return
+
+        logging.info("Starting Prediction Engine...")
+        for cid in cids:
+            path = channels.bundle_dir(cid) / "prediction_data.json"
+            generate_predictions(cid, path)
+            if channels.single_channel() and os.path.exists(path):
+                shutil.copy(path, OUTPUT_PATH)  # legacy location the dashboard reads
+    finally:
+        if PROFILER:
+            PROFILER.dump()
 
 if __name__ == "__main__":
-    logging.info("Starting Prediction Engine...")
-    generate_predictions()
+    main()
@@ -0,0 +1,160 @@
+import io
+import os
+import time
+import pstats
+import cProfile
+import datetime
+import resource
+import threading
+from contextlib import contextmanager
+
+import config
+
+
+def current_rss_bytes():
+    """Resident set size of this process (Linux /proc, else peak RSS from getrusage)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        # ru_maxrss is KiB on Linux, bytes on macOS
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return rss if os.uname().sysname == "Darwin" else rss * 1024
+
+
+def normalize_sql(statement):
+    return " ".join(statement.split())[:240]
+
+
+class Profiler:
+    """Per-stage cProfile dumps, SQL statement accounting and peak RSS sampling.
+
+    Enabled by `--profile` on fetch_data.py / prediction.py. Stages nest: the
+    parent's cProfile is paused while a child stage runs so functions are not
+    counted twice.
+    """
+
+    def __init__(self, out_dir=None, top=15, sample_interval=0.05):
+        stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+        self.out_dir = out_dir or os.path.join(config.PROFILE_DIR, stamp)
+        self.top = top
+        self.sample_interval = sample_interval
+        self.stages = {}      # name -> {profile, seconds, peak_rss, sql_count, sql_seconds}
+        self.statements = {}  # normalized SQL -> {count, seconds, max, stages}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._sample_rss, daemon=True)
+        self._sampler.start()
+
+    def _stack(self):
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+        return self._local.stack
+
+    def _entry(self, name):
+        return self.stages.setdefault(name, {
+            "profile": None, "seconds": 0.0, "peak_rss": 0, "sql_count": 0, "sql_seconds": 0.0
+        })
+
+    def _sample_rss(self):
+        while not self._stop.wait(self.sample_interval):
+            self._update_peak(current_rss_bytes())
+
+    def _update_peak(self, rss):
+        with self._lock:
+            for entry in self.stages.values():
+                if entry.get("active"):
+                    entry["peak_rss"] = max(entry["peak_rss"], rss)
+
+    @contextmanager
+    def stage(self, name):
+        stack = self._stack()
+        parent = self.stages[stack[-1]] if stack else None
+        with self._lock:
+            entry = self._entry(name)
+            entry["active"] = entry.get("active", 0) + 1
+            if entry["profile"] is None:
+                entry["profile"] = cProfile.Profile()
+        if parent and parent["profile"] is not None:
+            parent["profile"].disable()
+        profiling = True
+        try:
+            entry["profile"].enable()
+        except ValueError:
+            # Another profiler is active (concurrent stage in a worker thread)
+            profiling = False
+        self._update_peak(current_rss_bytes())
+        stack.append(name)
+        t0 = time.perf_counter()
+        try:
+            yield entry
+        finally:
+            if profiling:
+                entry["profile"].disable()
+            stack.pop()
+            self._update_peak(current_rss_bytes())
+            with self._lock:
+                entry["seconds"] += time.perf_counter() - t0
+                entry["active"] -= 1
+            if parent and parent["profile"] is not None:
+                try:
+                    parent["profile"].enable()
+                except ValueError:
+                    pass
+
+    def record_sql(self, statement, seconds):
+        key = normalize_sql(statement)
+        stack = self._stack()
+        stage_name = stack[-1] if stack else None
+        with self._lock:
+            if stage_name:
+                self.stages[stage_name]["sql_count"] += 1
+                self.stages[stage_name]["sql_seconds"] += seconds
+            s = self.statements.setdefault(key, {"count": 0, "seconds": 0.0, "max": 0.0, "stages": set()})
+            s["count"] += 1
+            s["seconds"] += seconds
+            s["max"] = max(s["max"], seconds)
+            if stage_name:
+                s["stages"].add(stage_name)
+
+    def report(self):
+        out = io.StringIO()
+        out.write("=== Stages ===\n")
+        out.write(f"{'stage':<20}{'seconds':>10}{'peak RSS MB':>14}{'SQL stmts':>12}{'SQL s':>10}\n")
+        for name, e in sorted(self.stages.items(), key=lambda kv: -kv[1]["seconds"]):
+            out.write(f"{name:<20}{e['seconds']:>10.3f}{e['peak_rss'] / 2**20:>14.1f}"
+                      f"{e['sql_count']:>12}{e['sql_seconds']:>10.3f}\n")
+
+        out.write(f"\n=== Top {self.top} SQL statements by total time ===\n")
+        ranked = sorted(self.statements.items(), key=lambda kv: -kv[1]["seconds"])[:self.top]
+        for stmt, s in ranked:
+            stages = ",".join(sorted(s["stages"])) or "-"
+            out.write(f"{s['seconds']:8.3f}s  x{s['count']:<7} max {s['max'] * 1000:7.2f}ms  [{stages}]\n    {stmt}\n")
+
+        for name, e in self.stages.items():
+            if e["profile"] is None:
+                continue
+            out.write(f"\n=== Top {self.top} functions in '{name}' (cumulative) ===\n")
+            try:
+                pstats.Stats(e["profile"], stream=out).strip_dirs().sort_stats("cumulative").print_stats(self.top)
+            except TypeError:
+                out.write("(no samples)\n")
+        return out.getvalue()
+
+    def dump(self):
+        """Stop sampling, write <stage>.pstats files + report.txt and print the report."""
+        self._stop.set()
+        os.makedirs(self.out_dir, exist_ok=True)
+        for name, e in self.stages.items():
+            if e["profile"] is None:
+                continue
+            try:
+                e["profile"].dump_stats(os.path.join(self.out_dir, f"{name}.pstats"))
+            except TypeError:
+                pass  # stage never collected any samples
+        text = self.report()
+        with open(os.path.join(self.out_dir, "report.txt"), 'w') as f:
+            f.write(text)
+        print(text)
+        print(f"Profile written to {self.out_dir}")
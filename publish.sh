@@ -0,0 +1,20 @@
+#!/bin/bash
+# Build the dashboard and push the refreshed outputs.
+# Run by the resident daemon (PUBLISH_COMMAND="sh publish.sh") only when a
+# channel's dashboard output changed; auto_update.sh does the same after a cron sync.
+
+PROJECT_DIR="$(cd "$(dirname "$0")" && pwd)"
+DATE=$(date "+%Y-%m-%d %H:%M:%S")
+cd "$PROJECT_DIR" || exit 1
+
+echo "[$DATE] Building Dashboard..."
+(cd dashboard && npm ci --prefer-offline && npm run build) || exit 1
+
+echo "[$DATE] Deploying to root..."
+# Replace thumbs/ wholesale: the build holds the current thumbnail cache, so pruned files go too
+rm -rf thumbs && cp -R dashboard/dist/. .
+
+echo "[$DATE] Syncing with GitHub..."
+git add -f data/*.csv dashboard_data.json prediction_data.json dashboard/public/channels index.html assets/ thumbs/
+git commit -m "Auto Update: $DATE" || exit 0   # nothing new to commit
+git push origin main
@@ -0,0 +1,496 @@
+import io
+import os
+import re
+import json
+import base64
+import time
+import random
+import hashlib
+import datetime
+import importlib.util
+from urllib.parse import urlsplit, parse_qsl
+
+import httplib2
+
+# Query parameters that identify the caller rather than the request
+VOLATILE_PARAMS = {"access_token", "key", "quotaUser", "prettyPrint"}
+DATE_RE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+
+def relative_date(value, today=None):
+    """'2024-05-01' -> 'today-30d' so fixtures recorded on one day replay on another."""
+    today = today or datetime.date.today()
+    delta = (today - datetime.date.fromisoformat(value)).days
+    return f"today-{delta}d"
+
+
+def normalize_request(method, uri, body=None):
+    parts = urlsplit(uri)
+    params = []
+    for k, v in parse_qsl(parts.query, keep_blank_values=True):
+        if k in VOLATILE_PARAMS:
+            continue
+        params.append((k, relative_date(v) if DATE_RE.match(v) else v))
+    return {
+        "method": method.upper(),
+        "path": parts.path,
+        "params": sorted(params),
+        "body": body.decode() if isinstance(body, bytes) else body,
+    }
+
+
+class FixtureStore:
+    """One JSON file per captured response: <root>/<kind>/<sha1 of the normalized request>.json"""
+
+    def __init__(self, root):
+        self.root = str(root)
+
+    def _path(self, kind, key):
+        return os.path.join(self.root, kind, f"{key}.json")
+
+    @staticmethod
+    def key(request):
+        return hashlib.sha1(json.dumps(request, sort_keys=True).encode()).hexdigest()
+
+    def save(self, kind, request, status, content):
+        key = self.key(request)
+        os.makedirs(os.path.join(self.root, kind), exist_ok=True)
+        with open(self._path(kind, key), 'w', encoding='utf-8') as f:
+            json.dump({"request": request, "status": status, "content": content,
+                       "recorded_at": datetime.datetime.now().isoformat(timespec='seconds')},
+                      f, ensure_ascii=False)
+
+    def load(self, kind, request):
+        try:
+            with open(self._path(kind, self.key(request)), encoding='utf-8') as f:
+                return json.load(f)
+        except OSError:
+            return None
+
+    def latest(self, kind):
+        folder = os.path.join(self.root, kind)
+        if not os.path.isdir(folder):
+            return None
+        files = sorted((os.path.join(folder, n) for n in os.listdir(folder)), key=os.path.getmtime)
+        if not files:
+            return None
+        with open(files[-1], encoding='utf-8') as f:
+            return json.load(f)
+
+
+class OllamaResponse:
+    """Just enough of requests.Response for analyze_with_ollama."""
+
+    def __init__(self, status_code, text):
+        self.status_code = status_code
+        self.text = text
+
+    def json(self):
+        return json.loads(self.text)
+
+
+class BinaryResponse:
+    """Just enough of requests.Response for thumbnail downloads."""
+
+    def __init__(self, status_code, content):
+        self.status_code = status_code
+        self.content = content
+
+
+def http_response(status, content):
+    resp = httplib2.Response({"status": str(status), "content-type": "application/json; charset=UTF-8"})
+    return resp, content.encode() if isinstance(content, str) else content
+
+
+def ollama_request(payload):
+    if "input" in payload:  # /api/embed
+        return {"model": payload.get("model"), "input": payload.get("input")}
+    return {"model": payload.get("model"), "prompt": payload.get("prompt")}
+
+
+# --- Record ---
+
+class RecordingHttp:
+    """httplib2-compatible wrapper that captures every Google API response to the store."""
+
+    def __init__(self, http, store):
+        self.http = http
+        self.store = store
+
+    def request(self, uri, method="GET", body=None, headers=None, **kwargs):
+        resp, content = self.http.request(uri, method, body=body, headers=headers, **kwargs)
+        self.store.save("google", normalize_request(method, uri, body), resp.status, content.decode('utf-8'))
+        return resp, content
+
+
+class RecordingBackend:
+    def __init__(self, root, credentials):
+        import requests
+        import google_auth_httplib2
+        self.store = FixtureStore(root)
+        self.credentials = credentials
+        self._authorized_http = google_auth_httplib2.AuthorizedHttp
+        self._post = requests.post
+        self._get = requests.get
+        print(f"RECORD MODE: capturing API and Ollama responses to {root}")
+
+    def new_http(self):
+        return RecordingHttp(self._authorized_http(self.credentials, http=httplib2.Http()), self.store)
+
+    def post(self, url, json=None, timeout=None):
+        res = self._post(url, json=json, timeout=timeout)
+        self.store.save("ollama", ollama_request(json or {}), res.status_code, res.text)
+        return res
+
+    def get(self, url, timeout=None):
+        res = self._get(url, timeout=timeout)
+        self.store.save("thumbnail", {"url": url}, res.status_code, base64.b64encode(res.content).decode())
+        return res
+
+
+# --- Replay ---
+
+class ReplayBackend:
+    """Serves recorded fixtures locally, optionally adding per-request latency (seconds)."""
+
+    def __init__(self, root, latency=0.0):
+        self.store = FixtureStore(root)
+        self.latency = latency
+        print(f"REPLAY MODE: serving fixtures from {root} (latency {latency * 1000:.0f}ms)")
+
+    def new_http(self):
+        return self  # stateless, safe to share between threads
+
+    def request(self, uri, method="GET", body=None, headers=None, **kwargs):
+        if self.latency:
+            time.sleep(self.latency)
+        rec = self.store.load("google", normalize_request(method, uri, body))
+        if rec is None:
+            return http_response(404, json.dumps({"error": {"code": 404, "message": f"No fixture for {uri}"}}))
+        return http_response(rec["status"], rec["content"])
+
+    def post(self, url, json=None, timeout=None):
+        if self.latency:
+            time.sleep(self.latency)
+        # Prompts embed live numbers; fall back to the newest capture when they drift
+        rec = self.store.load("ollama", ollama_request(json or {})) or self.store.latest("ollama")
+        if rec is None:
+            return OllamaResponse(404, '{"error": "no ollama fixture"}')
+        return OllamaResponse(rec["status"], rec["content"])
+
+    def get(self, url, timeout=None):
+        rec = self.store.load("thumbnail", {"url": url})
+        if rec is None:
+            return BinaryResponse(404, b"")
+        return BinaryResponse(rec["status"], base64.b64decode(rec["content"]))
+
+
+# --- Synthetic ---
+
+SYNTHETIC_CHANNEL_ID = "UCsynthetic0000000000000"
+AGE_GROUPS = ["age13-17", "age18-24", "age25-34", "age35-44", "age45-54", "age55-64", "age65-"]
+GENDERS = ["female", "male", "user_specified"]
+COUNTRIES = ["KR", "US", "JP", "DE", "BR", "IN", "GB", "FR", "CA", "VN", "ID", "MX"]
+TRAFFIC_SOURCES = ["YT_SEARCH", "RELATED_VIDEO", "BROWSE", "SUBSCRIBER", "EXT_URL", "SHORTS", "PLAYLIST"]
+
+SYNTHETIC_AI_RESPONSE = {
+    "current_analysis": {
+        "strengths": {"title": "합성 데이터", "content": "벤치마크용 합성 응답입니다."},
+        "improvements": {"title": "합성 데이터", "content": "벤치마크용 합성 응답입니다."},
+        "action_plan": {"title": "합성 데이터", "content": "벤치마크용 합성 응답입니다."},
+        "detailed_report": "## 합성 데이터\n\n벤치마크 실행 결과입니다."
+    },
+    "future_strategy": {
+        "growth_trend": {"title": "합성 데이터", "content": "벤치마크용 합성 응답입니다."},
+        "risk_factor": {"title": "합성 데이터", "content": "벤치마크용 합성 응답입니다."},
+        "action_strategy": {"title": "합성 데이터", "content": "벤치마크용 합성 응답입니다."},
+        "detailed_report": "## 합성 데이터\n\n벤치마크 실행 결과입니다."
+    }
+}
+SYNTHETIC_OLLAMA_BODY = json.dumps({"response": json.dumps(SYNTHETIC_AI_RESPONSE, ensure_ascii=False)})
+SYNTHETIC_EMBED_DIM = 64
+
+
+def synthetic_embeddings(payload):
+    """/api/embed body: a stable pseudo-random unit vector per input text."""
+    vectors = []
+    for text in payload["input"]:
+        rng = random.Random(hashlib.sha1(text.encode()).digest())
+        v = [rng.gauss(0, 1) for _ in range(SYNTHETIC_EMBED_DIM)]
+        norm = sum(x * x for x in v) ** 0.5
+        vectors.append([x / norm for x in v])
+    return json.dumps({"model": payload.get("model"), "embeddings": vectors})
+
+
+class SyntheticBackend:
+    """Generates a deterministic fake channel of arbitrary size behind the API surface.
+
+    Spec string: "videos=10000,years=3,comments=2000,monetized=1"
+    channel_id sets the channel behind mine=True; other channels get their own
+    video/comment ID prefix so several synthetic channels can share one DB.
+    """
+
+    def __init__(self, videos=100, years=1, comments=200, monetized=True, latency=0.0,
+                 channel_id=SYNTHETIC_CHANNEL_ID):
+        self.channel_id = channel_id
+        self.prefix = "syn" if channel_id == SYNTHETIC_CHANNEL_ID else f"syn{channel_id[-4:]}_"
+        self.n_videos = videos
+        self.n_comments = comments
+        self.monetized = monetized
+        self.latency = latency
+        self.today = datetime.date.today()
+        self.first_day = self.today - datetime.timedelta(days=int(365 * years))
+        span = (self.today - self.first_day).days
+        # Video i is published at first_day + i * span / n (uploads playlist lists newest first)
+        self.published = [self.first_day + datetime.timedelta(days=i * span // max(videos, 1)) for i in range(videos)]
+        print(f"SYNTHETIC MODE: {videos} videos x {years} years, {comments} comments")
+
+    @classmethod
+    def from_spec(cls, spec, latency=0.0, channel_id=SYNTHETIC_CHANNEL_ID):
+        opts = dict(part.split("=", 1) for part in spec.split(",") if part)
+        return cls(videos=int(opts.get("videos", 100)), years=float(opts.get("years", 1)),
+                   comments=int(opts.get("comments", 200)), monetized=opts.get("monetized", "1") != "0",
+                   latency=latency, channel_id=channel_id)
+
+    def new_http(self):
+        return self  # stateless, safe to share between threads
+
+    # helpers
+
+    def video_id(self, i):
+        return f"{self.prefix}{i:08d}"
+
+    def video_index(self, vid):
+        return int(vid[len(self.prefix):])
+
+    @staticmethod
+    def duration(i):
+        return "PT45S" if i % 4 == 0 else f"PT{3 + i % 7}M{i % 60}S"
+
+    def video_views(self, i, day):
+        age = (day - self.published[i]).days
+        if age < 0:
+            return 0
+        return int(400 / (1 + age / 14)) + (i * 31 + day.toordinal() * 17) % 13
+
+    def channel_views(self, day):
+        live = sum(1 for p in self.published if p <= day) if self.n_videos < 2000 else \
+            int(self.n_videos * (day - self.first_day).days / max((self.today - self.first_day).days, 1))
+        return 50 + 12 * live + day.toordinal() % 29
+
+    def _days(self, start, end):
+        d = datetime.date.fromisoformat(start)
+        end = datetime.date.fromisoformat(end)
+        while d <= end:
+            yield d
+            d += datetime.timedelta(days=1)
+
+    def _metric_values(self, metric, views, salt):
+        if metric == "views":
+            return views
+        if metric == "estimatedRevenue":
+            return round(views * 0.0012, 4)
+        if metric == "estimatedMinutesWatched":
+            return round(views * 2.7, 1)
+        if metric == "averageViewDuration":
+            return 160 + salt % 40
+        if metric == "subscribersGained":
+            return views // 200
+        if metric == "likes":
+            return views // 25
+        if metric == "dislikes":
+            return views // 400
+        if metric == "comments":
+            return views // 150
+        if metric == "shares":
+            return views // 90
+        if metric == "viewerPercentage":
+            return round(100.0 / (1 + salt % 7), 2)
+        return 0
+
+    # endpoints
+
+    def _channels(self, q):
+        if q.get("mine") == "true" or q.get("id") == self.channel_id:
+            ids = [self.channel_id]
+        else:
+            ids = [c for c in q.get("id", "").split(",") if c]
+        items = []
+        for n, cid in enumerate(ids):
+            mine = cid == self.channel_id
+            items.append({
+                "id": cid,
+                "snippet": {
+                    "title": (f"Synthetic Channel {self.prefix[3:-1]}".rstrip() if mine else f"Competitor {n + 1}"),
+                    "customUrl": f"@synthetic{n}",
+                    "thumbnails": {"default": {"url": f"https://yt3.example/{cid}.jpg"}},
+                },
+                "contentDetails": {"relatedPlaylists": {"uploads": "UU" + cid[2:]}},
+                "statistics": {
+                    "subscriberCount": str(1000 * (n + 1) if not mine else self.n_videos * 7),
+                    "viewCount": str(10 ** 6 * (n + 1) if not mine else self.n_videos * 9000),
+                    "videoCount": str(self.n_videos if mine else 100 + n),
+                },
+            })
+        return {"items": items}
+
+    def _playlist_items(self, q):
+        playlist = q.get("playlistId", "")
+        per_page = int(q.get("maxResults", 5))
+        if playlist != "UU" + self.channel_id[2:]:
+            # Competitor uploads: a few stable videos per channel
+            items = [{"snippet": {
+                "title": f"{playlist} upload {k}",
+                "publishedAt": f"{self.today - datetime.timedelta(days=k * 7)}T12:00:00Z",
+                "resourceId": {"videoId": f"{playlist[2:10]}{k:03d}"},
+                "thumbnails": {"default": {"url": ""}},
+            }} for k in range(per_page)]
+            return {"items": items}
+
+        offset = int(q.get("pageToken") or 0)
+        order = range(self.n_videos - 1 - offset, max(self.n_videos - 1 - offset - per_page, -1), -1)
+        items = []
+        for i in order:
+            thumb = {"url": f"https://i.ytimg.com/vi/{self.video_id(i)}/mqdefault.jpg"}
+            items.append({"snippet": {
+                "title": f"Synthetic Video #{i}",
+                "publishedAt": f"{self.published[i]}T09:00:00Z",
+                "resourceId": {"videoId": self.video_id(i)},
+                "thumbnails": {"default": thumb, "medium": thumb},
+            }})
+        res = {"items": items}
+        if offset + per_page < self.n_videos:
+            res["nextPageToken"] = str(offset + per_page)
+        return res
+
+    def _videos(self, q):
+        items = []
+        for vid in q.get("id", "").split(","):
+            if not vid:
+                continue
+            if vid.startswith(self.prefix):
+                i = self.video_index(vid)
+                items.append({"id": vid, "contentDetails": {"duration": self.duration(i)},
+                              "statistics": {"viewCount": str(self.video_views(i, self.today) * 30)}})
+            else:
+                seed = sum(map(ord, vid))
+                items.append({"id": vid, "statistics": {
+                    "viewCount": str(1000 + seed * 13), "likeCount": str(seed), "commentCount": str(seed % 97)}})
+        return {"items": items}
+
+    def _comment_published(self, k):
+        return datetime.datetime.combine(self.today, datetime.time(12)) - datetime.timedelta(hours=k * 5)
+
+    def _reply(self, k, j):
+        published = self._comment_published(k) + datetime.timedelta(minutes=j + 1)
+        return {"id": f"cmt{self.prefix[3:]}{k:09d}.r{j}", "snippet": {
+            "videoId": self.video_id((k * 7) % max(self.n_videos, 1)),
+            "parentId": f"cmt{self.prefix[3:]}{k:09d}",
+            "textDisplay": f"Synthetic reply {j} to comment {k}",
+            "authorDisplayName": f"viewer{(k + j) % 500}",
+            "publishedAt": published.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "likeCount": j,
+        }}
+
+    def _comment_threads(self, q):
+        per_page = int(q.get("maxResults", 20))
+        offset = int(q.get("pageToken") or 0)
+        items = []
+        for k in range(offset, min(offset + per_page, self.n_comments)):
+            i = (k * 7) % max(self.n_videos, 1)
+            replies = k % 8  # more than 5 means the rest must be paged in via comments.list
+            item = {"snippet": {
+                "totalReplyCount": replies,
+                "topLevelComment": {"id": f"cmt{self.prefix[3:]}{k:09d}", "snippet": {
+                    "videoId": self.video_id(i),
+                    "textDisplay": f"Synthetic comment {k} on video {i}",
+                    "authorDisplayName": f"viewer{k % 500}",
+                    "publishedAt": self._comment_published(k).strftime("%Y-%m-%dT%H:%M:%SZ"),
+                    "likeCount": k % 11,
+                }}}}
+            if replies and "replies" in q.get("part", ""):
+                item["replies"] = {"comments": [self._reply(k, j) for j in range(min(replies, 5))]}
+            items.append(item)
+        res = {"items": items}
+        if offset + per_page < self.n_comments:
+            res["nextPageToken"] = str(offset + per_page)
+        return res
+
+    def _comments(self, q):
+        k = int(q.get("parentId", "")[-9:] or 0)  # thread IDs end in the 9-digit thread number
+        per_page = int(q.get("maxResults", 20))
+        offset = int(q.get("pageToken") or 0)
+        res = {"items": [self._reply(k, j) for j in range(offset, min(offset + per_page, k % 8))]}
+        if offset + per_page < k % 8:
+            res["nextPageToken"] = str(offset + per_page)
+        return res
+
+    def _reports(self, q):
+        metrics = [m for m in q.get("metrics", "").split(",") if m]
+        dims = [d for d in q.get("dimensions", "").split(",") if d]
+        if not self.monetized and "estimatedRevenue" in metrics:
+            return 403, {"error": {"code": 403, "message": "Forbidden (synthetic: channel not monetized)"}}
+
+        video = q.get("filters", "").partition("video==")[2] or None
+        categories = {"ageGroup": AGE_GROUPS, "gender": GENDERS, "country": COUNTRIES,
+                      "insightTrafficSourceType": TRAFFIC_SOURCES}
+        rows = []
+        if dims[:1] == ["day"]:
+            for day in self._days(q["startDate"], q["endDate"]):
+                if video:
+                    views = self.video_views(self.video_index(video), day) if video.startswith(self.prefix) else 0
+                else:
+                    views = self.channel_views(day)
+                members = categories.get(dims[1], [None]) if len(dims) > 1 else [None]
+                for n, member in enumerate(members):
+                    v = views // (n + 2) if member else views
+                    prefix = [day.isoformat()] + ([member] if member else [])
+                    rows.append(prefix + [self._metric_values(m, v, day.toordinal() + n) for m in metrics])
+        elif dims:
+            for n, member in enumerate(categories.get(dims[0], [])):
+                v = 5000 // (n + 1)
+                rows.append([member] + [self._metric_values(m, v, n) for m in metrics])
+        headers = [{"name": d, "columnType": "DIMENSION"} for d in dims] + \
+                  [{"name": m, "columnType": "METRIC"} for m in metrics]
+        return 200, {"kind": "youtubeAnalytics#resultTable", "columnHeaders": headers, "rows": rows}
+
+    def request(self, uri, method="GET", body=None, headers=None, **kwargs):
+        if self.latency:
+            time.sleep(self.latency)
+        parts = urlsplit(uri)
+        q = dict(parse_qsl(parts.query, keep_blank_values=True))
+        endpoint = parts.path.rstrip("/").rsplit("/", 1)[-1]
+        handlers = {
+            "channels": self._channels,
+            "playlistItems": self._playlist_items,
+            "videos": self._videos,
+            "commentThreads": self._comment_threads,
+            "comments": self._comments,
+        }
+        if endpoint == "reports":
+            status, payload = self._reports(q)
+        elif endpoint in handlers:
+            status, payload = 200, handlers[endpoint](q)
+        else:
+            status, payload = 404, {"error": {"code": 404, "message": f"Synthetic backend has no {endpoint}"}}
+        return http_response(status, json.dumps(payload))
+
+    def post(self, url, json=None, timeout=None):
+        if self.latency:
+            time.sleep(self.latency)
+        if json and "input" in json:
+            return OllamaResponse(200, synthetic_embeddings(json))
+        return OllamaResponse(200, SYNTHETIC_OLLAMA_BODY)
+
+    def get(self, url, timeout=None):
+        """A 320x180 JPEG per thumbnail URL; every 16th video shares an image (to exercise dedup)."""
+        if self.latency:
+            time.sleep(self.latency)
+        match = re.search(r"/vi/([^/]+)/", url)
+        if not match or importlib.util.find_spec("PIL") is None:
+            return BinaryResponse(404, b"")
+        from PIL import Image
+        shade = self.video_index(match.group(1)) % 16 if match.group(1).startswith(self.prefix) else 0
+        buf = io.BytesIO()
+        Image.new("RGB", (320, 180), (16 * shade, 96, 255 - 16 * shade)).save(buf, format="JPEG", quality=85)
+        return BinaryResponse(200, buf.getvalue())
@@ -0,0 +1,139 @@
+import json
+import time
+import random
+import datetime
+from collections import Counter
+
+import config
+
+# HTTP statuses worth retrying: rate limiting and transient server errors
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+# Metrics that need the monetary (yt-analytics-monetary) scope / a monetized channel
+MONETARY_METRICS = {"estimatedRevenue", "estimatedAdRevenue", "grossRevenue", "cpm", "playbackBasedCpm"}
+
+# Outcome counters for every Analytics query (printed at the end of a sync)
+COUNTERS = Counter()
+
+
+def http_status(exc):
+    """Return the HTTP status of a googleapiclient HttpError (or None)."""
+    resp = getattr(exc, 'resp', None)
+    status = getattr(resp, 'status', None)
+    try:
+        return int(status) if status is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def split_metrics(metrics):
+    return [m.strip() for m in metrics.split(",") if m.strip()]
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter for 429/5xx responses."""
+
+    def __init__(self, max_attempts=5, base_delay=1.0, max_delay=32.0):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def should_retry(self, exc, attempt):
+        return http_status(exc) in RETRYABLE_STATUSES and attempt < self.max_attempts
+
+    def delay(self, attempt):
+        # attempt is 1-based: 1s, 2s, 4s, ... capped, then jittered over [0, cap]
+        cap = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        return random.uniform(0, cap)
+
+
+class CircuitBreaker:
+    """Stops calling the API after `failure_threshold` consecutive failures.
+
+    After `reset_timeout` seconds one trial call is let through (half-open);
+    success closes the breaker again, failure re-opens it.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=300.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self):
+        return self.state != "open"
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self):
+        self.failures += 1
+        # A failed half-open trial re-arms the timer; otherwise open at the threshold
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            if self.opened_at is None:
+                COUNTERS['breaker_opened'] += 1
+            self.opened_at = time.monotonic()
+
+
+class CapabilityCache:
+    """Persisted memory of metrics the authenticated account may not query.
+
+    Denials expire after `ttl_days` so a channel that becomes monetized
+    starts getting revenue again without manual intervention.
+    """
+
+    def __init__(self, path=None, ttl_days=7):
+        self.path = path or config.ANALYTICS_CAPABILITIES_FILE
+        self.ttl = datetime.timedelta(days=ttl_days)
+        self.denied = {}  # metric -> ISO timestamp of the denial
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path, 'r') as f:
+                self.denied = json.load(f).get('denied_metrics', {})
+        except (OSError, ValueError):
+            self.denied = {}
+
+    def save(self):
+        try:
+            with open(self.path, 'w') as f:
+                json.dump({'denied_metrics': self.denied}, f, indent=2)
+        except OSError as e:
+            print(f"Could not persist analytics capabilities: {e}")
+
+    def is_denied(self, metric):
+        ts = self.denied.get(metric)
+        if not ts:
+            return False
+        if datetime.datetime.utcnow() - datetime.datetime.fromisoformat(ts) > self.ttl:
+            del self.denied[metric]
+            self.save()
+            return False
+        return True
+
+    def mark_denied(self, metrics):
+        now = datetime.datetime.utcnow().isoformat(timespec='seconds')
+        for m in metrics:
+            self.denied[m] = now
+        self.save()
+
+    def filter_metrics(self, metrics):
+        """Drop metrics known to be denied from a comma separated metrics string."""
+        return ",".join(m for m in split_metrics(metrics) if not self.is_denied(m))
+
+
+def print_counters():
+    if not COUNTERS:
+        return
+    summary = ", ".join(f"{k}={v}" for k, v in sorted(COUNTERS.items()))
+    print(f"Analytics query outcomes: {summary}")
@@ -0,0 +1,151 @@
+"""Tiered retention for video_daily_stats.
+
+    daily rows    newer than VIDEO_DAILY_RETENTION_DAYS
+    weekly rows   up to VIDEO_WEEKLY_RETENTION_DAYS (weeks start on Monday or the 1st of a month,
+                  so they fold into months exactly)
+    monthly rows  beyond that
+
+compact() folds expired rows into video_rollup_stats with additive upserts and
+deletes them in the same transaction, so every daily row is counted exactly
+once. stage_video_daily never re-fetches dates at or before a channel's
+compaction horizon. video_totals()/video_series() read the tiers together.
+"""
+import datetime
+
+from sqlalchemy import text, bindparam, select, func, literal, union_all, Date
+
+import config
+from database import engine, IS_SQLITE, DB_URL, Video, VideoDaily, VideoRollup
+
+METRICS = ["views", "likes", "dislikes", "comments", "shares",
+           "estimated_revenue", "watch_time_minutes", "subscribers_gained"]
+
+
+def _dialect_sql():
+    if IS_SQLITE:
+        def week(c):
+            return f"MAX(date({c}, '-' || ((CAST(strftime('%w', {c}) AS INTEGER) + 6) % 7) || ' days'), " \
+                   f"date({c}, 'start of month'))"
+
+        def month(c):
+            return f"date({c}, 'start of month')"
+        return week, month, "MAX"
+
+    def week(c):
+        return f"GREATEST(CAST(date_trunc('week', {c}) AS DATE), CAST(date_trunc('month', {c}) AS DATE))"
+
+    def month(c):
+        return f"CAST(date_trunc('month', {c}) AS DATE)"
+    return week, month, "GREATEST"
+
+
+def _fold(conn, grain, source, bucket, where, end_col, days_expr, cutoff):
+    greatest = _dialect_sql()[2]
+    cols = ", ".join(METRICS)
+    sums = ", ".join(f"SUM({m})" for m in METRICS)
+    merge = ", ".join(f"{m} = video_rollup_stats.{m} + excluded.{m}" for m in METRICS)
+    stmt = text(f"""
+        INSERT INTO video_rollup_stats (video_id, grain, period_start, period_end, days, {cols})
+        SELECT video_id, '{grain}', {bucket}, MAX({end_col}), {days_expr}, {sums}
+        FROM {source} WHERE {where}
+        GROUP BY video_id, {bucket}
+        ON CONFLICT (video_id, grain, period_start) DO UPDATE SET
+            period_end = {greatest}(video_rollup_stats.period_end, excluded.period_end),
+            days = video_rollup_stats.days + excluded.days, {merge}
+    """).bindparams(bindparam("cutoff", type_=Date))
+    conn.execute(stmt, {"cutoff": cutoff})
+    delete = text(f"DELETE FROM {source} WHERE {where}").bindparams(bindparam("cutoff", type_=Date))
+    return conn.execute(delete, {"cutoff": cutoff}).rowcount
+
+
+def cutoffs(today=None):
+    """(first day kept daily, first day kept weekly), aligned to period starts."""
+    today = today or datetime.date.today()
+    d = today - datetime.timedelta(days=config.VIDEO_DAILY_RETENTION_DAYS)
+    daily = max(d - datetime.timedelta(days=d.weekday()), d.replace(day=1))
+    weekly = (today - datetime.timedelta(days=config.VIDEO_WEEKLY_RETENTION_DAYS)).replace(day=1)
+    return daily, min(weekly, daily.replace(day=1))
+
+
+def compact(today=None):
+    """Fold expired daily rows into weeks and expired weeks into months; returns rows removed."""
+    import snapshots
+    week, month, _ = _dialect_sql()
+    daily_cutoff, weekly_cutoff = cutoffs(today)
+    for channel_id in snapshots.exported_channels():  # the deleted days leave video_daily partitions stale
+        snapshots.invalidate(channel_id, "video_daily", None, daily_cutoff - datetime.timedelta(days=1))
+    with engine.begin() as conn:
+        days = _fold(conn, "week", "video_daily_stats", week("date"), "date < :cutoff",
+                     "date", "COUNT(*)", daily_cutoff)
+        weeks = _fold(conn, "month", "video_rollup_stats", month("period_start"),
+                      "grain = 'week' AND period_start < :cutoff", "period_end", "SUM(days)", weekly_cutoff)
+    print(f"Compaction: {days} daily rows before {daily_cutoff} -> weekly, "
+          f"{weeks} weekly rows before {weekly_cutoff} -> monthly")
+    return days + weeks
+
+
+def optimize(vacuum=True):
+    """VACUUM (reclaim the freed pages) and ANALYZE (refresh planner statistics)."""
+    size = _db_size()
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        if IS_SQLITE:
+            if vacuum:
+                conn.exec_driver_sql("VACUUM")
+            conn.exec_driver_sql("ANALYZE")
+        else:
+            for table in ("video_daily_stats", "video_rollup_stats"):
+                conn.exec_driver_sql(f"{'VACUUM ANALYZE' if vacuum else 'ANALYZE'} {table}")
+    if size is not None:
+        print(f"Database file: {size / 2**20:.1f} MiB -> {_db_size() / 2**20:.1f} MiB")
+
+
+def _db_size():
+    import os
+    if IS_SQLITE and DB_URL.database and os.path.exists(DB_URL.database):
+        return os.path.getsize(DB_URL.database)
+    return None
+
+
+def maintain(today=None):
+    """Scheduled job: compact, then VACUUM only when rows were actually removed."""
+    removed = compact(today)
+    optimize(vacuum=removed > 0)
+    return removed
+
+
+def compacted_through(session, channel_id):
+    """Last date folded into the rollup tiers for a channel's videos (None if nothing is)."""
+    return session.query(func.max(VideoRollup.period_end)).join(
+        Video, Video.id == VideoRollup.video_id).filter(Video.channel_id == channel_id).scalar()
+
+
+def _tiers(start, end):
+    """Daily rows in [start, end] plus rollup periods starting in it, as one selectable."""
+    daily = select(VideoDaily.video_id, VideoDaily.date.label("period_start"), VideoDaily.date.label("period_end"),
+                   literal("day").label("grain"), *[getattr(VideoDaily, m) for m in METRICS]).where(
+        VideoDaily.date >= start, VideoDaily.date <= end)
+    rolled = select(VideoRollup.video_id, VideoRollup.period_start, VideoRollup.period_end, VideoRollup.grain,
+                    *[getattr(VideoRollup, m) for m in METRICS]).where(
+        VideoRollup.period_start >= start, VideoRollup.period_start <= end)
+    return union_all(daily, rolled).subquery()
+
+
+def video_totals(session, start, end, channel_id=None):
+    """{video_id: {metric: total}} over [start, end] across all tiers.
+
+    Compacted periods count whole when they start inside the range, so
+    boundaries older than the daily window are exact to the week/month.
+    """
+    t = _tiers(start, end)
+    stmt = select(t.c.video_id, *[func.sum(t.c[m]) for m in METRICS]).group_by(t.c.video_id)
+    if channel_id:
+        stmt = stmt.join(Video, Video.id == t.c.video_id).where(Video.channel_id == channel_id)
+    return {row[0]: dict(zip(METRICS, row[1:])) for row in session.execute(stmt)}
+
+
+def video_series(session, video_id, start, end):
+    """[(period_start, period_end, grain, {metric: value})] for one video, oldest first."""
+    t = _tiers(start, end)
+    stmt = select(t).where(t.c.video_id == video_id).order_by(t.c.period_start)
+    return [(r.period_start, r.period_end, r.grain, {m: getattr(r, m) for m in METRICS})
+            for r in session.execute(stmt)]
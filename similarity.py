@@ -0,0 +1,245 @@
+"""Title similarity index over own and competitor video titles.
+
+Titles are embedded as L2-normalized float32 rows of one matrix file per
+embedding method under config.SIMILARITY_DIR, memory-mapped on open, with a
+JSON sidecar listing each row's (kind, video id, title). Cosine top-k for a
+batch of queries is one matrix product. refresh() embeds only titles it
+hasn't indexed yet, writes a new matrix generation and then swaps the
+sidecar, so a render in another process always maps a complete matrix.
+
+Embedding is hashed word/character n-gram TF-IDF (no model, no vocabulary)
+unless config.TITLE_EMBED_MODEL names an Ollama embedding model.
+"""
+import os
+import re
+import json
+import time
+import zlib
+import functools
+import unicodedata
+
+import numpy as np
+
+import config
+
+OWN, COMPETITOR = "video", "competitor"
+IDF_REFRESH = 1.25  # re-embed everything once the corpus has grown this much since the IDF was computed
+
+
+@functools.lru_cache(maxsize=1 << 16)
+def _word_hashes(word):
+    """crc32 of the word itself plus of its character 2/3-grams (Hangul and Latin alike)."""
+    padded = f"<{word}>"
+    grams = ["w " + word] + [padded[i:i + n] for n in (2, 3) for i in range(len(padded) - n + 1)]
+    return tuple(zlib.crc32(g.encode()) for g in grams)
+
+
+def hashed_counts(titles, dim):
+    """Signed feature-hashing counts, shape (len(titles), dim)."""
+    rows, hashes = [], []
+    for r, title in enumerate(titles):
+        for word in re.findall(r"\w+", unicodedata.normalize("NFKC", title or "").lower()):
+            h = _word_hashes(word)
+            hashes.extend(h)
+            rows.extend([r] * len(h))
+    hashes = np.asarray(hashes, np.uint32)
+    signs = np.where(hashes & 0x80000000, -1.0, 1.0)
+    cells = np.asarray(rows, np.int64) * dim + (hashes & (dim - 1))
+    counts = np.bincount(cells, weights=signs, minlength=len(titles) * dim)
+    return counts.reshape(len(titles), dim).astype(np.float32)
+
+
+def _normalize(m):
+    m = np.asarray(m, np.float32)
+    norms = np.linalg.norm(m, axis=1, keepdims=True)
+    return np.divide(m, norms, out=np.zeros_like(m), where=norms > 0)
+
+
+class HashedTfidf:
+    """Sublinear TF x smoothed IDF over hashed n-gram buckets."""
+    name = "tfidf"
+
+    def __init__(self, dim=None):
+        self.dim = dim or config.SIMILARITY_DIM
+        self.df = np.zeros(self.dim, np.int64)
+        self.docs = 0
+
+    def load(self, state):
+        self.dim, self.df, self.docs = state["dim"], np.asarray(state["df"], np.int64), state["docs"]
+
+    def state(self):
+        return {"dim": self.dim, "df": self.df.tolist(), "docs": self.docs}
+
+    def stale(self, corpus_size):
+        return self.docs == 0 or corpus_size > self.docs * IDF_REFRESH
+
+    def fit(self, titles):
+        self.df = (hashed_counts(titles, self.dim) != 0).sum(axis=0)
+        self.docs = len(titles)
+
+    def __call__(self, titles):
+        counts = hashed_counts(titles, self.dim)
+        idf = np.log((1 + self.docs) / (1 + self.df)) + 1
+        return _normalize(np.sign(counts) * np.log1p(np.abs(counts)) * idf)
+
+
+class OllamaEmbedder:
+    """Embeddings from the Ollama server's /api/embed, in batches."""
+
+    def __init__(self, post, url, model, batch=64):
+        self.post, self.url, self.model, self.batch = post, url, model, batch
+        self.name = "ollama-" + re.sub(r"\W+", "_", model)
+
+    def load(self, state):
+        pass
+
+    def state(self):
+        return {"model": self.model}
+
+    def stale(self, corpus_size):
+        return False
+
+    def fit(self, titles):
+        pass
+
+    def __call__(self, titles):
+        out = []
+        for k in range(0, len(titles), self.batch):
+            res = self.post(self.url, json={"model": self.model, "input": titles[k:k + self.batch]}, timeout=300)
+            if res.status_code != 200:
+                raise RuntimeError(f"Ollama embed failed: HTTP {res.status_code} {res.text[:200]}")
+            out.extend(res.json()["embeddings"])
+        return _normalize(out)
+
+
+def default_embedder(post=None):
+    """The configured embedder; `post` (default requests.post) reaches Ollama when TITLE_EMBED_MODEL is set."""
+    if not config.TITLE_EMBED_MODEL:
+        return HashedTfidf()
+    import requests
+    return OllamaEmbedder(post or requests.post, config.OLLAMA_EMBED_URL, config.TITLE_EMBED_MODEL)
+
+
+class TitleIndex:
+    def __init__(self, name, kinds, ids, titles, matrix, state, data=None):
+        self.name = name
+        self.kinds = list(kinds)
+        self.ids = list(ids)
+        self.titles = list(titles)
+        self.matrix = matrix
+        self.state = state
+        self.data = data  # matrix file of this generation once saved
+        self.rows = {(k, i): r for r, (k, i) in enumerate(zip(self.kinds, self.ids))}
+
+    @staticmethod
+    def _meta_path(name):
+        return config.SIMILARITY_DIR / f"{name}.json"
+
+    @classmethod
+    def open(cls, name):
+        """The saved index, its matrix memory-mapped read-only (None if never built)."""
+        try:
+            with open(cls._meta_path(name), encoding="utf-8") as f:
+                meta = json.load(f)
+        except FileNotFoundError:
+            return None
+        shape = (len(meta["ids"]), meta["dim"])
+        matrix = np.memmap(config.SIMILARITY_DIR / meta["data"], np.float32, "r", shape=shape) \
+            if shape[0] else np.zeros(shape, np.float32)
+        return cls(name, meta["kinds"], meta["ids"], meta["titles"], matrix, meta["state"], meta["data"])
+
+    def save(self):
+        """Write the matrix as a new generation, then atomically point the sidecar at it."""
+        config.SIMILARITY_DIR.mkdir(parents=True, exist_ok=True)
+        self.data = f"{self.name}-{time.time_ns()}-{os.getpid()}.f32"
+        tmp = config.SIMILARITY_DIR / (self.data + ".tmp")
+        np.ascontiguousarray(self.matrix, np.float32).tofile(tmp)
+        os.replace(tmp, config.SIMILARITY_DIR / self.data)
+        meta = {"dim": int(self.matrix.shape[1]), "data": self.data, "kinds": self.kinds, "ids": self.ids,
+                "titles": self.titles, "state": self.state}
+        path = self._meta_path(self.name)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(tmp, path)
+        for old in config.SIMILARITY_DIR.glob(f"{self.name}-*.f32"):
+            # Older generations may still be mapped by a running render: give them an hour
+            if old.name != self.data and time.time() - old.stat().st_mtime > 3600:
+                old.unlink()
+
+    def vectors(self, keys):
+        """Stored rows for [(kind, id)] (skipping unindexed keys) and the keys found."""
+        found = [key for key in keys if key in self.rows]
+        return np.asarray(self.matrix[[self.rows[key] for key in found]]), found
+
+    def nearest(self, queries, k, kind=None):
+        """Top-k rows by cosine for each query vector: [[(row, score)], ...], best first."""
+        candidates = np.arange(len(self.ids)) if kind is None else \
+            np.flatnonzero(np.asarray(self.kinds) == kind)
+        queries = np.asarray(queries, np.float32).reshape(-1, self.matrix.shape[1])
+        if not len(candidates) or not len(queries):
+            return [[] for _ in range(len(queries))]
+        scores = queries @ np.asarray(self.matrix[candidates]).T
+        k = min(k, len(candidates))
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        out = []
+        for q, cols in enumerate(top):
+            cols = cols[np.argsort(-scores[q, cols])]
+            out.append([(int(candidates[c]), float(scores[q, c])) for c in cols])
+        return out
+
+
+def corpus(session):
+    """[(kind, video id, title)] for every own and competitor video."""
+    from database import Video, CompetitorVideo
+    own = [(OWN, i, t or "") for i, t in session.query(Video.id, Video.title)]
+    return own + [(COMPETITOR, i, t or "") for i, t in session.query(CompetitorVideo.video_id, CompetitorVideo.title)]
+
+
+def refresh(items, embedder):
+    """Bring the embedder's index up to date with `items`, embedding only new or retitled videos."""
+    t0 = time.perf_counter()
+    old = TitleIndex.open(embedder.name)
+    if old:
+        embedder.load(old.state)
+    if old is None or embedder.stale(len(items)):
+        embedder.fit([t for _, _, t in items])
+        old = None
+    keep, todo = [], []
+    for kind, vid, title in items:
+        row = old.rows.get((kind, vid)) if old else None
+        if row is not None and old.titles[row] == title:
+            keep.append(row)
+        else:
+            todo.append((kind, vid, title))
+    if old and not todo and len(keep) == len(old.ids):
+        print(f"Similarity index '{embedder.name}': up to date ({len(keep)} titles)")
+        return old
+
+    added = embedder([t for _, _, t in todo]) if todo else None
+    parts = ([np.asarray(old.matrix[keep])] if keep else []) + ([added] if todo else [])
+    entries = [(old.kinds[r], old.ids[r], old.titles[r]) for r in keep] + todo
+    index = TitleIndex(embedder.name, [e[0] for e in entries], [e[1] for e in entries], [e[2] for e in entries],
+                       np.vstack(parts) if parts else np.zeros((0, 1), np.float32), embedder.state())
+    index.save()
+    print(f"Similarity index '{embedder.name}': {len(todo)} titles embedded, {len(keep)} reused "
+          f"in {time.perf_counter() - t0:.2f}s")
+    return index
+
+
+def open_index():
+    """The index of the configured embedder, or None if it was never built."""
+    name = OllamaEmbedder(None, None, config.TITLE_EMBED_MODEL).name if config.TITLE_EMBED_MODEL \
+        else HashedTfidf.name
+    return TitleIndex.open(name)
+
+
+def similar_competitor_videos(index, video_ids, k=None, min_cosine=None):
+    """{own video id: [(competitor video id, title, cosine)]} in one batched lookup."""
+    min_cosine = config.SIMILAR_MIN_COSINE if min_cosine is None else min_cosine
+    if index is None:
+        return {}
+    queries, found = index.vectors([(OWN, v) for v in video_ids])
+    hits = index.nearest(queries, k or config.SIMILAR_COMPETITOR_VIDEOS, kind=COMPETITOR)
+    return {vid: [(index.ids[r], index.titles[r], score) for r, score in rows if score >= min_cosine]
+            for (_, vid), rows in zip(found, hits)}
@@ -0,0 +1,296 @@
+"""Monthly Parquet snapshots of the daily tables for column-pruned analytics reads.
+
+Layout: data/snapshots/<table>/channel_id=<id>/month=<YYYY-MM>/part.parquet
+
+A sync refreshes only the month partitions inside its date window; readers
+memory-map the files and load just the columns and months they ask for.
+pyarrow is imported lazily and is optional: read() returns None without it
+(or before the first export) and callers fall back to SQL.
+
+Each exported channel has a manifest (data/snapshots/manifests/<id>.json)
+recording what refresh() exported and the date ranges written since. Every
+writer of a snapshot table calls invalidate() before it writes; a read whose
+window overlaps a dirty range goes to SQL, and the next refresh() re-exports
+the range. So a write that skipped the snapshots stage (--skip snapshots, a
+failed stage, an import) never leaves render or forecast reading stale
+history, and a fresh snapshot costs one small JSON read to confirm. Manual
+SQL edits are not tracked: `cli.py snapshot` re-exports everything.
+"""
+import os
+import json
+import datetime
+import threading
+import importlib.util
+
+import config
+
+# snapshot name -> (model attribute in database.py, exported columns, rows scoped via videos.channel_id)
+TABLES = {
+    "channel_daily": ("ChannelDaily", ["date", "views", "estimated_revenue", "watch_time_minutes",
+                                       "subscribers_gained", "likes", "dislikes", "comments", "shares",
+                                       "avg_view_duration_seconds"], False),
+    "video_daily": ("VideoDaily", ["video_id", "date", "views", "estimated_revenue", "watch_time_minutes",
+                                   "subscribers_gained", "likes", "dislikes", "comments", "shares"], True),
+    "traffic": ("TrafficSource", ["date", "source_type", "views", "watch_time_minutes"], False),
+    "geography": ("Geography", ["date", "country_code", "views", "watch_time_minutes"], False),
+}
+
+
+def available():
+    return config.USE_SNAPSHOTS and importlib.util.find_spec("pyarrow") is not None
+
+
+def months(start, end):
+    """First day of every month overlapping [start, end]."""
+    m = start.replace(day=1)
+    while m <= end:
+        yield m
+        m = (m + datetime.timedelta(days=32)).replace(day=1)
+
+
+def arrow_type(column):
+    """Arrow type for a SQLAlchemy column (also used by transfer.py exports)."""
+    import pyarrow as pa
+    from sqlalchemy import Date, DateTime, Float, Integer, Boolean, LargeBinary
+    if isinstance(column.type, Date):
+        return pa.date32()
+    if isinstance(column.type, DateTime):
+        return pa.timestamp("us")
+    if isinstance(column.type, Boolean):
+        return pa.bool_()
+    if isinstance(column.type, LargeBinary):
+        return pa.binary()
+    if isinstance(column.type, Integer):  # includes BigInteger
+        return pa.int64()
+    if isinstance(column.type, Float):
+        return pa.float64()
+    return pa.string()
+
+
+def _partition_path(name, channel_id, month):
+    return config.SNAPSHOT_DIR / name / f"channel_id={channel_id}" / f"month={month:%Y-%m}" / "part.parquet"
+
+
+def export_partition(conn, name, channel_id, month):
+    """Rewrite one channel/month partition from the DB; returns the row count."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    from sqlalchemy import select
+    import database
+
+    model_name, columns, via_video = TABLES[name]
+    model = getattr(database, model_name)
+    cols = [getattr(model, c) for c in columns]
+    next_month = (month + datetime.timedelta(days=32)).replace(day=1)
+    stmt = select(*cols).where(model.date >= month, model.date < next_month).order_by(model.date)
+    if via_video:
+        stmt = stmt.join(database.Video, database.Video.id == model.video_id).where(
+            database.Video.channel_id == channel_id)
+    else:
+        stmt = stmt.where(model.channel_id == channel_id)
+    rows = conn.execute(stmt).all()
+
+    path = _partition_path(name, channel_id, month)
+    if not rows:
+        if path.exists():
+            path.unlink()
+        return 0
+    schema = pa.schema([(c, arrow_type(model.__table__.c[c])) for c in columns])
+    table = pa.Table.from_arrays([pa.array(values, type=field.type) for values, field in zip(zip(*rows), schema)],
+                                 schema=schema)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = f"{path}.tmp"
+    pq.write_table(table, tmp, compression="zstd")
+    os.replace(tmp, path)  # readers never see a half-written partition
+    return len(rows)
+
+
+# Serializes manifest updates between a process's stage threads
+_MANIFEST_LOCK = threading.Lock()
+
+
+def _manifest_path(channel_id):
+    return config.SNAPSHOT_DIR / "manifests" / f"{channel_id}.json"
+
+
+def manifest(channel_id):
+    """{"tables": {name: {"rows", "first", "last"}}, "dirty": {name: [first, last]}}, or None if never exported."""
+    try:
+        with open(_manifest_path(channel_id)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _save_manifest(channel_id, data):
+    path = _manifest_path(channel_id)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp, path)
+
+
+def exported_channels():
+    """Channel IDs that have a snapshot manifest."""
+    return sorted(p.stem for p in (config.SNAPSHOT_DIR / "manifests").glob("*.json"))
+
+
+def invalidate(channel_id, name, first, last):
+    """Mark days [first, last] of a channel's snapshot table as changed in the DB.
+
+    Call before writing. first=None means from the snapshot's first day.
+    No-op for a channel or table that was never exported.
+    """
+    with _MANIFEST_LOCK:
+        data = manifest(channel_id)
+        if data is None or name not in data["tables"]:
+            return
+        exported = data["tables"][name]["first"]
+        if first is None:
+            if exported is None:
+                return  # nothing exported that could go stale
+            first = datetime.date.fromisoformat(exported)
+        dirty = data["dirty"].get(name)
+        if dirty:
+            first = min(first, datetime.date.fromisoformat(dirty[0]))
+            last = max(last, datetime.date.fromisoformat(dirty[1]))
+        data["dirty"][name] = [first.isoformat(), last.isoformat()]
+        _save_manifest(channel_id, data)
+
+
+def _summary(name, channel_id):
+    """Row count and first/last day of a channel's exported partitions (footers and two date columns)."""
+    import pyarrow.parquet as pq
+    import pyarrow.compute as pc
+    parts = sorted((config.SNAPSHOT_DIR / name / f"channel_id={channel_id}").glob("month=*/part.parquet"))
+    if not parts:
+        return {"rows": 0, "first": None, "last": None}
+    first = pc.min(pq.read_table(parts[0], columns=["date"])["date"]).as_py()
+    last = pc.max(pq.read_table(parts[-1], columns=["date"])["date"]).as_py()
+    return {"rows": sum(pq.read_metadata(p).num_rows for p in parts),
+            "first": first.isoformat(), "last": last.isoformat()}
+
+
+def refresh(channel_id, start, end, tables=None):
+    """Re-export the partitions of `channel_id` for every month in [start, end] and record them.
+
+    Dirty ranges are re-exported too, and a table the manifest does not
+    cover yet is exported in full, so afterwards the manifest vouches for
+    every partition.
+    """
+    from database import engine
+
+    counts = {}
+    # Held throughout, so a write marked dirty mid-export is not cleared by this refresh
+    with _MANIFEST_LOCK:
+        data = manifest(channel_id) or {"tables": {}, "dirty": {}}
+        span = None
+        with engine.connect() as conn:
+            for name in tables or TABLES:
+                lo, hi = start, end
+                dirty = data["dirty"].pop(name, None)
+                if dirty:
+                    lo = min(lo, datetime.date.fromisoformat(dirty[0]))
+                    hi = max(hi, datetime.date.fromisoformat(dirty[1]))
+                if name not in data["tables"]:
+                    span = span or data_range(channel_id) or (start, end)
+                    lo, hi = min(lo, span[0]), max(hi, span[1])
+                counts[name] = 0
+                for month in months(lo, hi):
+                    counts[name] += export_partition(conn, name, channel_id, month)
+                data["tables"][name] = _summary(name, channel_id)
+        _save_manifest(channel_id, data)
+    return counts
+
+
+def data_range(channel_id):
+    """(first, last) date stored for a channel across the snapshot tables, or None."""
+    from sqlalchemy import func
+    from database import get_session, ChannelDaily, VideoDaily, Video, TrafficSource
+    session = get_session()
+    try:
+        bounds = [
+            session.query(func.min(ChannelDaily.date), func.max(ChannelDaily.date)).filter(
+                ChannelDaily.channel_id == channel_id).one(),
+            session.query(func.min(VideoDaily.date), func.max(VideoDaily.date)).join(
+                Video, Video.id == VideoDaily.video_id).filter(Video.channel_id == channel_id).one(),
+            session.query(func.min(TrafficSource.date), func.max(TrafficSource.date)).filter(
+                TrafficSource.channel_id == channel_id).one(),
+        ]
+    finally:
+        session.close()
+    firsts = [b[0] for b in bounds if b[0]]
+    lasts = [b[1] for b in bounds if b[1]]
+    return (min(firsts), max(lasts)) if firsts else None
+
+
+def rebuild(channel_id):
+    """Export every month a channel has data for (first run, or after manual DB edits)."""
+    span = data_range(channel_id)
+    if not span:
+        return {}
+    with _MANIFEST_LOCK:
+        try:
+            os.remove(_manifest_path(channel_id))
+        except FileNotFoundError:
+            pass
+    return refresh(channel_id, *span)
+
+
+def _current(name, channel_id, start, end):
+    """True when the manifest vouches for a channel's partitions over [start, end]."""
+    data = manifest(channel_id)
+    if data is None or name not in data["tables"]:
+        return False
+    dirty = data["dirty"].get(name)
+    if not dirty:
+        return True
+    return bool((end and end < datetime.date.fromisoformat(dirty[0])) or
+                (start and start > datetime.date.fromisoformat(dirty[1])))
+
+
+def read(name, columns=None, channel_id=None, start=None, end=None):
+    """Load a snapshot as a DataFrame, pruned to `columns`, one channel and a date range.
+
+    Returns None when snapshots are unavailable so the caller can query SQL instead.
+    """
+    table = read_table(name, columns, channel_id, start, end)
+    return None if table is None else table.to_pandas()
+
+
+def read_table(name, columns=None, channel_id=None, start=None, end=None):
+    """read() without the pandas conversion: the pyarrow Table sorted by date (or None)."""
+    root = config.SNAPSHOT_DIR / name
+    if not available() or not root.exists():
+        return None
+    if channel_id and not (root / f"channel_id={channel_id}").exists():
+        return None  # channel not exported yet
+    if channel_id and not _current(name, channel_id, start, end):
+        print(f"Snapshot {name}/{channel_id} is behind the DB (written outside the snapshots stage); "
+              f"reading SQL. `cli.py snapshot --channel {channel_id}` re-exports it.")
+        return None
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    from pyarrow import fs
+
+    partitioning = ds.partitioning(pa.schema([("channel_id", pa.string()), ("month", pa.string())]),
+                                   flavor="hive")
+    dataset = ds.dataset(str(root), format="parquet", partitioning=partitioning,
+                         filesystem=fs.LocalFileSystem(use_mmap=True))
+    filters = []
+    if channel_id:
+        filters.append(ds.field("channel_id") == channel_id)
+    if start:
+        filters.append(ds.field("month") >= f"{start:%Y-%m}")  # prunes whole partitions
+        filters.append(ds.field("date") >= pa.scalar(start, pa.date32()))
+    if end:
+        filters.append(ds.field("month") <= f"{end:%Y-%m}")
+        filters.append(ds.field("date") <= pa.scalar(end, pa.date32()))
+    expr = None
+    for f in filters:
+        expr = f if expr is None else expr & f
+    table = dataset.to_table(columns=columns, filter=expr)
+    if "date" in table.column_names:
+        table = table.sort_by("date")
+    return table
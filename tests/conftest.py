@@ -0,0 +1,10 @@
+import os
+import sys
+import tempfile
+
+# The modules live flat at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Keep the tests away from the real data: a throwaway output root (and SQLite DB) unless
+# DATABASE_URL points at a test database, e.g. a local PostgreSQL
+os.environ.setdefault("YOUTUBE_OUTPUT_ROOT", tempfile.mkdtemp(prefix="yt-tests-"))
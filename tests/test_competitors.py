@@ -0,0 +1,67 @@
+"""Competitor counter history: change-only deltas (competitors.record/history/growth)."""
+import pytest
+
+import database
+import competitors
+from competitors import CHANNEL, VIDEO, record, history, growth
+
+DAY = 86400
+T0 = 1_700_000_000
+
+
+@pytest.fixture
+def session():
+    database.Base.metadata.create_all(database.engine)
+    session = database.get_session()
+    try:
+        yield session
+    finally:
+        session.rollback()
+        session.close()
+
+
+def test_unchanged_polls_write_nothing(session):
+    obs = [("test-comp-a", {"subscribers": 100, "views": 5000, "videos": 10})]
+    assert record(session, CHANNEL, obs, T0) == 3
+    assert record(session, CHANNEL, obs, T0 + DAY) == 0
+    assert record(session, CHANNEL, [("test-comp-a", {"subscribers": 100, "views": 5200, "videos": 10})],
+                  T0 + 2 * DAY) == 1
+    assert history(session, CHANNEL, "test-comp-a", "subscribers") == [(T0, 100)]
+
+
+def test_history_decodes_deltas_to_values(session):
+    for i, views in enumerate([50, 80, 80, 75, 120]):  # a drop (e.g. spam removal) is a negative delta
+        record(session, VIDEO, [("test-comp-v", {"views": views})], T0 + i * DAY)
+    assert history(session, VIDEO, "test-comp-v", "views") == [
+        (T0, 50), (T0 + DAY, 80), (T0 + 3 * DAY, 75), (T0 + 4 * DAY, 120)]
+    assert history(session, VIDEO, "test-comp-v", "likes") == []
+
+
+def test_growth_over_a_range(session):
+    start, end = T0 + 10 * DAY, T0 + 20 * DAY
+    # Seen before the range, changes inside and after it
+    record(session, VIDEO, [("test-comp-old", {"views": 100})], T0)
+    record(session, VIDEO, [("test-comp-old", {"views": 150})], T0 + 15 * DAY)
+    record(session, VIDEO, [("test-comp-old", {"views": 400})], T0 + 25 * DAY)
+    # First seen mid-range: measured from its first observation, not from zero
+    record(session, VIDEO, [("test-comp-new", {"views": 1000})], T0 + 16 * DAY)
+    record(session, VIDEO, [("test-comp-new", {"views": 1040})], T0 + 18 * DAY)
+    # First seen after the range
+    record(session, VIDEO, [("test-comp-late", {"views": 7})], T0 + 22 * DAY)
+
+    out = growth(session, VIDEO, start, end)
+    assert out["test-comp-old"]["views"] == (100, 150, 50, 50 / 10)
+    assert out["test-comp-new"]["views"] == (1000, 1040, 40, 40 / 4)
+    assert "test-comp-late" not in out
+
+
+def test_growth_per_day_floor(session):
+    # Two polls an hour apart inside the range: no extrapolating to a daily rate
+    record(session, CHANNEL, [("test-comp-b", {"views": 10})], T0 + 3600)
+    record(session, CHANNEL, [("test-comp-b", {"views": 30})], T0 + 7200)
+    assert growth(session, CHANNEL, T0, T0 + 7200)["test-comp-b"]["views"] == (10, 30, 20, 20.0)
+
+
+def test_metric_codes_are_distinct():
+    for kind in (CHANNEL, VIDEO):
+        assert len(set(competitors.METRICS[kind].values())) == len(competitors.METRICS[kind])
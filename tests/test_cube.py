@@ -0,0 +1,102 @@
+"""Breakdown cube: window() over the running sums against a brute-force SUM/AVG of the cells."""
+import datetime
+import random
+
+import pytest
+
+import cube
+import database
+import fetch_data
+from database import Base, Channel, TrafficSource, DemographicsAge, DemographicsGender
+
+CHANNEL = "UCtest-cube"
+FIRST = datetime.date(2024, 3, 1)
+DAYS = 60
+MEMBERS = {"traffic": ["SEARCH", "SUGGESTED", "EXTERNAL"], "age": ["age18-24", "age25-34", "age35-44"]}
+
+
+@pytest.fixture
+def session():
+    Base.metadata.create_all(database.engine)
+    session = database.get_session()
+    session.add(Channel(id=CHANNEL, name="test"))
+    session.flush()
+    try:
+        yield session
+    finally:
+        session.rollback()
+        session.close()
+
+
+def _cells(rng, dimension):
+    """{(day, member): (views, watch_time, share)}; members skip some days."""
+    return {(FIRST + datetime.timedelta(days=d), m): (rng.randint(0, 500), rng.randint(0, 4000) / 4,
+                                                     rng.randint(0, 400) / 8)
+            for d in range(DAYS) for m in MEMBERS[dimension] if rng.random() < 0.8}
+
+
+def brute_force(cells, dimension, start, end):
+    """Same shape as cube.window(): SUM for additive dimensions, AVG over the cells for the others."""
+    groups = {}
+    for (day, member), values in cells.items():
+        if start <= day <= end:
+            groups.setdefault(member, []).append(values)
+    out = {}
+    for member, rows in groups.items():
+        sums = [sum(col) for col in zip(*rows)]
+        out[member] = sums if cube.ADDITIVE[dimension] else [s / len(rows) for s in sums]
+    return out
+
+
+def assert_windows_match(session, cells, dimension, rng, ranges=40):
+    for _ in range(ranges):
+        a, b = sorted(rng.randrange(-3, DAYS + 3) for _ in range(2))
+        start, end = FIRST + datetime.timedelta(days=a), FIRST + datetime.timedelta(days=b)
+        expected = brute_force(cells, dimension, start, end)
+        got = {m: (v, w, s) for m, v, w, s in cube.window(session, CHANNEL, dimension, start, end)}
+        assert got.keys() == expected.keys(), (start, end)
+        for member, values in expected.items():
+            assert got[member] == pytest.approx(values), (start, end, member)
+
+
+@pytest.mark.parametrize("dimension", ["traffic", "age"])
+def test_window_after_out_of_order_records(session, dimension):
+    rng = random.Random(dimension)
+    cells = _cells(rng, dimension)
+    # Chunks land in random order, then some days are re-synced with new values
+    chunks = [[k for k in cells if (k[0] - FIRST).days // 10 == c] for c in range(DAYS // 10)]
+    rng.shuffle(chunks)
+    for chunk in chunks:
+        cube.record(session, CHANNEL, dimension, [(day, m, *cells[day, m]) for day, m in chunk])
+    resync = rng.sample(sorted(cells), 25)
+    for key in resync:
+        cells[key] = (rng.randint(0, 500), rng.randint(0, 4000) / 4, rng.randint(0, 400) / 8)
+    cube.record(session, CHANNEL, dimension, [(day, m, *cells[day, m]) for day, m in resync])
+    assert_windows_match(session, cells, dimension, rng)
+
+
+def test_window_after_rebuild(session):
+    rng = random.Random("rebuild")
+    traffic, age = _cells(rng, "traffic"), _cells(rng, "age")
+    session.add_all([TrafficSource(channel_id=CHANNEL, date=day, source_type=m, views=v, watch_time_minutes=w)
+                     for (day, m), (v, w, _) in traffic.items()])
+    session.add_all([DemographicsAge(channel_id=CHANNEL, date=day, age_group=m, views=v, watch_time_minutes=w,
+                                     viewer_percentage=s) for (day, m), (v, w, s) in age.items()])
+    session.flush()
+    cube.rebuild(session, CHANNEL)
+    # Traffic has no share: the cube stores 0
+    assert_windows_match(session, {k: (v, w, 0.0) for k, (v, w, _) in traffic.items()}, "traffic", rng)
+    assert_windows_match(session, age, "age", rng)
+
+
+def test_gender_share_same_live_and_rebuilt(session):
+    day = FIRST
+    res = {"columnHeaders": [{"name": n} for n in ("gender", "viewerPercentage", "views", "estimatedMinutesWatched")],
+           "rows": [["female", 41.5, 300, 900.0], ["male", 58.5, 420, 1300.0]]}
+    fetch_data.upsert_demographics_gender(session, CHANNEL, res, day)
+    live = cube.window(session, CHANNEL, "gender", day, day)
+    assert {m: s for m, _, _, s in live} == {"female": 41.5, "male": 58.5}
+    cube.rebuild(session, CHANNEL)
+    assert cube.window(session, CHANNEL, "gender", day, day) == live
+    stored = {g.gender: g.viewer_percentage for g in session.query(DemographicsGender).filter_by(channel_id=CHANNEL)}
+    assert stored == {"female": 41.5, "male": 58.5}
@@ -0,0 +1,12 @@
+"""Startup-time budgets of the cli subcommands (same check as `cli.py verify --import-budget`)."""
+import pytest
+
+import cli
+
+
+@pytest.mark.parametrize("command", list(cli.IMPORT_BUDGETS))
+def test_import_budget(command):
+    budget, modules, forbidden = cli.IMPORT_BUDGETS[command]
+    elapsed, loaded = cli.probe_imports(modules, forbidden)
+    assert not loaded, f"{command} imports {', '.join(loaded)} at startup"
+    assert elapsed <= budget, f"{command} takes {elapsed:.2f}s to import (budget {budget}s)"
@@ -0,0 +1,45 @@
+"""Forecast bands: coverage of the nominal INTERVAL_LEVEL band on a held-out tail."""
+import numpy as np
+import pandas as pd
+import pytest
+
+import prediction
+
+SEEDS = range(6)
+
+
+def series(seed, days=500):
+    """Trend + random-walk level + weekly season + noise, like a channel's daily views."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(days)
+    level = 1000 + 0.5 * t + np.cumsum(rng.normal(0, 8, days))
+    views = level + 80 * np.sin(2 * np.pi * t / 7) + rng.normal(0, 40, days)
+    return pd.DataFrame({"date": pd.date_range("2024-01-01", periods=days), "views": views})
+
+
+def coverage(forecast, band, actual):
+    lower, upper = np.minimum(band[0], forecast), np.maximum(band[1], forecast)  # as _store() writes it
+    return np.mean((actual >= lower) & (actual <= upper))
+
+
+def held_out(model):
+    covered = []
+    for seed in SEEDS:
+        df = series(seed)
+        train, test = df.iloc[:-prediction.DAYS_TO_PREDICT], df.iloc[-prediction.DAYS_TO_PREDICT:]
+        forecast, band = model(train)
+        assert band is not None
+        covered.append(coverage(np.asarray(forecast), band, test["views"].to_numpy()))
+    return np.mean(covered)
+
+
+def test_moving_average_band_coverage():
+    level = held_out(lambda df: prediction.moving_average_forecast(df["views"], 7, prediction.DAYS_TO_PREDICT))
+    assert 0.6 <= level <= 0.97
+
+
+def test_xgboost_band_coverage():
+    pytest.importorskip("xgboost")
+    prediction.MODEL_CACHE.clear()
+    level = held_out(lambda df: prediction.xgboost_forecast(df, "views", prediction.DAYS_TO_PREDICT))
+    assert 0.6 <= level <= 0.97, f"{prediction.INTERVAL_LEVEL:.0%} XGBoost band covered {level:.0%} of held-out days"
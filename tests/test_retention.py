@@ -0,0 +1,112 @@
+"""Tiered retention of video_daily_stats (retention.compact / cutoffs / video_totals / video_series).
+
+compact() commits on its own connection, so these tests write committed rows
+for two test videos and delete them afterwards instead of rolling back.
+"""
+import datetime
+
+import pytest
+
+import config
+import database
+import retention
+from database import Base, Channel, Video, VideoDaily, VideoRollup
+
+CHANNEL = "UCtest-retention"
+VIDEOS = ["test-retention-a", "test-retention-b"]
+FIRST = datetime.date(2022, 11, 3)
+START = FIRST.replace(day=1)  # compacted periods count when they start inside a range
+TODAY = datetime.date(2026, 1, 15)
+ONE_DAY = datetime.timedelta(days=1)
+
+
+def _row(video_id, i):
+    # Revenue and watch time in binary fractions, so float sums are exact in any order
+    return {"video_id": video_id, "date": FIRST + i * ONE_DAY, "views": i % 97 + 1, "likes": i % 5,
+            "dislikes": i % 2, "comments": i % 3, "shares": i % 7, "estimated_revenue": (i % 13) * 0.25,
+            "watch_time_minutes": (i % 11) * 0.5, "subscribers_gained": i % 4}
+
+
+@pytest.fixture
+def session():
+    Base.metadata.create_all(database.engine)
+    session = database.get_session()
+    session.add(Channel(id=CHANNEL, name="test"))
+    session.add_all([Video(id=v, channel_id=CHANNEL, title="test") for v in VIDEOS])
+    days = (TODAY - FIRST).days
+    # Video b starts later and skips days, so its weeks and months are partial
+    rows = [_row(VIDEOS[0], i) for i in range(days)] + [_row(VIDEOS[1], i) for i in range(200, days, 3)]
+    session.execute(VideoDaily.__table__.insert(), rows)
+    session.commit()
+    try:
+        yield session
+    finally:
+        session.rollback()
+        for model, column in ((VideoDaily, VideoDaily.video_id), (VideoRollup, VideoRollup.video_id),
+                              (Video, Video.id)):
+            session.query(model).filter(column.in_(VIDEOS)).delete(synchronize_session=False)
+        session.query(Channel).filter_by(id=CHANNEL).delete()
+        session.commit()
+        session.close()
+
+
+def _totals(session):
+    session.expire_all()
+    totals = retention.video_totals(session, START, TODAY, channel_id=CHANNEL)
+    return {v: totals[v] for v in VIDEOS}
+
+
+def test_compact_keeps_totals_and_is_idempotent(session):
+    before = _totals(session)
+    assert retention.compact(TODAY) > 0
+    assert _totals(session) == before
+    assert retention.compact(TODAY) == 0
+    assert _totals(session) == before
+    daily_cutoff, _ = retention.cutoffs(TODAY)
+    assert session.query(VideoDaily).filter(VideoDaily.video_id.in_(VIDEOS),
+                                            VideoDaily.date < daily_cutoff).count() == 0
+
+
+def test_weeks_never_cross_a_month(session):
+    retention.compact(TODAY)
+    weeks = session.query(VideoRollup).filter(VideoRollup.video_id.in_(VIDEOS), VideoRollup.grain == "week").all()
+    assert weeks
+    for w in weeks:
+        assert w.period_start.weekday() == 0 or w.period_start.day == 1
+        assert (w.period_start.year, w.period_start.month) == (w.period_end.year, w.period_end.month)
+        assert (w.period_end - w.period_start).days < 7
+    months = session.query(VideoRollup).filter(VideoRollup.video_id.in_(VIDEOS), VideoRollup.grain == "month").all()
+    assert months and all(m.period_start.day == 1 for m in months)
+
+
+@pytest.mark.parametrize("today", [TODAY + i * ONE_DAY for i in range(0, 400, 37)])
+def test_cutoffs_alignment(today):
+    daily, weekly = retention.cutoffs(today)
+    target = today - datetime.timedelta(days=config.VIDEO_DAILY_RETENTION_DAYS)
+    # Daily rows start on a week or month start, keeping at least the retention window
+    assert daily.weekday() == 0 or daily.day == 1
+    assert target - datetime.timedelta(days=6) <= daily <= target
+    # Weeks fold into whole months, and never past the start of the daily tier's month
+    assert weekly.day == 1
+    assert weekly <= daily.replace(day=1)
+    assert weekly <= today - datetime.timedelta(days=config.VIDEO_WEEKLY_RETENTION_DAYS)
+
+
+def test_series_and_totals_stitch_the_tiers(session):
+    retention.compact(TODAY)
+    series = retention.video_series(session, VIDEOS[0], START, TODAY)
+    assert [g for _, _, g, _ in series] == sorted((g for _, _, g, _ in series), key=["month", "week", "day"].index)
+    # Contiguous periods from the first day to the last, each counted once
+    assert series[0][:3] == (START, START.replace(month=12) - ONE_DAY, "month")
+    for (_, end, _, _), (start, _, _, _) in zip(series, series[1:]):
+        assert start == end + ONE_DAY
+    assert series[-1][1] == TODAY - ONE_DAY
+    assert sum(values["views"] for _, _, _, values in series) == \
+        sum(_row(VIDEOS[0], i)["views"] for i in range((TODAY - FIRST).days))
+
+    # Ranges starting on a period boundary of the monthly, weekly or daily tier are exact
+    daily_cutoff, weekly_cutoff = retention.cutoffs(TODAY)
+    for start in (datetime.date(2023, 6, 1), weekly_cutoff, daily_cutoff, TODAY - 3 * ONE_DAY):
+        expected = sum(_row(VIDEOS[0], i)["views"] for i in range((TODAY - FIRST).days)
+                       if FIRST + i * ONE_DAY >= start)
+        assert retention.video_totals(session, start, TODAY)[VIDEOS[0]]["views"] == expected, start
@@ -0,0 +1,116 @@
+"""Dialect-aware writes (database.upsert / bulk_load_video_daily).
+
+Runs against DATABASE_URL when it is set (e.g. a local PostgreSQL), otherwise
+against a throwaway SQLite file. Every test rolls back, so a shared database
+is left as it was. The COPY path only exists on PostgreSQL.
+"""
+import datetime
+
+import pytest
+
+import config
+import database
+from database import (
+    upsert, bulk_load_video_daily, Base, Channel, ChannelDaily, Video, VideoDaily, AnomalyState,
+    ForecastTuning, Thumbnail
+)
+
+CHANNEL = "UCtest-upsert"
+VIDEO = "test-upsert-video"
+DAY = datetime.date(2024, 1, 1)
+
+requires_postgres = pytest.mark.skipif(database.DB_URL.get_backend_name() != "postgresql",
+                                       reason="COPY path needs DATABASE_URL pointing at PostgreSQL")
+
+
+@pytest.fixture
+def session():
+    Base.metadata.create_all(database.engine)
+    session = database.get_session()
+    session.add(Channel(id=CHANNEL, name="test"))
+    session.add(Video(id=VIDEO, channel_id=CHANNEL, title="test"))
+    session.flush()
+    try:
+        yield session
+    finally:
+        session.rollback()
+        session.close()
+
+
+# (model, unique key, row, changed non-key values)
+CASES = [
+    (ChannelDaily, ["channel_id", "date"], {"channel_id": CHANNEL, "date": DAY, "views": 10}, {"views": 12}),
+    (VideoDaily, ["video_id", "date"], {"video_id": VIDEO, "date": DAY, "views": 5, "likes": 1},
+     {"views": 7, "likes": 2}),
+    (Video, ["id"], {"id": "test-upsert-other", "channel_id": CHANNEL, "title": "old"}, {"title": "new"}),
+    (AnomalyState, ["kind", "entity_id", "metric"],
+     {"kind": "video", "entity_id": VIDEO, "metric": "views", "channel_id": CHANNEL, "last_day": DAY,
+      "n": 1, "level": 5.0}, {"n": 2, "level": 6.0}),
+    (ForecastTuning, ["channel_id", "metric"],
+     {"channel_id": CHANNEL, "metric": "view_count", "days": 100, "params": "{}"}, {"days": 130}),
+    (Thumbnail, ["url"], {"url": "https://example.invalid/t.jpg", "digest": "a"}, {"digest": "b"}),
+]
+
+
+def _stored(session, model, keys, row):
+    return session.query(model).filter_by(**{k: row[k] for k in keys}).all()
+
+
+@pytest.mark.parametrize("model, keys, row, changes", CASES, ids=[c[0].__tablename__ for c in CASES])
+def test_upsert_inserts_then_updates(session, model, keys, row, changes):
+    upsert(session, model, [row], keys)
+    (stored,) = _stored(session, model, keys, row)
+    assert all(getattr(stored, c) == v for c, v in row.items())
+
+    upsert(session, model, [dict(row, **changes)], keys)
+    session.expire_all()
+    (stored,) = _stored(session, model, keys, row)
+    assert all(getattr(stored, c) == v for c, v in dict(row, **changes).items())
+
+
+def test_upsert_many_rows_in_one_call(session):
+    rows = [{"channel_id": CHANNEL, "date": DAY + datetime.timedelta(days=i), "views": i} for i in range(5)]
+    upsert(session, ChannelDaily, rows, ["channel_id", "date"])
+    upsert(session, ChannelDaily, [dict(r, views=r["views"] * 10) for r in rows[2:]], ["channel_id", "date"])
+    session.expire_all()
+    views = [v for (v,) in session.query(ChannelDaily.views).filter_by(channel_id=CHANNEL).order_by(ChannelDaily.date)]
+    assert views == [0, 1, 20, 30, 40]
+
+
+def _video_rows(n, views):
+    return [{"video_id": VIDEO, "date": DAY + datetime.timedelta(days=i), "views": views + i, "likes": i,
+             "estimated_revenue": i / 4} for i in range(n)]
+
+
+def _video_views(session):
+    session.expire_all()
+    return [v for (v,) in session.query(VideoDaily.views).filter_by(video_id=VIDEO).order_by(VideoDaily.date)]
+
+
+def test_bulk_load_video_daily_merges(session):
+    bulk_load_video_daily(session, _video_rows(5, 100))
+    assert _video_views(session) == [100, 101, 102, 103, 104]
+    bulk_load_video_daily(session, _video_rows(7, 200))
+    assert _video_views(session) == [200, 201, 202, 203, 204, 205, 206]
+
+
+@requires_postgres
+def test_bulk_load_video_daily_copy_batches(session, monkeypatch):
+    # Several COPY + merge batches through the same temp table within one transaction
+    monkeypatch.setattr(config, "COPY_BATCH_ROWS", 2)
+    bulk_load_video_daily(session, _video_rows(5, 100))
+    bulk_load_video_daily(session, _video_rows(5, 300))
+    assert _video_views(session) == [300, 301, 302, 303, 304]
+    revenue = [r for (r,) in session.query(VideoDaily.estimated_revenue).filter_by(video_id=VIDEO)
+               .order_by(VideoDaily.date)]
+    assert revenue == [0.0, 0.25, 0.5, 0.75, 1.0]
+
+
+@requires_postgres
+def test_bulk_load_video_daily_column_subsets(session):
+    # The COPY temp table lives on the pooled connection: a later call may bring columns the first lacked
+    bulk_load_video_daily(session, [{"video_id": VIDEO, "date": DAY, "views": 1}])
+    bulk_load_video_daily(session, [{"video_id": VIDEO, "date": DAY, "views": 2, "likes": 3, "shares": 4}])
+    session.expire_all()
+    row = session.query(VideoDaily).filter_by(video_id=VIDEO, date=DAY).one()
+    assert (row.views, row.likes, row.shares) == (2, 3, 4)
@@ -0,0 +1,168 @@
+"""Content-addressed thumbnail cache for the dashboard.
+
+Each video thumbnail URL is downloaded once (again only when the URL changes),
+stored under config.THUMBNAIL_DIR by the sha256 of its bytes, so identical
+images are kept once, and re-encoded at the dashboard card width as AVIF/WebP.
+The `thumbnails` table maps URL -> local paths for the JSON. Pillow is optional:
+without it only the original files are cached.
+"""
+import io
+import os
+import json
+import time
+import hashlib
+import datetime
+import threading
+import importlib.util
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor
+
+import config
+from database import upsert, Thumbnail, Video
+
+SIGNATURES = [(b"\xff\xd8\xff", "jpg"), (b"\x89PNG", "png"), (b"RIFF", "webp"), (b"GIF8", "gif")]
+
+
+def _sniff(content):
+    return next((ext for magic, ext in SIGNATURES if content.startswith(magic)), "jpg")
+
+
+def _public(path):
+    return path.relative_to(config.PUBLIC_DIR).as_posix()
+
+
+def _write_once(path, write):
+    """Create `path` via write(tmp_path) unless it already exists; returns bytes written."""
+    if path.exists():
+        return 0
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"  # duplicates may be stored concurrently
+    write(tmp)
+    os.replace(tmp, path)
+    return os.path.getsize(path)
+
+
+def _formats():
+    """Variant formats this Pillow build can encode (none without Pillow)."""
+    if importlib.util.find_spec("PIL") is None:
+        return {}
+    from PIL import features
+    return {fmt: q for fmt, q in config.THUMBNAIL_FORMATS.items() if features.check(fmt)}
+
+
+def store(content, formats):
+    """Write the original and its card-size variants once per content hash.
+
+    Returns (digest, width, height, {format: public path}, bytes written).
+    """
+    digest = hashlib.sha256(content).hexdigest()
+    stem = digest[:16]
+    ext = _sniff(content)
+    original = config.THUMBNAIL_DIR / f"{stem}.{ext}"
+
+    def write_original(tmp):
+        with open(tmp, 'wb') as f:
+            f.write(content)
+    written = _write_once(original, write_original)
+    variants = {ext: _public(original)}
+    if not formats:
+        return digest, None, None, variants, written
+
+    from PIL import Image
+    img = Image.open(io.BytesIO(content))
+    width, height = img.size
+    target = min(config.THUMBNAIL_CARD_WIDTH, width)
+    resized = None
+    for fmt, quality in formats.items():
+        path = config.THUMBNAIL_DIR / f"{stem}-{target}.{fmt}"
+        if not path.exists() and resized is None:
+            resized = img.convert("RGB")
+            if target < width:
+                resized = resized.resize((target, max(1, round(height * target / width))), Image.LANCZOS)
+        written += _write_once(path, lambda tmp: resized.save(tmp, format=fmt.upper(), quality=quality))
+        variants[fmt] = _public(path)
+    return digest, width, height, variants, written
+
+
+def sync(session, get, workers=None, lock=None):
+    """Download thumbnails whose URL isn't cached yet, in parallel, and record them.
+
+    `get(url, timeout=...)` returns an object with status_code and content
+    (requests.get, or a replay/synthetic backend). Failed downloads stay
+    uncached and are retried next run. DB work happens under `lock`, the
+    downloads outside it. Returns the number of URLs cached.
+    """
+    lock = lock or nullcontext()
+    with lock:
+        missing = [url for (url,) in session.query(Video.thumbnail_url).outerjoin(
+            Thumbnail, Thumbnail.url == Video.thumbnail_url).filter(
+            Video.thumbnail_url.isnot(None), Video.thumbnail_url != '', Thumbnail.url.is_(None)).distinct()]
+        prune(session)
+    if not missing:
+        print("Thumbnails: cache up to date.")
+        return 0
+
+    formats = _formats()
+    if not formats:
+        print("Thumbnails: Pillow not installed (or without AVIF/WebP); caching originals only.")
+
+    def fetch(url):
+        try:
+            res = get(url, timeout=15)
+            if res.status_code != 200:
+                return url, None, f"HTTP {res.status_code}"
+            return url, store(res.content, formats), None
+        except Exception as e:
+            return url, None, str(e)
+
+    t0 = time.perf_counter()
+    rows, failures, downloaded, written = [], 0, 0, 0
+    with ThreadPoolExecutor(max_workers=workers or config.THUMBNAIL_WORKERS,
+                            thread_name_prefix="thumb") as pool:
+        for url, stored, error in pool.map(fetch, missing):
+            if error:
+                failures += 1
+                if failures <= 3:
+                    print(f"  thumbnail {url}: {error}")
+                continue
+            digest, width, height, variants, nbytes = stored
+            downloaded += 1
+            written += nbytes
+            rows.append({"url": url, "digest": digest, "width": width, "height": height,
+                         "variants": json.dumps(variants), "fetched_at": datetime.datetime.utcnow()})
+    with lock:
+        upsert(session, Thumbnail, rows, ['url'])
+        session.commit()
+    print(f"Thumbnails: {downloaded}/{len(missing)} cached ({failures} failed), "
+          f"{written / 1024:.0f} KiB written in {time.perf_counter() - t0:.2f}s")
+    return downloaded
+
+
+def prune(session):
+    """Forget URLs no video uses any more and delete files no remaining URL points to."""
+    stale = session.query(Thumbnail).filter(~Thumbnail.url.in_(
+        session.query(Video.thumbnail_url).filter(Video.thumbnail_url.isnot(None)))).all()
+    if not stale:
+        return
+    for t in stale:
+        session.delete(t)
+    session.flush()
+    keep = {d[:16] for (d,) in session.query(Thumbnail.digest).distinct()}
+    removed = 0
+    for path in config.THUMBNAIL_DIR.glob("*.*"):
+        # Skip recent files: another channel's sync may not have recorded its row yet
+        if path.name[:16] not in keep and time.time() - path.stat().st_mtime > 3600:
+            path.unlink()
+            removed += 1
+    session.commit()
+    print(f"Thumbnails: dropped {len(stale)} stale URLs, {removed} files")
+
+
+def lookup(session, urls):
+    """{url: {format: public path}} for the cached ones among `urls`."""
+    urls = [u for u in set(urls) if u]
+    out = {}
+    for k in range(0, len(urls), 500):
+        for t in session.query(Thumbnail).filter(Thumbnail.url.in_(urls[k:k + 500])):
+            out[t.url] = json.loads(t.variants)
+    return out
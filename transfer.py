@@ -0,0 +1,269 @@
+"""Streaming bulk import/export of the daily tables (CSV or Parquet).
+
+Import reads a file in config.TRANSFER_CHUNK_ROWS chunks and upserts each
+chunk into channel_daily_stats or video_daily_stats (video rows through
+bulk_load_video_daily, i.e. COPY on PostgreSQL), committing per chunk, so
+memory stays at one chunk whatever the file size. Column names may be the
+DB's or the Analytics API's (`day`, `estimatedMinutesWatched`, ... as in the
+old data/youtube_stats.csv). Re-importing a file is idempotent.
+
+Export streams any table, optionally limited to a channel and date range,
+from a server-side cursor straight into the output file.
+
+Parquet needs pyarrow (optional). Imported history older than the anomaly
+baselines is not folded into them; `cli.py anomalies --rebuild` relearns.
+"""
+import os
+import csv
+import time
+import datetime
+import itertools
+import importlib.util
+
+from sqlalchemy import select, Date, Float, Integer
+
+import config
+from database import (
+    engine, get_session, upsert, bulk_load_video_daily, Base, Channel, ChannelDaily, VideoDaily, Video
+)
+
+# Analytics API report columns -> DB columns
+API_NAMES = {
+    "day": "date",
+    "video": "video_id",
+    "estimatedRevenue": "estimated_revenue",
+    "estimatedMinutesWatched": "watch_time_minutes",
+    "subscribersGained": "subscribers_gained",
+    "averageViewDuration": "avg_view_duration_seconds",
+}
+IMPORT_TABLES = {"channel_daily": ChannelDaily, "video_daily": VideoDaily}
+TABLE_ALIASES = {"channel_daily": "channel_daily_stats", "video_daily": "video_daily_stats"}
+
+
+def _is_parquet(path):
+    return str(path).endswith((".parquet", ".pq"))
+
+
+def _require_pyarrow():
+    if importlib.util.find_spec("pyarrow") is None:
+        raise RuntimeError("Parquet files need pyarrow (pip install pyarrow)")
+
+
+def _chunks(path, size):
+    """Lists of row dicts, `size` at a time, from a CSV or Parquet file."""
+    if _is_parquet(path):
+        _require_pyarrow()
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=size):
+            yield batch.to_pylist()
+        return
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.DictReader(f)
+        while True:
+            rows = list(itertools.islice(reader, size))
+            if not rows:
+                return
+            yield rows
+
+
+def _converter(column):
+    """value -> DB value for one column; blanks become the column's scalar default (or None)."""
+    default = column.default.arg if column.default is not None and column.default.is_scalar else None
+    if isinstance(column.type, Date):
+        def parse(v):
+            if isinstance(v, datetime.datetime):
+                return v.date()
+            return v if isinstance(v, datetime.date) else datetime.date.fromisoformat(str(v)[:10])
+    elif isinstance(column.type, Integer):
+        parse = lambda v: int(float(v))
+    elif isinstance(column.type, Float):
+        parse = float
+    else:
+        parse = str
+    return lambda v: default if v is None or v == "" else parse(v)
+
+
+def _columns(model, header):
+    """[(file column, DB column name, converter)] for the file columns the table has."""
+    table = model.__table__
+    out = []
+    for name in header:
+        target = API_NAMES.get(name, name)
+        if target in table.c and target != "id":
+            out.append((name, target, _converter(table.c[target])))
+    return out
+
+
+def _throughput(verb, rows, seconds, nbytes):
+    seconds = max(seconds, 1e-9)
+    return (f"{verb} {rows:,} rows in {seconds:.2f}s "
+            f"({rows / seconds:,.0f} rows/s, {nbytes / 2**20 / seconds:.1f} MiB/s)")
+
+
+def import_file(path, table, channel_id=None, chunk_rows=None):
+    """Upsert a CSV/Parquet file into `table` ("channel_daily" or "video_daily"); returns rows loaded.
+
+    channel_daily rows take `channel_id` when the file has no channel_id
+    column. video_daily rows for videos not in the DB are skipped (sync the
+    catalog first), and so are days already folded into the retention tiers.
+    """
+    import formats
+    import retention
+    import snapshots
+
+    model = IMPORT_TABLES[table]
+    chunk_rows = chunk_rows or config.TRANSFER_CHUNK_ROWS
+    session = get_session()
+    t0 = time.perf_counter()
+    loaded, skipped, failed = 0, 0, 0
+    spans = {}          # channel -> (first, last) date loaded, for the snapshot refresh
+    video_channel = {}  # video id -> channel id (None if unknown)
+    horizons = {}       # channel id -> compaction horizon
+    mapping = None
+    try:
+        for chunk in _chunks(path, chunk_rows):
+            if mapping is None:
+                mapping = _columns(model, chunk[0].keys())
+                targets = {t for _, t, _ in mapping}
+                missing = {"date", "video_id" if model is VideoDaily else "date"} - targets
+                if missing:
+                    raise ValueError(f"{path}: no {', '.join(sorted(missing))} column")
+                if model is ChannelDaily and "channel_id" not in targets and not channel_id:
+                    raise ValueError(f"{path} has no channel_id column: pass the channel")
+            rows = []
+            for raw in chunk:
+                try:
+                    row = {target: convert(raw.get(name)) for name, target, convert in mapping}
+                except (TypeError, ValueError) as e:
+                    failed += 1
+                    if failed <= 3:
+                        print(f"  bad row {raw}: {e}")
+                    continue
+                if model is ChannelDaily and not row.get("channel_id"):
+                    row["channel_id"] = channel_id
+                if row["date"] is None or (model is VideoDaily and not row["video_id"]):
+                    failed += 1
+                    continue
+                rows.append(row)
+
+            if model is VideoDaily:
+                unknown = list({r["video_id"] for r in rows} - video_channel.keys())
+                for k in range(0, len(unknown), 500):
+                    found = dict(session.query(Video.id, Video.channel_id).filter(Video.id.in_(unknown[k:k + 500])))
+                    video_channel.update({v: found.get(v) for v in unknown[k:k + 500]})
+                for cid in set(video_channel.values()) - horizons.keys() - {None}:
+                    horizons[cid] = retention.compacted_through(session, cid)
+                kept = []
+                for r in rows:
+                    cid = video_channel[r["video_id"]]
+                    horizon = horizons.get(cid)
+                    if cid is None or (horizon and r["date"] <= horizon):
+                        skipped += 1
+                    else:
+                        r["_channel"] = cid
+                        kept.append(r)
+                rows = kept
+            else:
+                for cid in {r["channel_id"] for r in rows}:
+                    if session.get(Channel, cid) is None:
+                        session.add(Channel(id=cid, name=cid))  # the next sync fills in the name
+                session.flush()
+                for r in rows:
+                    r["_channel"] = r["channel_id"]
+
+            chunk_spans = {}
+            for r in rows:
+                cid = r.pop("_channel")
+                first, last = chunk_spans.get(cid, (r["date"], r["date"]))
+                chunk_spans[cid] = (min(first, r["date"]), max(last, r["date"]))
+            for cid, (first, last) in chunk_spans.items():
+                snapshots.invalidate(cid, table, first, last)
+                if cid in spans:
+                    first, last = min(first, spans[cid][0]), max(last, spans[cid][1])
+                spans[cid] = (first, last)
+            if model is VideoDaily:
+                bulk_load_video_daily(session, rows)
+            else:
+                upsert(session, ChannelDaily, rows, ["channel_id", "date"])
+            session.commit()
+            loaded += len(rows)
+        if model is VideoDaily:
+            for cid, (first, last) in spans.items():
+                formats.refresh(session, cid, first, last)
+            session.commit()
+    finally:
+        session.close()
+
+    print(_throughput(f"Imported {table}:", loaded, time.perf_counter() - t0, os.path.getsize(path))
+          + (f"; skipped {skipped:,} (unknown video or compacted day)" if skipped else "")
+          + (f"; {failed:,} unparseable" if failed else ""))
+    if snapshots.available():
+        for cid, (first, last) in spans.items():
+            snapshots.refresh(cid, first, last, tables=[table])
+    return loaded
+
+
+def _csv_value(v):
+    return v.hex() if isinstance(v, bytes) else v
+
+
+def export_table(table, path, channel_id=None, start=None, end=None, chunk_rows=None):
+    """Stream `table` (a DB table name or channel_daily/video_daily) to a CSV or Parquet file.
+
+    `channel_id` limits tables with a channel_id or video_id column; `start`/
+    `end` (dates, inclusive) limit tables with a date column. Returns rows written.
+    """
+    name = TABLE_ALIASES.get(table, table)
+    if name not in Base.metadata.tables:
+        raise ValueError(f"Unknown table '{table}' (choose from {', '.join(sorted(Base.metadata.tables))})")
+    t = Base.metadata.tables[name]
+    stmt = select(t).order_by(*t.primary_key.columns)
+    if start or end:
+        if "date" not in t.c:
+            raise ValueError(f"{name} has no date column to filter on")
+        if start:
+            stmt = stmt.where(t.c.date >= start)
+        if end:
+            stmt = stmt.where(t.c.date <= end)
+    if channel_id:
+        if "channel_id" in t.c:
+            stmt = stmt.where(t.c.channel_id == channel_id)
+        elif "video_id" in t.c:
+            stmt = stmt.where(t.c.video_id.in_(select(Video.id).where(Video.channel_id == channel_id)))
+        else:
+            raise ValueError(f"{name} has no channel_id or video_id column to filter on")
+
+    chunk_rows = chunk_rows or config.TRANSFER_CHUNK_ROWS
+    columns = [c.name for c in t.columns]
+    tmp = f"{path}.{os.getpid()}.tmp"
+    t0 = time.perf_counter()
+    written = 0
+    try:
+        with engine.connect() as conn:
+            result = conn.execution_options(stream_results=True, yield_per=chunk_rows).execute(stmt)
+            if _is_parquet(path):
+                _require_pyarrow()
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+                from snapshots import arrow_type
+                schema = pa.schema([(c.name, arrow_type(c)) for c in t.columns])
+                with pq.ParquetWriter(tmp, schema, compression="zstd") as writer:
+                    for rows in result.partitions():
+                        writer.write_table(pa.Table.from_arrays(
+                            [pa.array(values, type=field.type) for values, field in zip(zip(*rows), schema)],
+                            schema=schema))
+                        written += len(rows)
+            else:
+                with open(tmp, "w", newline="", encoding="utf-8") as f:
+                    writer = csv.writer(f)
+                    writer.writerow(columns)
+                    for rows in result.partitions():
+                        writer.writerows([_csv_value(v) for v in row] for row in rows)
+                        written += len(rows)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    os.replace(tmp, path)
+    print(_throughput(f"Exported {name}:", written, time.perf_counter() - t0, os.path.getsize(path)))
+    return written
@@ -1,12 +1,32 @@
-from database import get_session, Comment, Video
-from sqlalchemy.orm import outerjoin
+"""Comment table sanity check: counts, most-commented videos, newest threads.
+
+    python verify_db.py [KEYWORDS...]   also run a full-text search
+"""
+import sys
+
+from sqlalchemy import func
+
+from database import get_session, search_comments, Comment, Video
 
 session = get_session()
-comments = session.query(Comment).outerjoin(Video).all()
-print(f"Total Comments: {len(comments)}")
-for c in comments:
-    print(f"ID: {c.id}, Text: {c.text}, Video: {c.video_id}")
-    if c.video:
-        print(f"  -> Video Title: {c.video.title}")
-    else:
-        print("  -> No Video Rel")
+total = session.query(func.count(Comment.id)).scalar()
+replies = session.query(func.count(Comment.id)).filter(Comment.parent_id.isnot(None)).scalar()
+print(f"Total Comments: {total} ({total - replies} threads, {replies} replies)")
+
+print("\nMost commented videos:")
+per_video = session.query(Comment.video_id, func.count(Comment.id).label('n')).group_by(
+    Comment.video_id).order_by(func.count(Comment.id).desc()).limit(10).subquery()
+for video_id, n, title in session.query(per_video.c.video_id, per_video.c.n, Video.title).outerjoin(
+        Video, Video.id == per_video.c.video_id).order_by(per_video.c.n.desc()):
+    print(f"  {n:>7}  {video_id}  {title or '(no video row)'}")
+
+print("\nNewest threads:")
+for c in session.query(Comment).filter(Comment.parent_id.is_(None)).order_by(
+        Comment.published_at.desc()).limit(5):
+    print(f"  {c.published_at}  {c.video_id}  {c.author_name}: {(c.text or '')[:80]}")
+
+if sys.argv[1:]:
+    query = " ".join(sys.argv[1:])
+    print(f"\nSearch '{query}':")
+    for r in search_comments(session, query):
+        print(f"  {r.published_at}  {r.video_id}  {r.author_name}: {(r.text or '')[:80]}")